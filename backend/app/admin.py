@@ -1,7 +1,10 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
 from django.contrib.auth.models import User
-from .models import Client, Account, Transaction, ExchangeRate
+from .models import (
+    Client, Account, Transaction, ArchivedTransaction, BalanceMarker, ExchangeRate, ExchangeRateHistory,
+    IdempotencyKey, StatCounter,
+)
 
 class ClientInline(admin.StackedInline):
     model = Client
@@ -62,6 +65,26 @@ class TransactionAdmin(admin.ModelAdmin):
         }),
     )
 
+@admin.register(ArchivedTransaction)
+class ArchivedTransactionAdmin(admin.ModelAdmin):
+    list_display = ['id', 'account', 'amount', 'type', 'timestamp', 'from_account', 'to_account']
+    list_filter = ['type', 'timestamp']
+    search_fields = ['account__client__name', 'description']
+    readonly_fields = ['id', 'account', 'amount', 'type', 'description', 'timestamp', 'from_account', 'to_account']
+
+    def has_add_permission(self, request):
+        # Архив пополняет только команда archive_transactions
+        return False
+
+@admin.register(BalanceMarker)
+class BalanceMarkerAdmin(admin.ModelAdmin):
+    list_display = ['account', 'balance', 'archived_until', 'archived_count', 'updated_at']
+    search_fields = ['account__account_number', 'account__client__name']
+    readonly_fields = ['account', 'balance', 'archived_until', 'archived_count', 'updated_at']
+
+    def has_add_permission(self, request):
+        return False
+
 @admin.register(ExchangeRate)
 class ExchangeRateAdmin(admin.ModelAdmin):
     list_display = ['from_currency', 'to_currency', 'rate', 'updated_at']
@@ -69,6 +92,31 @@ class ExchangeRateAdmin(admin.ModelAdmin):
     list_filter = ['from_currency', 'to_currency']
     search_fields = ['from_currency', 'to_currency']
 
+@admin.register(ExchangeRateHistory)
+class ExchangeRateHistoryAdmin(admin.ModelAdmin):
+    list_display = ['from_currency', 'to_currency', 'rate', 'valid_from']
+    list_filter = ['from_currency', 'to_currency']
+    readonly_fields = ['from_currency', 'to_currency', 'rate', 'valid_from']
+
+    def has_add_permission(self, request):
+        # История только дописывается при изменении курсов
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+@admin.register(IdempotencyKey)
+class IdempotencyKeyAdmin(admin.ModelAdmin):
+    list_display = ['key', 'user', 'endpoint', 'status_code', 'created_at']
+    list_filter = ['endpoint', 'created_at']
+    search_fields = ['key', 'user__username']
+    readonly_fields = ['created_at']
+
+@admin.register(StatCounter)
+class StatCounterAdmin(admin.ModelAdmin):
+    list_display = ['name', 'value', 'recounted_at']
+    readonly_fields = ['name', 'value', 'recounted_at']
+
 # Убираем кастомный UserAdmin и используем стандартный
 # Вместо этого добавим Client как отдельную модель в админке
 # Если нужно связать User и Client, лучше использовать отдельные страницы
@@ -1,5 +1,26 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_migrate, pre_migrate
 
 class AppConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
-    name = 'app'
\ No newline at end of file
+    name = 'app'
+
+    def ready(self):
+        # PRAGMA для соединений SQLite
+        from . import database  # noqa: F401
+        # Подключаем обработчики сигналов, сбрасывающие матрицу курсов
+        from . import rates  # noqa: F401
+        # Счетчики статистики админ-панели
+        from . import stats  # noqa: F401
+        # Почасовые и дневные обороты
+        from . import rollups  # noqa: F401
+        # Версии счетов для ETag
+        from . import versions  # noqa: F401
+        # Живая лента транзакций
+        from . import feed  # noqa: F401
+        # Сброс кеша принципалов при изменении пользователей и клиентов
+        from . import principal  # noqa: F401
+        # Полнотекстовый индекс транзакций и его триггеры
+        from .search import drop_before_migrate, install_after_migrate
+        pre_migrate.connect(drop_before_migrate, sender=self)
+        post_migrate.connect(install_after_migrate, sender=self)
@@ -0,0 +1,154 @@
+"""Архив журнала: горячая и холодная части таблицы транзакций.
+
+Команда ``archive_transactions`` переносит транзакции старше горизонта
+(``TRANSACTION_ARCHIVE_DAYS``) из ``Transaction`` в ``ArchivedTransaction``
+порциями, начиная с самых старых. Каждая порция - отдельная короткая
+транзакция БД: строки копируются с теми же id (INSERT ... SELECT),
+удаляются из журнала, и для затронутых счетов обновляется
+``BalanceMarker``. Остаток в маркере - баланс счета минус операции,
+оставшиеся в журнале, то есть баланс после последней архивной операции.
+Он верен после каждой зафиксированной порции, поэтому перенос можно
+прервать в любой момент.
+
+Новые транзакции получают текущее время, поэтому ключи (timestamp, id)
+архива всегда меньше ключей журнала. Чтение идет сначала по журналу, а
+архив читается, только если выборка дошла до начала журнала: ленты и
+поиск - ``pagination.paginate`` и ``keyset_chunks`` с ``archive``,
+истории счетов - только для счетов с маркером (``archived_accounts``).
+
+Счетчик статистики, обороты и полнотекстовый индекс учитывают обе части,
+так что перенос их не меняет.
+"""
+from datetime import timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import connection, transaction as db_transaction
+from django.db.models import Case, Count, DecimalField, F, Max, Q, Sum, Value, When
+from django.utils import timezone
+
+from .models import Account, ArchivedTransaction, BalanceMarker, Transaction
+
+ZERO = Decimal('0')
+
+DEFAULT_HORIZON_DAYS = 365
+
+# Сколько транзакций переносится в одной транзакции БД: блокировка на
+# запись не удерживается на время всего переноса.
+CHUNK_SIZE = 5000
+
+
+def horizon(days=None):
+    """Момент, транзакции раньше которого переносятся в архив"""
+    if days is None:
+        days = getattr(settings, 'TRANSACTION_ARCHIVE_DAYS', DEFAULT_HORIZON_DAYS)
+    return timezone.now() - timedelta(days=days)
+
+
+def _move_statements():
+    """INSERT в архив и DELETE из журнала строк с ключом не больше (timestamp, id)"""
+    ops = connection.ops
+    columns = ', '.join(ops.quote_name(field.column) for field in Transaction._meta.concrete_fields)
+    journal = ops.quote_name(Transaction._meta.db_table)
+    chunk = 'timestamp < %s OR (timestamp = %s AND id <= %s)'
+    return (
+        f'INSERT INTO {ops.quote_name(ArchivedTransaction._meta.db_table)} ({columns}) '
+        f'SELECT {columns} FROM {journal} WHERE {chunk}',
+        f'DELETE FROM {journal} WHERE {chunk}',
+    )
+
+
+def _net():
+    """Сумма операций со знаком: изменение баланса счета"""
+    return Sum(Case(
+        # Перевод самому себе баланс не меняет
+        When(type='transfer', from_account=F('to_account'), then=Value(ZERO)),
+        When(Q(type='withdraw') | Q(type='transfer', from_account=F('account')), then=-F('amount')),
+        default=F('amount'),
+        output_field=DecimalField(max_digits=20, decimal_places=2),
+    ))
+
+
+def _update_markers(moved):
+    """Маркеры счетов после переноса; moved - {id счета: (перенесено, время последней, сумма)}.
+
+    Остаток счета с маркером сдвигается на сумму перенесенных операций. У
+    счета без маркера он считается один раз: баланс минус операции,
+    оставшиеся в журнале.
+    """
+    markers, counts = {}, {}
+    for account_id, balance, count in BalanceMarker.objects.filter(account_id__in=moved).values_list(
+        'account_id', 'balance', 'archived_count'
+    ):
+        markers[account_id], counts[account_id] = balance, count
+    new = [account_id for account_id in moved if account_id not in markers]
+    if new:
+        rest = dict(
+            Transaction.objects.filter(account_id__in=new).order_by().values('account_id')
+            .annotate(net=_net()).values_list('account_id', 'net')
+        )
+        for account_id, balance in Account.objects.filter(id__in=new).values_list('id', 'balance'):
+            markers[account_id] = balance - (rest.get(account_id) or ZERO) - moved[account_id][2]
+    BalanceMarker.objects.bulk_create(
+        [
+            BalanceMarker(
+                account_id=account_id,
+                balance=markers[account_id] + net,
+                archived_until=last,
+                archived_count=counts.get(account_id, 0) + count,
+            )
+            for account_id, (count, last, net) in moved.items()
+            if account_id in markers
+        ],
+        update_conflicts=True,
+        unique_fields=['account'],
+        update_fields=['balance', 'archived_until', 'archived_count', 'updated_at'],
+    )
+
+
+def archive_chunk(before, chunk_size=None):
+    """Переносит в архив порцию самых старых транзакций раньше before, возвращает их число"""
+    keys = list(
+        Transaction.objects.filter(timestamp__lt=before)
+        .order_by('timestamp', 'id')
+        .values_list('timestamp', 'id')[:chunk_size or CHUNK_SIZE]
+    )
+    if not keys:
+        return 0
+    last_timestamp, last_id = keys[-1]
+    params = [connection.ops.adapt_datetimefield_value(last_timestamp)] * 2 + [last_id]
+    insert, delete = _move_statements()
+    with db_transaction.atomic(), connection.cursor() as cursor:
+        # Первая команда - запись: остальное читается уже под блокировкой на запись
+        cursor.execute(insert, params)
+        moved = {
+            account_id: (count, last, net)
+            for account_id, count, last, net in Transaction.objects.filter(
+                Q(timestamp__lt=last_timestamp) | Q(timestamp=last_timestamp, id__lte=last_id)
+            ).order_by().values('account_id').annotate(count=Count('id'), last=Max('timestamp'), net=_net())
+            .values_list('account_id', 'count', 'last', 'net')
+        }
+        cursor.execute(delete, params)
+        _update_markers(moved)
+    return sum(count for count, _, _ in moved.values())
+
+
+def archived_accounts(account_ids):
+    """Счета из account_ids, у которых есть транзакции в архиве"""
+    if not account_ids:
+        return set()
+    return set(
+        BalanceMarker.objects.filter(account_id__in=account_ids, archived_count__gt=0)
+        .values_list('account_id', flat=True)
+    )
+
+
+async def aarchived_accounts(account_ids):
+    """archived_accounts для async-представлений"""
+    if not account_ids:
+        return set()
+    return {
+        account_id async for account_id in
+        BalanceMarker.objects.filter(account_id__in=account_ids, archived_count__gt=0)
+        .values_list('account_id', flat=True)
+    }
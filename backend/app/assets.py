@@ -0,0 +1,254 @@
+"""Статические файлы: отпечатки в именах, сжатые копии и их раздача.
+
+``collectstatic`` с ``PrecompressedManifestStorage``:
+
+1. шрифты TTF конвертируются в WOFF2 с подмножеством символов
+   ``STATIC_FONT_SUBSET`` (латиница, кириллица, пунктуация, знаки валют);
+   вариативная ось начертания сохраняется;
+2. ``ManifestStaticFilesStorage`` добавляет к именам хеш содержимого и
+   переписывает ссылки в CSS;
+3. рядом с текстовыми файлами и TTF пишутся копии ``.gz`` и ``.br``.
+
+Конвертации шрифтов нужны пакеты fontTools и brotli, копиям ``.br`` -
+brotli. Без них шаг пропускается с предупреждением: CSS подключает TTF
+запасным вариантом, а ``.gz`` пишется всегда.
+
+``static_assets_middleware`` отдает файлы из STATIC_ROOT до сессий и
+аутентификации: по Accept-Encoding выбирает ``.br`` или ``.gz``, именам
+с хешем ставит ``Cache-Control: public, max-age=31536000, immutable``,
+остальным - ``no-cache`` с ETag/Last-Modified и ответом 304.
+"""
+import gzip
+import hashlib
+import io
+import logging
+import mimetypes
+import os
+import posixpath
+import re
+
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+from django.core.exceptions import SuspiciousFileOperation
+from django.core.files.base import ContentFile
+from django.http import HttpResponse
+from django.utils._os import safe_join
+from django.utils.cache import get_conditional_response
+from django.utils.decorators import sync_and_async_middleware
+from django.utils.http import http_date
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    from fontTools import subset as font_subset
+except ImportError:
+    font_subset = None
+
+logger = logging.getLogger(__name__)
+
+# Латиница, кириллица, пунктуация, знаки валют (₽), №, стрелки (→ ← в описаниях переводов)
+DEFAULT_FONT_SUBSET = (
+    'U+0000-00FF,U+0131,U+0152-0153,U+02C6,U+02DA,U+02DC,U+0400-045F,U+0490-0491,'
+    'U+2000-206F,U+20A0-20CF,U+2116,U+2122,U+2190-2199,U+2212'
+)
+
+COMPRESS_EXTENSIONS = ('.css', '.js', '.map', '.svg', '.txt', '.json', '.html', '.ico', '.ttf', '.otf', '.eot')
+# Файлы меньше не сжимаются: выигрыш меньше заголовков
+COMPRESS_MIN_SIZE = 256
+# Копия пишется, только если она хотя бы на 5% меньше оригинала
+COMPRESS_MAX_RATIO = 0.95
+
+IMMUTABLE = 'public, max-age=31536000, immutable'
+# Хеш, который ManifestStaticFilesStorage вставляет перед расширением
+HASHED_NAME = re.compile(r'\.[0-9a-f]{12}\.[^./]+$')
+ACCEPTS_BR = re.compile(r'\bbr\b')
+ACCEPTS_GZIP = re.compile(r'\bgzip\b')
+ENCODINGS = (('br', '.br', ACCEPTS_BR), ('gzip', '.gz', ACCEPTS_GZIP))
+CONTENT_TYPES = {'.woff2': 'font/woff2', '.ttf': 'font/ttf', '.map': 'application/json'}
+
+
+def _woff2(content):
+    """WOFF2 с подмножеством символов из TTF"""
+    options = font_subset.Options()
+    options.flavor = 'woff2'
+    options.layout_features = ['*']
+    options.name_IDs = ['*']
+    options.hinting = False
+    # Служебные таблицы редакторов шрифтов
+    options.drop_tables += ['FFTM', 'webf']
+    font = font_subset.load_font(io.BytesIO(content), options)
+    subsetter = font_subset.Subsetter(options)
+    subsetter.populate(unicodes=font_subset.parse_unicodes(
+        getattr(settings, 'STATIC_FONT_SUBSET', DEFAULT_FONT_SUBSET)
+    ))
+    subsetter.subset(font)
+    output = io.BytesIO()
+    font_subset.save_font(font, output, options)
+    return output.getvalue()
+
+
+def _compressed(content):
+    """Копии (расширение, байты), которые стоит хранить"""
+    variants = [('.gz', gzip.compress(content, compresslevel=9, mtime=0))]
+    if brotli is not None:
+        variants.append(('.br', brotli.compress(content, quality=11)))
+    return [(suffix, data) for suffix, data in variants if len(data) <= len(content) * COMPRESS_MAX_RATIO]
+
+
+class PrecompressedManifestStorage(ManifestStaticFilesStorage):
+    """ManifestStaticFilesStorage, который конвертирует шрифты и пишет сжатые копии"""
+
+    def post_process(self, paths, dry_run=False, **options):
+        if dry_run:
+            yield from super().post_process(paths, dry_run, **options)
+            return
+        paths = dict(paths)
+        # WOFF2 создаются до хеширования, чтобы CSS ссылался на их имена с хешем
+        for name in self._convert_fonts(paths):
+            paths[name] = (self, name)
+        yield from super().post_process(paths, dry_run, **options)
+        self._compress({name for pair in self.hashed_files.items() for name in pair})
+
+    def url_converter(self, name, hashed_files, template=None):
+        converter = super().url_converter(name, hashed_files, template)
+
+        def convert(matchobj):
+            try:
+                return converter(matchobj)
+            except ValueError:
+                # WOFF2 не создан (нет fontTools/brotli): ссылка остается как есть,
+                # браузер возьмет следующий в src вариант - TTF
+                if matchobj['url'].split('?')[0].split('#')[0].endswith('.woff2'):
+                    return matchobj['matched']
+                raise
+
+        return convert
+
+    def _convert_fonts(self, paths):
+        fonts = [name for name in paths if name.endswith('.ttf') and name[:-4] + '.woff2' not in paths]
+        if fonts and (font_subset is None or brotli is None):
+            logger.warning('Шрифты не конвертированы в WOFF2: нужны пакеты fonttools и brotli')
+            return
+        for name in fonts:
+            storage, path = paths[name]
+            target = name[:-4] + '.woff2'
+            if self.exists(target) and self.get_modified_time(target) >= storage.get_modified_time(path):
+                yield target
+                continue
+            try:
+                with storage.open(path) as source:
+                    content = _woff2(source.read())
+            except Exception:
+                logger.exception('Ошибка конвертации шрифта %s', name)
+                continue
+            self.delete(target)
+            self._save(target, ContentFile(content))
+            yield target
+
+    def _compressed_fresh(self, name):
+        """Сжатая копия уже есть и не старше файла (содержимое имени с хешем не меняется)"""
+        if not self.exists(name + '.gz'):
+            return False
+        if HASHED_NAME.search(name):
+            return True
+        return self.get_modified_time(name + '.gz') >= self.get_modified_time(name)
+
+    def _compress(self, names):
+        # Файл без ссылок и его копия с хешем совпадают: сжимаем содержимое один раз
+        done = {}
+        for name in sorted(names):
+            if not name.endswith(COMPRESS_EXTENSIONS) or not self.exists(name):
+                continue
+            if self._compressed_fresh(name):
+                continue
+            with self.open(name) as original:
+                content = original.read()
+            if len(content) < COMPRESS_MIN_SIZE:
+                continue
+            digest = hashlib.sha256(content).digest()
+            if digest not in done:
+                done[digest] = _compressed(content)
+            for suffix, data in done[digest]:
+                self.delete(name + suffix)
+                self._save(name + suffix, ContentFile(data))
+
+
+def _static_file(path_info):
+    """(путь в STATIC_ROOT, имя) для запроса статики или None"""
+    prefix = settings.STATIC_URL
+    if not prefix.startswith('/'):
+        prefix = '/' + prefix
+    if not settings.STATIC_ROOT or not path_info.startswith(prefix):
+        return None
+    name = posixpath.normpath(path_info[len(prefix):]).lstrip('/')
+    try:
+        path = safe_join(settings.STATIC_ROOT, name)
+    except SuspiciousFileOperation:
+        return None
+    if not os.path.isfile(path):
+        return None
+    return path, name
+
+
+def _serve(request, path, name):
+    headers = {'Cache-Control': IMMUTABLE if HASHED_NAME.search(name) else 'no-cache'}
+    accept_encoding = request.headers.get('Accept-Encoding', '')
+    encoding = None
+    served = path
+    for coding, suffix, accepts in ENCODINGS:
+        if os.path.isfile(path + suffix):
+            headers['Vary'] = 'Accept-Encoding'
+            if encoding is None and accepts.search(accept_encoding):
+                encoding, served = coding, path + suffix
+
+    stat = os.stat(served)
+    etag = f'"{int(stat.st_mtime):x}-{stat.st_size:x}{"-" + encoding if encoding else ""}"'
+    headers['ETag'] = etag
+    headers['Last-Modified'] = http_date(stat.st_mtime)
+    not_modified = get_conditional_response(request, etag=etag, last_modified=int(stat.st_mtime))
+    if not_modified is not None:
+        for header, value in headers.items():
+            not_modified[header] = value
+        return not_modified
+
+    extension = os.path.splitext(name)[1]
+    content_type = CONTENT_TYPES.get(extension) or mimetypes.guess_type(name)[0] or 'application/octet-stream'
+    if request.method == 'HEAD':
+        content = b''
+    else:
+        with open(served, 'rb') as file:
+            content = file.read()
+    response = HttpResponse(content, content_type=content_type, headers=headers)
+    response['Content-Length'] = stat.st_size
+    if encoding:
+        response['Content-Encoding'] = encoding
+    return response
+
+
+@sync_and_async_middleware
+def static_assets_middleware(get_response):
+    """Раздача собранной статики со сжатыми копиями и долгим кешем"""
+
+    def match(request):
+        if request.method not in ('GET', 'HEAD'):
+            return None
+        return _static_file(request.path_info)
+
+    if iscoroutinefunction(get_response):
+        async def middleware(request):
+            found = match(request)
+            if found is None:
+                return await get_response(request)
+            return _serve(request, *found)
+    else:
+        def middleware(request):
+            found = match(request)
+            if found is None:
+                return get_response(request)
+            return _serve(request, *found)
+
+    return middleware
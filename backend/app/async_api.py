@@ -0,0 +1,55 @@
+"""Async-представления API для чтения.
+
+DRF 3.14 не поддерживает async-представления, поэтому эндпоинты чтения -
+обычные async-представления Django с той же проверкой, что у
+``@api_view`` + ``permission_classes``: только GET, пользователь из
+сессии, ошибки доступа - ``{"detail": ...}`` с кодом 403, тело -
+компактный JSON без экранирования кириллицы, как у рендерера DRF
+(``renderers.ORJSONRenderer``).
+
+Под ASGI такое представление не держит поток, пока ждет базу: запросы
+идут через async-интерфейс ORM, а сериализация выполняется в event loop.
+Под WSGI Django запускает их через ``async_to_sync``.
+"""
+from functools import wraps
+
+from django.http import HttpResponse
+from rest_framework.exceptions import MethodNotAllowed, NotAuthenticated, PermissionDenied
+
+from . import database, principal, renderers
+from .models import Client
+
+def json_response(data, status=200):
+    return HttpResponse(renderers.dumps(data), status=status, content_type='application/json')
+
+
+def read_view(admin=False):
+    """Декоратор async-представления чтения (admin - только для администраторов)"""
+
+    def decorator(view):
+        @wraps(view)
+        async def inner(request, *args, **kwargs):
+            if request.method not in ('GET', 'HEAD'):
+                return json_response({'detail': MethodNotAllowed(request.method).detail}, status=405)
+            # Чтение - через соединение только для чтения (database.ReadRouter)
+            with database.reading():
+                user = await request.auser()
+                if not user.is_authenticated or not user.is_active:
+                    return json_response({'detail': NotAuthenticated.default_detail}, status=403)
+                if admin and not user.is_staff:
+                    return json_response({'detail': PermissionDenied.default_detail}, status=403)
+                # Пользователь уже загружен: синхронный код может обращаться к request.user
+                request.user = user
+                return await view(request, *args, **kwargs)
+
+        return inner
+
+    return decorator
+
+
+async def ensure_client(user):
+    """id профиля клиента; пользователю без профиля он создается (как в синхронных представлениях)"""
+    client_id = await principal.aclient_id(user)
+    if client_id is None:
+        client_id = (await Client.objects.acreate(user=user, name=user.username, email=user.email)).id
+    return client_id
@@ -0,0 +1,73 @@
+"""Настройка соединений SQLite и разделение чтения и записи.
+
+Каждое новое соединение SQLite получает PRAGMA из ``SQLITE_PRAGMAS``:
+WAL (читатели не ждут писателей и не мешают им), ``busy_timeout``
+(писатель ждет блокировку, а не падает с "database is locked"),
+``synchronous``, ``mmap_size`` и ``cache_size``.
+
+Эндпоинты чтения (``async_api.read_view``) выполняют запросы через
+отдельный алиас ``DATABASE_READ_ALIAS`` на тот же файл; его соединения
+открываются с ``query_only``. ``ReadRouter`` отправляет туда чтение
+только внутри ``reading()``, поэтому проводки и все остальное читают
+через ``default`` и видят свои незафиксированные изменения, а запись
+всегда идет в ``default``.
+"""
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+_reading = ContextVar('reading', default=False)
+
+
+def read_alias():
+    """Алиас соединения для чтения или None, если он не настроен"""
+    alias = getattr(settings, 'DATABASE_READ_ALIAS', None)
+    return alias if alias in settings.DATABASES else None
+
+
+@contextmanager
+def reading():
+    """Запросы на чтение внутри блока идут через алиас чтения"""
+    token = _reading.set(True)
+    try:
+        yield
+    finally:
+        _reading.reset(token)
+
+
+class ReadRouter:
+    def db_for_read(self, model, **hints):
+        if _reading.get():
+            return read_alias()
+        return None
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Оба алиаса смотрят в один файл
+        aliases = {DEFAULT_DB_ALIAS, read_alias()}
+        if obj1._state.db in aliases and obj2._state.db in aliases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db == read_alias():
+            return False
+        return None
+
+
+@receiver(connection_created)
+def configure_connection(sender, connection, **kwargs):
+    if connection.vendor != 'sqlite':
+        return
+    pragmas = getattr(settings, 'SQLITE_PRAGMAS', {})
+    with connection.cursor() as cursor:
+        for name, value in pragmas.items():
+            cursor.execute(f'PRAGMA {name} = {value}')
+        if connection.alias == read_alias():
+            cursor.execute('PRAGMA query_only = 1')
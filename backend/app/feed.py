@@ -0,0 +1,176 @@
+"""Живая лента новых транзакций (Server-Sent Events).
+
+Издатель один на процесс. Проводки после фиксации транзакции БД
+(``on_commit``) передают id новых записей журнала в ``publish``: он
+читает их одним запросом, кодирует каждое событие один раз и одним
+вызовом на event loop раскладывает готовые кадры по очередям
+подписчиков. Администратор получает все транзакции, клиент - только
+транзакции своих счетов.
+
+Подписчик - корутина ``stream`` в event loop ASGI-сервера: между
+событиями она ждет очередь и раз в ``FEED_HEARTBEAT`` секунд отправляет
+комментарий-пинг, поэтому открытая панель не занимает поток и почти не
+тратит процессор. Пока подписчиков нет, проводки не делают ничего
+лишнего. Отставший клиент, у которого переполнилась очередь, получает
+событие ``reset`` и перечитывает список заново.
+
+Лента работает только под ASGI и видит проводки своего процесса:
+сервер запускается одним процессом (``uvicorn cassa.asgi:application``).
+"""
+import asyncio
+import logging
+import threading
+
+from django.conf import settings
+from django.db import transaction as db_transaction
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+
+from . import renderers, serializers
+from .models import Transaction
+
+logger = logging.getLogger(__name__)
+
+# Интервал пингов, секунд: держит соединение через прокси и выявляет обрывы
+HEARTBEAT = getattr(settings, 'FEED_HEARTBEAT', 15)
+# Сколько кадров может ждать отправки одному подписчику
+QUEUE_SIZE = getattr(settings, 'FEED_QUEUE_SIZE', 1000)
+# Через сколько миллисекунд браузер переподключается после обрыва
+RETRY = 3000
+
+_subscriptions = {}  # event loop -> множество подписок
+_timers = {}  # event loop -> TimerHandle следующего пинга
+_lock = threading.Lock()
+
+_RESET = object()
+_PING = b': ping\n\n'
+
+
+class Subscription:
+    """Подключенный клиент ленты"""
+
+    def __init__(self, loop, user_id):
+        self.loop = loop
+        self.user_id = user_id  # None - все транзакции (администратор)
+        self.queue = asyncio.Queue(QUEUE_SIZE)
+
+    def offer(self, frame):
+        try:
+            self.queue.put_nowait(frame)
+        except asyncio.QueueFull:
+            # Клиент не успевает читать: сбрасываем очередь, он перечитает список
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait(_RESET)
+
+
+def subscribe(user_id):
+    """Новая подписка в текущем event loop"""
+    loop = asyncio.get_running_loop()
+    subscription = Subscription(loop, user_id)
+    with _lock:
+        _subscriptions.setdefault(loop, set()).add(subscription)
+        timer = _timers.get(loop)
+        if timer is None or timer.cancelled():
+            _timers[loop] = loop.call_later(HEARTBEAT, _heartbeat, loop)
+    return subscription
+
+
+def _heartbeat(loop):
+    """Один таймер на event loop вместо таймера на каждое соединение"""
+    with _lock:
+        group = tuple(_subscriptions.get(loop, ()))
+        if group:
+            _timers[loop] = loop.call_later(HEARTBEAT, _heartbeat, loop)
+        else:
+            _timers.pop(loop, None)
+    for subscription in group:
+        subscription.offer(_PING)
+
+
+def unsubscribe(subscription):
+    with _lock:
+        group = _subscriptions.get(subscription.loop)
+        if group is not None:
+            group.discard(subscription)
+            if not group:
+                del _subscriptions[subscription.loop]
+                # Таймер снимается сразу: иначе быстрое переподключение
+                # запустило бы вторую цепочку пингов рядом с еще не сработавшей
+                timer = _timers.pop(subscription.loop, None)
+                if timer is not None:
+                    timer.cancel()
+
+
+def subscriber_count():
+    with _lock:
+        return sum(len(group) for group in _subscriptions.values())
+
+
+def announce(transactions):
+    """Передает новые записи журнала в ленту после фиксации транзакции БД"""
+    if _subscriptions:
+        ids = [transaction.id for transaction in transactions]
+        db_transaction.on_commit(lambda: publish(ids))
+
+
+def _frame(row):
+    return b'id: %d\nevent: transaction\ndata: %s\n\n' % (row['id'], renderers.dumps(row))
+
+
+def _deliver(subscriptions, events):
+    """Раскладывает кадры по очередям (выполняется в event loop подписчиков)"""
+    for subscription in subscriptions:
+        user_id = subscription.user_id
+        for owner_id, frame in events:
+            if user_id is None or user_id == owner_id:
+                subscription.offer(frame)
+
+
+def publish(transaction_ids):
+    """Рассылает транзакции подписчикам (из любого потока)"""
+    try:
+        with _lock:
+            groups = [(loop, tuple(group)) for loop, group in _subscriptions.items()]
+        if not groups:
+            return
+        queryset = Transaction.objects.filter(id__in=transaction_ids).order_by('timestamp', 'id')
+        events = [(user_id, _frame(row)) for user_id, row in serializers.feed_rows(queryset)]
+        for loop, group in groups:
+            try:
+                loop.call_soon_threadsafe(_deliver, group, events)
+            except RuntimeError:
+                # Event loop уже остановлен
+                pass
+    except Exception:
+        logger.exception('Ошибка в feed.publish')
+
+
+async def stream(user_id):
+    """Тело ответа text/event-stream.
+
+    Подписка создается при начале отправки и снимается при обрыве соединения.
+    """
+    subscription = subscribe(user_id)
+    queue = subscription.queue
+    try:
+        yield f'retry: {RETRY}\n\n'.encode()
+        while True:
+            frame = await queue.get()
+            # Накопившиеся кадры (пакетные переводы) уходят одной записью
+            frames = [frame]
+            while not queue.empty():
+                frames.append(queue.get_nowait())
+            if _RESET in frames:
+                yield b'event: reset\ndata: {}\n\n'
+                return
+            yield b''.join(frames)
+    finally:
+        unsubscribe(subscription)
+
+
+@receiver(post_save, sender=Transaction)
+def transaction_saved(sender, instance, created, **kwargs):
+    """Записи журнала, созданные в обход проводок"""
+    if created:
+        announce([instance])
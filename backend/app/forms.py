@@ -2,6 +2,7 @@ from django import forms
 from django.contrib.auth.forms import UserCreationForm
 from django.contrib.auth.models import User
 from .models import Client, Account
+from .rates import currency_choices
 from decimal import Decimal
 
 class UserRegisterForm(UserCreationForm):
@@ -34,6 +35,9 @@ class UserRegisterForm(UserCreationForm):
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
         
+        # Валюты берем из таблицы курсов
+        self.fields['currency'].choices = currency_choices()
+        
         # Настройка поля username
         self.fields['username'].widget.attrs.update({
             'class': 'field__input',
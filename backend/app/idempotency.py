@@ -0,0 +1,208 @@
+"""Идемпотентность денежных операций по заголовку ``Idempotency-Key``.
+
+Первый запрос с ключом резервирует строку ``IdempotencyKey`` (уникальный
+индекс по пользователю и ключу), выполняет операцию и сохраняет успешный
+ответ. Повтор с тем же ключом получает сохраненный ответ без обращения к
+счетам: сначала из LRU-кеша процесса, затем одним запросом по индексу.
+Ключ действует ``IDEMPOTENCY_KEY_TTL`` секунд с создания: просроченная
+строка, которую еще не удалила чистка, удаляется, и запрос выполняется
+как новый. Незавершенный запрос держит ключ ``IDEMPOTENCY_LEASE`` секунд:
+если процесс упал, не сохранив ответ, после этого ключ можно занять снова.
+Неуспешные ответы не сохраняются - ключ освобождается, и клиент может
+безопасно повторить операцию, которая не была проведена.
+"""
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from datetime import timedelta
+from functools import wraps
+
+from django.conf import settings
+from django.db import IntegrityError, transaction as db_transaction
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.response import Response
+
+from .models import IdempotencyKey
+
+HEADER = 'Idempotency-Key'
+MAX_KEY_LENGTH = 255
+
+
+def _ttl():
+    return getattr(settings, 'IDEMPOTENCY_KEY_TTL', 24 * 60 * 60)
+
+
+def _lease():
+    return getattr(settings, 'IDEMPOTENCY_LEASE', 60)
+
+
+class LRUCache:
+    """Потокобезопасный LRU-кеш ответов с истечением по времени"""
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl):
+        with self._lock:
+            self._data[key] = (time.monotonic() + ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+recent_responses = LRUCache(getattr(settings, 'IDEMPOTENCY_CACHE_SIZE', 10000))
+
+_last_sweep = 0.0
+_sweep_lock = threading.Lock()
+
+
+def sweep_expired(batch_size=None):
+    """Удаляет одну пачку просроченных ключей, возвращает число удаленных"""
+    batch_size = batch_size or getattr(settings, 'IDEMPOTENCY_SWEEP_BATCH', 1000)
+    cutoff = timezone.now() - timedelta(seconds=_ttl())
+    ids = list(
+        IdempotencyKey.objects.filter(created_at__lt=cutoff)
+        .order_by('created_at')
+        .values_list('id', flat=True)[:batch_size]
+    )
+    if not ids:
+        return 0
+    deleted, _ = IdempotencyKey.objects.filter(id__in=ids).delete()
+    return deleted
+
+
+def _maybe_sweep():
+    """Не чаще раза в IDEMPOTENCY_SWEEP_INTERVAL удаляет пачку просроченных ключей"""
+    global _last_sweep
+    interval = getattr(settings, 'IDEMPOTENCY_SWEEP_INTERVAL', 60 * 60)
+    now = time.monotonic()
+    if now - _last_sweep < interval or not _sweep_lock.acquire(blocking=False):
+        return
+    try:
+        _last_sweep = now
+        sweep_expired()
+    finally:
+        _sweep_lock.release()
+
+
+def _request_hash(request):
+    payload = json.dumps(request.data, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def _replay(record, request_hash, endpoint):
+    """Ответ на повтор: сохраненный ответ либо ошибка несовпадения запроса"""
+    stored_status, stored_data, stored_endpoint, stored_hash = record
+    if stored_endpoint != endpoint or stored_hash != request_hash:
+        return Response(
+            {'error': 'Ключ идемпотентности уже использован для другого запроса'},
+            status=status.HTTP_422_UNPROCESSABLE_ENTITY
+        )
+    return Response(stored_data, status=stored_status, headers={'Idempotent-Replayed': 'true'})
+
+
+def idempotent(view):
+    """Декоратор денежной операции: повтор с тем же Idempotency-Key не проводится дважды"""
+
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        key = request.headers.get(HEADER)
+        if not key:
+            return view(request, *args, **kwargs)
+        if len(key) > MAX_KEY_LENGTH:
+            return Response(
+                {'error': f'Idempotency-Key длиннее {MAX_KEY_LENGTH} символов'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        endpoint = request.path
+        request_hash = _request_hash(request)
+        cache_key = (request.user.id, key)
+
+        record = recent_responses.get(cache_key)
+        if record is not None:
+            return _replay(record, request_hash, endpoint)
+
+        claim = None
+        while claim is None:
+            try:
+                # Точка сохранения: во внешней транзакции ошибка вставки не ломает ее
+                with db_transaction.atomic():
+                    claim = IdempotencyKey.objects.create(
+                        user_id=request.user.id,
+                        key=key,
+                        endpoint=endpoint,
+                        request_hash=request_hash,
+                    )
+            except IntegrityError:
+                existing = IdempotencyKey.objects.filter(user_id=request.user.id, key=key).values_list(
+                    'id', 'created_at', 'status_code', 'response', 'endpoint', 'request_hash'
+                ).first()
+                if existing is None:
+                    # Ключ успели удалить между вставкой и чтением - выполняем как новый
+                    return view(request, *args, **kwargs)
+                record_id, created_at, *record = existing
+                remaining = _ttl() - (timezone.now() - created_at).total_seconds()
+                if remaining <= 0:
+                    # Просроченный ключ, до которого еще не дошла чистка: запрос выполняется как новый
+                    IdempotencyKey.objects.filter(id=record_id).delete()
+                    continue
+                if record[0] is None:
+                    if (timezone.now() - created_at).total_seconds() >= _lease():
+                        # Процесс, занявший ключ, не завершил запрос - освобождаем ключ
+                        IdempotencyKey.objects.filter(id=record_id, status_code__isnull=True).delete()
+                        continue
+                    return Response(
+                        {'error': 'Запрос с этим ключом идемпотентности уже выполняется'},
+                        status=status.HTTP_409_CONFLICT
+                    )
+                recent_responses.set(cache_key, tuple(record), remaining)
+                return _replay(record, request_hash, endpoint)
+
+        try:
+            response = view(request, *args, **kwargs)
+        except Exception:
+            claim.delete()
+            raise
+
+        if 200 <= response.status_code < 300:
+            # update(), а не save(): если ключ успели освободить по истечении аренды,
+            # строки уже нет, а операция проведена - ответ отдается без сохранения
+            IdempotencyKey.objects.filter(id=claim.id).update(
+                status_code=response.status_code, response=response.data
+            )
+            recent_responses.set(
+                cache_key, (response.status_code, response.data, endpoint, request_hash), _ttl()
+            )
+        else:
+            claim.delete()
+
+        _maybe_sweep()
+        return response
+
+    return wrapper
@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+
+from app.archive import archive_chunk, horizon
+
+
+class Command(BaseCommand):
+    help = (
+        'Переносит транзакции старше горизонта (TRANSACTION_ARCHIVE_DAYS) в архив порциями, '
+        'по порции в транзакции БД (для запуска по расписанию)'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=None, help='Горизонт в днях')
+        parser.add_argument('--chunk-size', type=int, default=None)
+
+    def handle(self, *args, **options):
+        before = horizon(options['days'])
+        total = 0
+        while True:
+            moved = archive_chunk(before, options['chunk_size'])
+            if not moved:
+                break
+            total += moved
+            if options['verbosity'] > 1:
+                self.stdout.write(f'Перенесено: {total}')
+        self.stdout.write(f'Перенесено в архив транзакций: {total} (раньше {before:%Y-%m-%d %H:%M})')
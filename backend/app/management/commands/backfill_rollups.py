@@ -0,0 +1,43 @@
+from datetime import date, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Max, Min
+from django.utils import timezone
+
+from app.models import ArchivedTransaction, Transaction
+from app.rollups import rebuild
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает почасовые и дневные обороты из журнала, по одному дню в транзакции'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--from', dest='start', help='Первый день (YYYY-MM-DD), по умолчанию - начало журнала')
+        parser.add_argument('--to', dest='end', help='Последний день (YYYY-MM-DD), по умолчанию - конец журнала')
+
+    def handle(self, *args, **options):
+        # Начало журнала может быть уже в архиве
+        bounds = [
+            model.objects.aggregate(first=Min('timestamp'), last=Max('timestamp'))
+            for model in (ArchivedTransaction, Transaction)
+        ]
+        firsts = [b['first'] for b in bounds if b['first'] is not None]
+        lasts = [b['last'] for b in bounds if b['last'] is not None]
+        if not firsts:
+            self.stdout.write('Журнал пуст')
+            return
+        try:
+            start = date.fromisoformat(options['start']) if options['start'] else timezone.localdate(min(firsts))
+            end = date.fromisoformat(options['end']) if options['end'] else timezone.localdate(max(lasts))
+        except ValueError as e:
+            raise CommandError(f'Некорректная дата: {e}')
+
+        day, days, total = start, 0, 0
+        while day <= end:
+            count = rebuild(day)
+            if options['verbosity'] > 1:
+                self.stdout.write(f'{day}: {count}')
+            total += count
+            days += 1
+            day += timedelta(days=1)
+        self.stdout.write(f'Пересчитано дней: {days}, записей журнала: {total}')
@@ -0,0 +1,109 @@
+import multiprocessing
+import random
+import time
+import uuid
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, connections
+from django.test.utils import override_settings
+
+from app import metrics, posting
+from app.models import Account, Client, Transaction
+
+
+class Command(BaseCommand):
+    help = (
+        'Переводы между несколькими «горячими» счетами из отдельных процессов: '
+        'POSTING_MODE=locking против optimistic. Показывает пропускную способность, '
+        'p50/p99 длительности перевода и времени под блокировкой на запись, '
+        'конфликты версий и повторы, затем проверяет, что сумма балансов не изменилась'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=4)
+        parser.add_argument('--duration', type=float, default=10, help='Секунд на режим')
+        parser.add_argument('--accounts', type=int, default=4, help='Чем меньше, тем чаще конфликты')
+        parser.add_argument('--initial-balance', type=Decimal, default=Decimal('100000.00'))
+
+    def handle(self, *args, **options):
+        user = User.objects.create_user(username=f'bench_{uuid.uuid4().hex[:12]}')
+        client = Client.objects.get(user=user)
+        try:
+            accounts = [
+                Account.objects.create(client=client, balance=options['initial_balance'], currency='RUB')
+                for _ in range(options['accounts'])
+            ]
+            self.stdout.write(
+                f'{"режим":<12}{"перев./с":>10}{"p50":>10}{"p99":>10}{"блок. p50":>12}{"блок. p99":>12}'
+                f'{"конфликты":>11}{"повторы":>9}{"исчерпано":>11}{"locked":>8}'
+            )
+            for mode in posting.POSTING_MODES:
+                with override_settings(POSTING_MODE=mode):
+                    exported, locked = self.run(accounts, options)
+                self.check_money(accounts, options)
+                summary = metrics.summary(exported).get(mode)
+                if summary is None:
+                    raise CommandError(f'Режим {mode}: ни одного перевода')
+                self.stdout.write(
+                    f'{mode:<12}{summary["operations"] / options["duration"]:>10.0f}'
+                    f'{summary["latency_p50_ms"]:>8.1f}мс{summary["latency_p99_ms"]:>8.1f}мс'
+                    f'{summary["lock_hold_p50_ms"]:>10.2f}мс{summary["lock_hold_p99_ms"]:>10.2f}мс'
+                    f'{summary["conflicts"]:>11}{summary["retries"]:>9}{summary["exhausted"]:>11}{locked:>8}'
+                )
+        finally:
+            user.delete()
+
+    def run(self, accounts, options):
+        ids = [account.id for account in accounts]
+        numbers = [account.account_number for account in accounts]
+        deadline = time.time() + options['duration']
+        context = multiprocessing.get_context('fork')
+        results = context.Queue()
+
+        def worker(seed):
+            rnd = random.Random(seed)
+            metrics.reset()
+            locked = 0
+            try:
+                while time.time() < deadline:
+                    source, target = rnd.sample(range(len(ids)), 2)
+                    try:
+                        posting.transfer(ids[source], numbers[target], Decimal(rnd.randint(1, 1000)) / 100, 'bench')
+                    except (posting.InsufficientFunds, posting.ConcurrentUpdate):
+                        pass
+                    except OperationalError:
+                        locked += 1
+                results.put((metrics.export(), locked))
+            finally:
+                connections.close_all()
+
+        # Дочерние процессы не должны наследовать открытые соединения
+        connections.close_all()
+        processes = [context.Process(target=worker, args=(i,)) for i in range(options['workers'])]
+        for process in processes:
+            process.start()
+        exports, locked = [], 0
+        for _ in processes:
+            exported, errors = results.get()
+            exports.append(exported)
+            locked += errors
+        for process in processes:
+            process.join()
+        return metrics.merge(exports), locked
+
+    def check_money(self, accounts, options):
+        """Переводы в одной валюте не меняют сумму балансов, а баланс каждого счета совпадает с журналом"""
+        ids = [account.id for account in accounts]
+        balances = dict(Account.objects.filter(id__in=ids).values_list('id', 'balance'))
+        expected = options['initial_balance'] * len(ids)
+        if sum(balances.values()) != expected or min(balances.values()) < 0:
+            raise CommandError(f'Балансы {balances} не сходятся с исходной суммой {expected}')
+        ledger = dict.fromkeys(ids, options['initial_balance'])
+        for account_id, amount, from_account_id in Transaction.objects.filter(account_id__in=ids).values_list(
+            'account_id', 'amount', 'from_account_id'
+        ):
+            ledger[account_id] += -amount if account_id == from_account_id else amount
+        if ledger != balances:
+            raise CommandError(f'Балансы {balances} не совпадают с журналом {ledger}')
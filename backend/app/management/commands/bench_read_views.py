@@ -0,0 +1,138 @@
+import asyncio
+import time
+import uuid
+from decimal import Decimal
+from urllib.parse import quote, urlsplit
+
+from django.contrib.auth import BACKEND_SESSION_KEY, HASH_SESSION_KEY, SESSION_KEY
+from django.contrib.auth.models import User
+from django.contrib.sessions.backends.db import SessionStore
+from django.core.management.base import BaseCommand, CommandError
+
+from app import posting
+from app.models import Account, Client
+
+
+def _session_cookie(user):
+    session = SessionStore()
+    session[SESSION_KEY] = str(user.pk)
+    session[BACKEND_SESSION_KEY] = 'django.contrib.auth.backends.ModelBackend'
+    session[HASH_SESSION_KEY] = user.get_session_auth_hash()
+    session.create()
+    return f'sessionid={session.session_key}'
+
+
+class _Connection:
+    """HTTP/1.1 keep-alive соединение, запросы по одному"""
+
+    def __init__(self, host, port):
+        self.host, self.port = host, port
+        self.reader = self.writer = None
+
+    async def get(self, path, cookie):
+        if self.writer is None:
+            self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+        self.writer.write(
+            f'GET {path} HTTP/1.1\r\nHost: {self.host}\r\nCookie: {cookie}\r\n\r\n'.encode()
+        )
+        head = await self.reader.readuntil(b'\r\n\r\n')
+        lines = head.decode('latin1').split('\r\n')
+        status = int(lines[0].split()[1])
+        headers = dict(line.split(': ', 1) for line in lines[1:] if ': ' in line)
+        headers = {name.lower(): value for name, value in headers.items()}
+        await self.reader.readexactly(int(headers.get('content-length', 0)))
+        if headers.get('connection', '').lower() == 'close':
+            self.close()
+        return status
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+        self.reader = self.writer = None
+
+
+class Command(BaseCommand):
+    help = (
+        'Нагрузка на эндпоинты чтения запущенного сервера (runserver или uvicorn): '
+        'запросов в секунду и задержки при разном числе одновременных соединений'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url', default='http://127.0.0.1:8000')
+        parser.add_argument('--concurrency', default='1,8,32,128', help='Уровни через запятую')
+        parser.add_argument('--duration', type=float, default=10, help='Секунд на уровень')
+        parser.add_argument('--accounts', type=int, default=5)
+        parser.add_argument('--transactions', type=int, default=200, help='Операций на каждом счете')
+
+    def handle(self, *args, **options):
+        url = urlsplit(options['url'])
+        levels = [int(level) for level in options['concurrency'].split(',')]
+        tag = uuid.uuid4().hex[:12]
+        user = User.objects.create_user(username=f'bench_{tag}')
+        staff = User.objects.create_user(username=f'bench_staff_{tag}', is_staff=True)
+        try:
+            client = Client.objects.get(user=user)
+            accounts = [
+                Account.objects.create(client=client, balance=Decimal('0.00'), currency='RUB')
+                for _ in range(options['accounts'])
+            ]
+            for account in accounts:
+                for _ in range(options['transactions']):
+                    posting.deposit(account.id, Decimal('1.00'), 'bench', client_id=client.id)
+            other = Account.objects.filter(is_active=True).exclude(client=client).first()
+            if other is None:
+                raise CommandError('Нужен хотя бы один чужой активный счет для поиска')
+
+            user_cookie, staff_cookie = _session_cookie(user), _session_cookie(staff)
+            mix = [
+                ('/api/accounts/my/', user_cookie),
+                (f'/api/accounts/{accounts[0].id}/', user_cookie),
+                ('/api/dashboard/summary/', user_cookie),
+                (f'/api/accounts/search/?q={quote(other.account_number[-6:])}', user_cookie),
+                ('/api/admin/recent-transactions/?limit=50', staff_cookie),
+            ]
+
+            self.stdout.write(f'{"соединений":>10}{"запросов":>10}{"запр./сек":>12}{"p50, мс":>10}{"p99, мс":>10}{"ошибок":>8}')
+            for level in levels:
+                count, rate, p50, p99, errors = asyncio.run(
+                    self._run(url.hostname, url.port or 80, mix, level, options['duration'])
+                )
+                self.stdout.write(f'{level:>10}{count:>10}{rate:>12.0f}{p50:>10.1f}{p99:>10.1f}{errors:>8}')
+        finally:
+            user.delete()
+            staff.delete()
+
+    async def _run(self, host, port, mix, concurrency, duration):
+        latencies = []
+        errors = 0
+        deadline = time.perf_counter() + duration
+
+        async def worker(offset):
+            nonlocal errors
+            connection = _Connection(host, port)
+            index = offset
+            try:
+                while time.perf_counter() < deadline:
+                    path, cookie = mix[index % len(mix)]
+                    index += 1
+                    started = time.perf_counter()
+                    try:
+                        status = await connection.get(path, cookie)
+                    except (OSError, asyncio.IncompleteReadError):
+                        connection.close()
+                        status = None
+                    latencies.append(time.perf_counter() - started)
+                    if status != 200:
+                        errors += 1
+            finally:
+                connection.close()
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker(offset) for offset in range(concurrency)))
+        elapsed = time.perf_counter() - started
+        latencies.sort()
+
+        def percentile(share):
+            return 1000 * latencies[min(len(latencies) - 1, int(share * len(latencies)))] if latencies else 0
+
+        return len(latencies), len(latencies) / elapsed, percentile(0.5), percentile(0.99), errors
@@ -0,0 +1,155 @@
+import json
+import random
+import time
+import uuid
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.renderers import JSONRenderer
+
+from app.models import Account, Client, Transaction
+from app.renderers import ORJSONRenderer
+from app.serializers import COLUMNS, TYPE_DISPLAY, transaction_rows
+
+CHUNK = 10000
+
+
+def legacy_transaction_rows(queryset):
+    """Прежний цикл из views.py: экземпляры моделей с тремя связанными объектами"""
+    transactions_data = []
+    for trans in queryset.select_related('account__client', 'from_account', 'to_account'):
+        display_currency = trans.account.currency
+        if trans.type == 'transfer':
+            if trans.from_account and trans.from_account.id == trans.account.id:
+                display_currency = trans.from_account.currency
+            elif trans.to_account and trans.to_account.id == trans.account.id:
+                display_currency = trans.to_account.currency
+        transactions_data.append({
+            'id': trans.id,
+            'account_number': trans.account.account_number,
+            'client_name': trans.account.client.name,
+            'amount': float(trans.amount),
+            'type': trans.get_type_display(),
+            'description': trans.description,
+            'timestamp': trans.timestamp.isoformat(),
+            'from_account': trans.from_account.account_number if trans.from_account else None,
+            'to_account': trans.to_account.account_number if trans.to_account else None,
+            'currency': display_currency,
+            'from_currency': trans.from_account.currency if trans.from_account else None,
+            'to_currency': trans.to_account.currency if trans.to_account else None,
+        })
+    return transactions_data
+
+
+def float_transaction_rows(queryset):
+    """Прежний transaction_rows: float() и isoformat() для каждой строки"""
+    return [
+        {
+            'id': pk,
+            'account_number': account_number,
+            'client_name': client_name,
+            'amount': float(amount),
+            'type': TYPE_DISPLAY.get(kind, kind),
+            'description': description,
+            'timestamp': timestamp.isoformat(),
+            'from_account': from_number,
+            'to_account': to_number,
+            'currency': currency,
+            'from_currency': from_currency,
+            'to_currency': to_currency,
+        }
+        for (
+            pk, amount, kind, description, timestamp, account_number, currency, client_name,
+            from_number, from_currency, to_number, to_currency,
+        ) in queryset.values_list(*COLUMNS)
+    ]
+
+
+def legacy_json(queryset):
+    return JSONRenderer().render(float_transaction_rows(queryset))
+
+
+def fast_json(queryset):
+    return ORJSONRenderer().render(transaction_rows(queryset))
+
+
+class Command(BaseCommand):
+    help = (
+        'Скорость сериализации списков транзакций: прежний цикл по моделям против values_list, '
+        'затем строки вместе с JSON: float + JSONRenderer против Decimal + ORJSONRenderer'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--rows', default='10000,1000000',
+            help='Размеры выборок через запятую (строки создаются во временных счетах)'
+        )
+
+    def handle(self, *args, **options):
+        sizes = sorted(int(size) for size in options['rows'].split(','))
+        user = User.objects.create_user(username=f'bench_{uuid.uuid4().hex[:12]}')
+        client = Client.objects.get(user=user)
+        try:
+            rub = Account.objects.create(client=client, currency='RUB')
+            usd = Account.objects.create(client=client, currency='USD')
+            self.populate(rub, usd, sizes[-1])
+            ids = list(
+                Transaction.objects.filter(account__in=[rub, usd]).order_by('id').values_list('id', flat=True)
+            )
+
+            sample = Transaction.objects.filter(id__in=ids[:1000]).order_by('-timestamp', '-id')
+            if legacy_transaction_rows(sample) != float_transaction_rows(sample):
+                raise CommandError('Результаты сериализаторов различаются')
+            if json.loads(legacy_json(sample)) != json.loads(fast_json(sample)):
+                raise CommandError('JSON рендереров различается')
+
+            self.stdout.write(f'{"строк":>10}{"прежний, строк/с":>20}{"values_list, строк/с":>24}{"ускорение":>12}')
+            for size in sizes:
+                legacy = self.measure(legacy_transaction_rows, ids[:size])
+                fast = self.measure(float_transaction_rows, ids[:size])
+                self.stdout.write(
+                    f'{size:>10}{size / legacy:>20.0f}{size / fast:>24.0f}{legacy / fast:>11.1f}x'
+                )
+
+            self.stdout.write(f'{"строк":>10}{"float + DRF, строк/с":>24}{"Decimal + orjson, строк/с":>28}{"ускорение":>12}')
+            for size in sizes:
+                legacy = self.measure(legacy_json, ids[:size])
+                fast = self.measure(fast_json, ids[:size])
+                self.stdout.write(
+                    f'{size:>10}{size / legacy:>24.0f}{size / fast:>28.0f}{legacy / fast:>11.1f}x'
+                )
+        finally:
+            user.delete()
+
+    def populate(self, rub, usd, count):
+        """Создает count транзакций: пополнения, снятия и переводы в обе стороны"""
+        rnd = random.Random(0)
+        batch = []
+        for i in range(count):
+            kind = rnd.choice(('deposit', 'withdraw', 'transfer'))
+            account = rnd.choice((rub, usd))
+            other = usd if account is rub else rub
+            transaction = Transaction(
+                account=account,
+                amount=Decimal(rnd.randint(1, 100000)) / 100,
+                type=kind,
+                description=f'bench {i}',
+            )
+            if kind == 'transfer':
+                incoming = rnd.random() < 0.5
+                transaction.from_account = other if incoming else account
+                transaction.to_account = account if incoming else other
+            batch.append(transaction)
+            if len(batch) == CHUNK:
+                Transaction.objects.bulk_create(batch)
+                batch = []
+        Transaction.objects.bulk_create(batch)
+
+    def measure(self, serialize, ids):
+        """Время сериализации строк частями по CHUNK (память не растет с размером)"""
+        started = time.perf_counter()
+        for start in range(0, len(ids), CHUNK):
+            chunk = ids[start:start + CHUNK]
+            serialize(Transaction.objects.filter(id__gte=chunk[0], id__lte=chunk[-1]).order_by('-timestamp', '-id'))
+        return time.perf_counter() - started
@@ -0,0 +1,132 @@
+import multiprocessing
+import random
+import time
+import uuid
+from decimal import Decimal
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import OperationalError, connection, connections
+from django.test.utils import override_settings
+
+from app import database, posting, serializers
+from app.models import Account, Client, Transaction
+
+
+class Command(BaseCommand):
+    help = (
+        'Смешанная нагрузка на SQLite (проводки и чтение списков из отдельных процессов, '
+        'как у нескольких воркеров сервера): '
+        'журнал по умолчанию и чтение через default против SQLITE_PRAGMAS и алиаса чтения. '
+        'Запускайте при остановленном сервере: сменить режим журнала можно только без других соединений'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--writers', type=int, default=4)
+        parser.add_argument('--readers', type=int, default=8)
+        parser.add_argument('--duration', type=float, default=10, help='Секунд на режим')
+        parser.add_argument('--accounts', type=int, default=20)
+        parser.add_argument('--history', type=int, default=2000, help='Транзакций на счетах до замера')
+
+    def handle(self, *args, **options):
+        user = User.objects.create_user(username=f'bench_{uuid.uuid4().hex[:12]}')
+        client = Client.objects.get(user=user)
+        try:
+            accounts = [
+                Account.objects.create(client=client, balance=Decimal('100000.00'), currency='RUB')
+                for _ in range(options['accounts'])
+            ]
+            rnd = random.Random(0)
+            Transaction.objects.bulk_create(
+                Transaction(account=rnd.choice(accounts), amount=Decimal('1.00'), type='deposit', description='bench')
+                for _ in range(options['history'])
+            )
+            modes = [
+                ('по умолчанию', {'journal_mode': 'delete'}, None),
+                ('PRAGMA + чтение', settings.SQLITE_PRAGMAS, settings.DATABASE_READ_ALIAS),
+            ]
+            self.stdout.write(
+                f'{"режим":<18}{"журнал":>8}{"записей/с":>11}{"чтений/с":>10}'
+                f'{"p99 записи":>12}{"p99 чтения":>12}{"locked":>8}'
+            )
+            for title, pragmas, read_alias in modes:
+                connections.close_all()
+                with override_settings(SQLITE_PRAGMAS=pragmas, DATABASE_READ_ALIAS=read_alias):
+                    journal = connection.cursor().execute('PRAGMA journal_mode').fetchone()[0]
+                    writes, reads, locked = self.run(client, accounts, options)
+                connections.close_all()
+                duration = options['duration']
+                self.stdout.write(
+                    f'{title:<18}{journal:>8}{len(writes) / duration:>11.0f}{len(reads) / duration:>10.0f}'
+                    f'{self.p99(writes):>10.1f}мс{self.p99(reads):>10.1f}мс{locked:>8}'
+                )
+        finally:
+            user.delete()
+
+    def run(self, client, accounts, options):
+        ids = [account.id for account in accounts]
+        numbers = [account.account_number for account in accounts]
+        deadline = time.time() + options['duration']
+        context = multiprocessing.get_context('fork')
+        results = context.Queue()
+
+        def writer(seed):
+            rnd = random.Random(seed)
+            latencies, errors = [], 0
+            while time.time() < deadline:
+                started = time.perf_counter()
+                try:
+                    if rnd.random() < 0.5:
+                        posting.deposit(rnd.choice(ids), Decimal('1.00'), 'bench')
+                    else:
+                        source, target = rnd.sample(range(len(ids)), 2)
+                        posting.transfer(ids[source], numbers[target], Decimal('1.00'), 'bench')
+                except OperationalError:
+                    errors += 1
+                    continue
+                latencies.append(time.perf_counter() - started)
+            return 'write', latencies, errors
+
+        def reader(seed):
+            rnd = random.Random(seed)
+            latencies, errors = [], 0
+            while time.time() < deadline:
+                started = time.perf_counter()
+                try:
+                    # То же, что эндпоинты счетов пользователя и истории счета
+                    with database.reading():
+                        serializers.account_rows(Account.objects.filter(client=client, is_active=True))
+                        serializers.account_transaction_rows(
+                            Transaction.objects.filter(account_id=rnd.choice(ids)).order_by('-timestamp')[:20]
+                        )
+                except OperationalError:
+                    errors += 1
+                    continue
+                latencies.append(time.perf_counter() - started)
+            return 'read', latencies, errors
+
+        def worker(target, seed):
+            try:
+                results.put(target(seed))
+            finally:
+                connections.close_all()
+
+        # Дочерние процессы не должны наследовать открытые соединения
+        connections.close_all()
+        processes = [context.Process(target=worker, args=(writer, i)) for i in range(options['writers'])]
+        processes += [context.Process(target=worker, args=(reader, 1000 + i)) for i in range(options['readers'])]
+        for process in processes:
+            process.start()
+        writes, reads, locked = [], [], 0
+        for _ in processes:
+            kind, latencies, errors = results.get()
+            (writes if kind == 'write' else reads).extend(latencies)
+            locked += errors
+        for process in processes:
+            process.join()
+        return writes, reads, locked
+
+    def p99(self, latencies):
+        latencies = sorted(latencies)
+        return 1000 * latencies[int(0.99 * (len(latencies) - 1))] if latencies else 0
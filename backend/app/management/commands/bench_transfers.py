@@ -0,0 +1,66 @@
+import json
+import random
+import time
+import uuid
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.test import Client as HttpClient
+
+from app.models import Account, Client
+
+
+class Command(BaseCommand):
+    help = 'Сравнение пропускной способности /api/transfer/ и /api/transfers/batch/ на временных счетах'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--transfers', type=int, default=2000)
+        parser.add_argument('--accounts', type=int, default=50)
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        user = User.objects.create_user(username=f'bench_{uuid.uuid4().hex[:12]}')
+        client = Client.objects.get(user=user)
+        try:
+            accounts = [
+                Account.objects.create(client=client, balance=Decimal('1000000.00'), currency='RUB')
+                for _ in range(options['accounts'])
+            ]
+            rnd = random.Random(options['seed'])
+            transfers = []
+            for _ in range(options['transfers']):
+                source, target = rnd.sample(accounts, 2)
+                transfers.append({
+                    'from_account_id': source.id,
+                    'to_account_number': target.account_number,
+                    'amount': f'{rnd.randint(1, 10000) / 100:.2f}',
+                    'description': 'bench',
+                })
+
+            http = HttpClient(SERVER_NAME='localhost')
+            http.force_login(user)
+
+            started = time.perf_counter()
+            for item in transfers:
+                http.post('/api/transfer/', json.dumps(item), content_type='application/json')
+            single = time.perf_counter() - started
+
+            started = time.perf_counter()
+            for start in range(0, len(transfers), options['batch_size']):
+                http.post(
+                    '/api/transfers/batch/',
+                    json.dumps({'transfers': transfers[start:start + options['batch_size']]}),
+                    content_type='application/json'
+                )
+            batch = time.perf_counter() - started
+
+            count = len(transfers)
+            self.stdout.write(f'{"режим":<32}{"переводов":>10}{"сек":>10}{"перев./сек":>14}')
+            self.stdout.write(f'{"/api/transfer/":<32}{count:>10}{single:>10.2f}{count / single:>14.0f}')
+            self.stdout.write(
+                f'{"/api/transfers/batch/ x" + str(options["batch_size"]):<32}{count:>10}{batch:>10.2f}{count / batch:>14.0f}'
+            )
+        finally:
+            user.delete()
@@ -0,0 +1,210 @@
+import random
+import time
+from datetime import timedelta
+from decimal import Decimal
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction as db_transaction
+from django.utils import timezone
+
+from app import search, stats, versions
+from app.models import Account, Client, Transaction
+
+FIRST_NAMES = ('Иван', 'Мария', 'Алексей', 'Елена', 'Дмитрий', 'Ольга', 'Сергей', 'Анна', 'Павел', 'Наталья')
+LAST_NAMES = ('Петров', 'Сидоров', 'Козлов', 'Новиков', 'Волков', 'Павлов', 'Смирнов', 'Попов', 'Морозов', 'Лебедев')
+
+# Доли валют счетов и типов операций
+CURRENCIES = (('RUB', 0.8), ('USD', 0.1), ('EUR', 0.1))
+OPERATIONS = (('deposit', 0.4), ('withdraw', 0.25), ('transfer', 0.35))
+
+CENT = Decimal('0.01')
+
+# Номера счетов по формату Account.generate_account_number: префикс и 8 случайных цифр
+NUMBER_PREFIX = '40817810'
+NUMBER_RANGE = range(10 ** 7, 10 ** 8)
+
+
+class Command(BaseCommand):
+    help = (
+        'Создает синтетические данные для замеров: пользователей с клиентами, счета и '
+        'журнал операций за последние --days дней. Балансы счетов равны сумме их операций, '
+        'переводы - между счетами одной валюты. Все пишется одной транзакцией БД: '
+        'пользователи, клиенты и счета - bulk_create, журнал - executemany порциями; '
+        'после этого полнотекстовый индекс строится заново, пересчитываются счетчики '
+        'статистики и обороты. Запускайте при остановленном сервере'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--clients', type=int, default=1000)
+        parser.add_argument('--accounts', type=int, default=2000, help='Всего счетов, не меньше числа клиентов')
+        parser.add_argument('--transactions', type=int, default=100000, help='Записей журнала (перевод - две)')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--days', type=int, default=90, help='За сколько последних дней операции')
+        parser.add_argument('--prefix', default='load', help='Логины пользователей: <prefix><номер>')
+        parser.add_argument('--password', default='password123', help='Пароль всех пользователей')
+        parser.add_argument('--chunk-size', type=int, default=10000)
+
+    def handle(self, *args, **options):
+        if options['clients'] < 1 or options['accounts'] < options['clients']:
+            raise CommandError('Нужен хотя бы один клиент и не меньше счетов, чем клиентов')
+        prefix = options['prefix']
+        usernames = [f'{prefix}{number}' for number in range(1, options['clients'] + 1)]
+        existing = User.objects.filter(username__startswith=prefix).values_list('username', flat=True)
+        if not set(usernames).isdisjoint(existing):
+            raise CommandError(f'Пользователи с префиксом {prefix!r} уже есть - укажите другой --prefix')
+
+        rnd = random.Random(options['seed'])
+        started = time.perf_counter()
+        search.drop_triggers(connection)
+        try:
+            with db_transaction.atomic():
+                accounts = self.create_accounts(rnd, usernames, options)
+                rows = self.create_journal(rnd, accounts, options)
+                # Создание через bulk_create не меняет общую версию списка счетов
+                stats.bump(versions.GLOBAL_COUNTER)
+        finally:
+            # Индекс заполняется одним запросом по всему журналу быстрее, чем триггером на каждую строку
+            search.install(connection, rebuild=True)
+        self.stdout.write(f'Клиентов: {len(usernames)}, счетов: {len(accounts)}, записей журнала: {rows} '
+                          f'({time.perf_counter() - started:.1f} с)')
+
+        stats.recount()
+        start = timezone.localdate(timezone.now() - timedelta(days=options['days']))
+        call_command('backfill_rollups', start=start.isoformat(), stdout=self.stdout)
+        self.stdout.write(self.style.SUCCESS(
+            f'Готово: логины {usernames[0]}..{usernames[-1]}, пароль {options["password"]}'
+        ))
+
+    def create_accounts(self, rnd, usernames, options):
+        """Пользователи, клиенты и счета; возвращает [(id, номер, валюта)] счетов"""
+        chunk_size = options['chunk_size']
+        # Один хеш на всех: медленный хешер паролей считается один раз, а не на каждого пользователя
+        password = make_password(options['password'])
+        users = User.objects.bulk_create(
+            (User(username=username, email=f'{username}@example.com', password=password) for username in usernames),
+            batch_size=chunk_size,
+        )
+        clients = Client.objects.bulk_create(
+            (
+                Client(
+                    user_id=user.id,
+                    name=f'{rnd.choice(FIRST_NAMES)} {rnd.choice(LAST_NAMES)}',
+                    phone=f'+7916{rnd.randrange(10 ** 7):07d}',
+                    email=user.email,
+                )
+                for user in users
+            ),
+            batch_size=chunk_size,
+        )
+
+        owners = [client.id for client in clients]
+        owners += [rnd.choice(owners) for _ in range(options['accounts'] - len(owners))]
+        currencies, weights = zip(*CURRENCIES)
+        numbers = self.account_numbers(rnd, len(owners))
+        created = Account.objects.bulk_create(
+            (
+                Account(client_id=client_id, balance=Decimal('0.00'), account_number=number,
+                        currency=rnd.choices(currencies, weights)[0])
+                for client_id, number in zip(owners, numbers)
+            ),
+            batch_size=chunk_size,
+        )
+        return [(account.id, account.account_number, account.currency) for account in created]
+
+    def account_numbers(self, rnd, count):
+        """count свободных номеров счетов, без запроса на каждый номер"""
+        taken = set(Account.objects.filter(account_number__startswith=NUMBER_PREFIX).values_list(
+            'account_number', flat=True
+        ))
+        free = len(NUMBER_RANGE) - sum(
+            1 for number in taken
+            if number[len(NUMBER_PREFIX):].isdigit() and int(number[len(NUMBER_PREFIX):]) in NUMBER_RANGE
+        )
+        if count > free:
+            raise CommandError(f'Свободных номеров счетов {free}, а нужно {count}')
+        numbers = []
+        # Выборка с запасом; повторы и занятые номера отбрасываются, пока номеров не хватает - тянем еще
+        while len(numbers) < count:
+            for value in rnd.sample(NUMBER_RANGE, min(len(NUMBER_RANGE), (count - len(numbers)) * 2)):
+                number = f'{NUMBER_PREFIX}{value}'
+                if number not in taken:
+                    taken.add(number)
+                    numbers.append(number)
+                    if len(numbers) == count:
+                        break
+        return numbers
+
+    def create_journal(self, rnd, accounts, options):
+        """Журнал операций по времени от старых к новым; возвращает число записей.
+
+        Операция, на которую не хватает средств, заменяется пополнением,
+        поэтому балансы не уходят в минус. В конце балансы счетов
+        записываются равными сумме их операций.
+        """
+        ops = connection.ops
+        table = ops.quote_name(Transaction._meta.db_table)
+        # bulk_create заменил бы прошлое время операций текущим (auto_now_add)
+        insert = (
+            f'INSERT INTO {table} (account_id, amount, type, description, timestamp, from_account_id, to_account_id) '
+            f'VALUES (%s, %s, %s, %s, %s, %s, %s)'
+        )
+        balances = {account_id: Decimal('0.00') for account_id, _, _ in accounts}
+        by_currency = {}
+        for account in accounts:
+            by_currency.setdefault(account[2], []).append(account)
+        kinds, weights = zip(*OPERATIONS)
+
+        total = options['transactions']
+        now = timezone.now()
+        step = timedelta(days=options['days']) / max(total, 1)
+        moment = now - timedelta(days=options['days'])
+        rows, batch = 0, []
+        with connection.cursor() as cursor:
+            while rows + len(batch) < total:
+                account_id, number, currency = rnd.choice(accounts)
+                amount = Decimal(rnd.randint(100, 500000)) / 100
+                kind = rnd.choices(kinds, weights)[0]
+                peers = by_currency[currency]
+                if kind != 'deposit' and balances[account_id] < amount:
+                    kind = 'deposit'
+                if kind == 'transfer' and (len(peers) < 2 or rows + len(batch) + 2 > total):
+                    kind = 'withdraw'
+                # Шаг - на запись журнала, а не на операцию: последняя операция приходится на сейчас
+                moment += step * (2 if kind == 'transfer' else 1)
+                timestamp = ops.adapt_datetimefield_value(moment)
+                if kind == 'deposit':
+                    balances[account_id] += amount
+                    batch.append((account_id, amount, kind, 'Пополнение счета', timestamp, None, None))
+                elif kind == 'withdraw':
+                    balances[account_id] -= amount
+                    batch.append((account_id, amount, kind, 'Снятие наличных', timestamp, None, None))
+                else:
+                    to_id, to_number, _ = rnd.choice(peers)
+                    while to_id == account_id:
+                        to_id, to_number, _ = rnd.choice(peers)
+                    balances[account_id] -= amount
+                    balances[to_id] += amount
+                    # Описания - как у posting.transfer (одна валюта, курс 1)
+                    batch.append((account_id, amount, kind, f'Перевод средств → {to_number} (курс: 1.0000)',
+                                  timestamp, account_id, to_id))
+                    batch.append((to_id, amount, kind, f'Перевод средств ← {number} (курс: 1.0000)',
+                                  timestamp, account_id, to_id))
+                if len(batch) >= options['chunk_size']:
+                    cursor.executemany(insert, batch)
+                    rows += len(batch)
+                    batch = []
+                    if options['verbosity'] > 1:
+                        self.stdout.write(f'Записей журнала: {rows}')
+            if batch:
+                cursor.executemany(insert, batch)
+                rows += len(batch)
+
+            account_table = ops.quote_name(Account._meta.db_table)
+            cursor.executemany(
+                f'UPDATE {account_table} SET balance = %s WHERE id = %s',
+                [(balance.quantize(CENT), account_id) for account_id, balance in balances.items()],
+            )
+        return rows
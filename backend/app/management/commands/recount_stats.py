@@ -0,0 +1,23 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from app.stats import recount
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает счетчики статистики админ-панели по таблицам (для запуска по расписанию)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--every', type=int, default=None,
+            help='Повторять пересчет каждые N секунд вместо однократного запуска'
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            values = recount()
+            self.stdout.write(', '.join(f'{name}={value}' for name, value in values.items()))
+            if not options['every']:
+                break
+            time.sleep(options['every'])
@@ -0,0 +1,115 @@
+import random
+import threading
+import uuid
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, OperationalError
+from django.db.models import Sum
+
+from app import posting
+from app.models import Account, Client, Transaction
+
+
+class Command(BaseCommand):
+    help = (
+        'Нагрузочная проверка сервиса проводок: параллельные пополнения, '
+        'снятия и переводы между временными счетами с проверкой, что деньги '
+        'не появляются и не исчезают'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=8)
+        parser.add_argument('--operations', type=int, default=200, help='Операций на поток')
+        parser.add_argument('--accounts', type=int, default=10)
+        parser.add_argument('--initial-balance', type=Decimal, default=Decimal('1000.00'))
+        parser.add_argument('--seed', type=int, default=None)
+
+    def handle(self, *args, **options):
+        user = User.objects.create_user(username=f'stress_{uuid.uuid4().hex[:12]}')
+        client = Client.objects.get(user=user)
+        try:
+            self.run(client, options)
+        finally:
+            user.delete()
+
+    def run(self, client, options):
+        initial = options['initial_balance']
+        accounts = [
+            Account.objects.create(client=client, balance=initial, currency='RUB')
+            for _ in range(options['accounts'])
+        ]
+        ids = [acc.id for acc in accounts]
+        numbers = [acc.account_number for acc in accounts]
+        totals = {'deposited': Decimal('0'), 'withdrawn': Decimal('0'), 'rejected': 0, 'locked': 0}
+        lock = threading.Lock()
+
+        def worker(seed):
+            rnd = random.Random(seed)
+            deposited = withdrawn = Decimal('0')
+            rejected = locked = 0
+            try:
+                for _ in range(options['operations']):
+                    amount = Decimal(rnd.randint(1, 50000)) / 100
+                    operation = rnd.choice(('deposit', 'withdraw', 'transfer', 'transfer'))
+                    try:
+                        if operation == 'deposit':
+                            posting.deposit(rnd.choice(ids), amount, 'stress')
+                            deposited += amount
+                        elif operation == 'withdraw':
+                            posting.withdraw(rnd.choice(ids), amount, 'stress')
+                            withdrawn += amount
+                        else:
+                            source, target = rnd.sample(range(len(ids)), 2)
+                            posting.transfer(ids[source], numbers[target], amount, 'stress')
+                    except (posting.InsufficientFunds, posting.ConcurrentUpdate):
+                        rejected += 1
+                    except OperationalError:
+                        locked += 1
+            finally:
+                connection.close()
+            with lock:
+                totals['deposited'] += deposited
+                totals['withdrawn'] += withdrawn
+                totals['rejected'] += rejected
+                totals['locked'] += locked
+
+        base_seed = options['seed'] if options['seed'] is not None else random.randrange(1 << 30)
+        threads = [threading.Thread(target=worker, args=(base_seed + i,)) for i in range(options['threads'])]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        balances = dict(Account.objects.filter(id__in=ids).values_list('id', 'balance'))
+        expected_total = initial * len(ids) + totals['deposited'] - totals['withdrawn']
+        actual_total = sum(balances.values())
+
+        errors = []
+        if actual_total != expected_total:
+            errors.append(f'Сумма балансов {actual_total} != ожидаемой {expected_total}')
+        for account_id, balance in balances.items():
+            if balance < 0:
+                errors.append(f'Отрицательный баланс на счете {account_id}: {balance}')
+            ledger = self.ledger_delta(account_id)
+            if initial + ledger != balance:
+                errors.append(f'Счет {account_id}: баланс {balance} не совпадает с журналом {initial + ledger}')
+
+        self.stdout.write(
+            f"seed={base_seed} операций={options['threads'] * options['operations']} "
+            f"отклонено={totals['rejected']} database is locked={totals['locked']} "
+            f"итого={actual_total}"
+        )
+        if errors:
+            raise CommandError('\n'.join(errors))
+        self.stdout.write(self.style.SUCCESS('Деньги сохранены: балансы совпадают с журналом операций'))
+
+    def ledger_delta(self, account_id):
+        """Сумма движений по счету по журналу транзакций"""
+        legs = Transaction.objects.filter(account_id=account_id)
+        incoming = legs.filter(type='deposit').aggregate(s=Sum('amount'))['s'] or 0
+        incoming += legs.filter(type='transfer', to_account_id=account_id).aggregate(s=Sum('amount'))['s'] or 0
+        outgoing = legs.filter(type='withdraw').aggregate(s=Sum('amount'))['s'] or 0
+        outgoing += legs.filter(type='transfer', from_account_id=account_id).aggregate(s=Sum('amount'))['s'] or 0
+        return incoming - outgoing
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from app.idempotency import sweep_expired
+
+
+class Command(BaseCommand):
+    help = 'Удаляет просроченные ключи идемпотентности пачками (для запуска по расписанию)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=None)
+
+    def handle(self, *args, **options):
+        total = 0
+        while True:
+            deleted = sweep_expired(options['batch_size'])
+            if not deleted:
+                break
+            total += deleted
+        self.stdout.write(f'Удалено ключей: {total}')
@@ -0,0 +1,142 @@
+"""Метрики проводок процесса: попытки, конфликты версий и время под блокировкой.
+
+Для каждого режима переводов (``POSTING_MODE``, см. posting.py) в памяти
+процесса хранятся счетчики переводов, дошедших до записи, и последние
+``POSTING_METRICS_SAMPLES`` замеров длительности перевода и времени, которое
+он держал блокировку на запись (от первой записи до фиксации или отката). Метрики отдает эндпоинт
+``admin/posting-metrics/``; у каждого воркера сервера они свои.
+"""
+import threading
+import time
+from collections import deque
+
+from django.conf import settings
+
+DEFAULT_SAMPLES = 10000
+
+COUNTERS = ('operations', 'attempts', 'conflicts', 'exhausted')
+
+_lock = threading.Lock()
+_modes = {}
+
+
+class Operation:
+    """Замер одного перевода: попытки записи и суммарное время под блокировкой"""
+
+    def __init__(self, mode):
+        self.mode = mode
+        self.attempts = 0
+        self.conflicts = 0
+        self.exhausted = False
+        self.lock_hold = 0.0
+        self._started = time.perf_counter()
+        self._locked_at = None
+
+    def attempt(self):
+        """Начало попытки записи (блок with вокруг транзакции БД)"""
+        self.attempts += 1
+        self._locked_at = None
+        return self
+
+    def locked(self):
+        """Первая запись выполнена - с этого момента блокировка удерживается"""
+        if self._locked_at is None:
+            self._locked_at = time.perf_counter()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        if self._locked_at is not None:
+            self.lock_hold += time.perf_counter() - self._locked_at
+            self._locked_at = None
+
+    def finish(self):
+        """Записывает замер, если перевод дошел до записи"""
+        if not self.attempts:
+            return
+        record(self.mode, self.attempts, self.conflicts, time.perf_counter() - self._started,
+               self.lock_hold, self.exhausted)
+
+
+def _state(mode):
+    state = _modes.get(mode)
+    if state is None:
+        size = getattr(settings, 'POSTING_METRICS_SAMPLES', DEFAULT_SAMPLES)
+        state = _modes[mode] = {
+            'counters': dict.fromkeys(COUNTERS, 0),
+            'latency': deque(maxlen=size),
+            'lock_hold': deque(maxlen=size),
+        }
+    return state
+
+
+def record(mode, attempts, conflicts, latency, lock_hold, exhausted=False):
+    """Учитывает перевод: попытки, конфликты, длительность и время под блокировкой (секунды)"""
+    with _lock:
+        state = _state(mode)
+        counters = state['counters']
+        counters['operations'] += 1
+        counters['attempts'] += attempts
+        counters['conflicts'] += conflicts
+        counters['exhausted'] += exhausted
+        state['latency'].append(latency)
+        state['lock_hold'].append(lock_hold)
+
+
+def export():
+    """Копия метрик процесса: {режим: {'counters', 'latency', 'lock_hold'}}"""
+    with _lock:
+        return {
+            mode: {
+                'counters': dict(state['counters']),
+                'latency': list(state['latency']),
+                'lock_hold': list(state['lock_hold']),
+            }
+            for mode, state in _modes.items()
+        }
+
+
+def reset():
+    with _lock:
+        _modes.clear()
+
+
+def _percentile(samples, fraction):
+    if not samples:
+        return None
+    return round(samples[min(len(samples) - 1, int(len(samples) * fraction))] * 1000, 3)
+
+
+def summary(exported=None):
+    """Сводка по режимам; exported - результат export() (или объединение нескольких), мс"""
+    if exported is None:
+        exported = export()
+    result = {}
+    for mode, state in exported.items():
+        counters = state['counters']
+        latency, lock_hold = sorted(state['latency']), sorted(state['lock_hold'])
+        result[mode] = {
+            **counters,
+            'retries': counters['attempts'] - counters['operations'],
+            'latency_p50_ms': _percentile(latency, 0.5),
+            'latency_p99_ms': _percentile(latency, 0.99),
+            'lock_hold_p50_ms': _percentile(lock_hold, 0.5),
+            'lock_hold_p99_ms': _percentile(lock_hold, 0.99),
+        }
+    return result
+
+
+def merge(exports):
+    """Объединяет export() нескольких процессов"""
+    merged = {}
+    for exported in exports:
+        for mode, state in exported.items():
+            target = merged.setdefault(mode, {
+                'counters': dict.fromkeys(COUNTERS, 0), 'latency': [], 'lock_hold': [],
+            })
+            for name, value in state['counters'].items():
+                target['counters'][name] += value
+            target['latency'] += state['latency']
+            target['lock_hold'] += state['lock_hold']
+    return merged
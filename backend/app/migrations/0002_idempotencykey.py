@@ -0,0 +1,34 @@
+# Generated by Django 5.0.1 on 2026-10-18 08:08
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='IdempotencyKey',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(max_length=255, verbose_name='Ключ')),
+                ('endpoint', models.CharField(max_length=100, verbose_name='Endpoint')),
+                ('request_hash', models.CharField(max_length=64, verbose_name='Хеш запроса')),
+                ('status_code', models.PositiveSmallIntegerField(blank=True, null=True, verbose_name='Код ответа')),
+                ('response', models.JSONField(blank=True, null=True, verbose_name='Ответ')),
+                ('created_at', models.DateTimeField(auto_now_add=True, db_index=True, verbose_name='Создан')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='idempotency_keys', to=settings.AUTH_USER_MODEL, verbose_name='Пользователь')),
+            ],
+            options={
+                'verbose_name': 'Ключ идемпотентности',
+                'verbose_name_plural': 'Ключи идемпотентности',
+                'unique_together': {('user', 'key')},
+            },
+        ),
+    ]
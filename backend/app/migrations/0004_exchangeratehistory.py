@@ -0,0 +1,45 @@
+# Generated by Django 5.0.1 on 2026-10-18 08:11
+
+from django.db import migrations, models
+
+
+def seed_history(apps, schema_editor):
+    """Текущие курсы становятся первыми записями истории"""
+    ExchangeRate = apps.get_model('app', 'ExchangeRate')
+    ExchangeRateHistory = apps.get_model('app', 'ExchangeRateHistory')
+    ExchangeRateHistory.objects.bulk_create([
+        ExchangeRateHistory(
+            from_currency=rate.from_currency,
+            to_currency=rate.to_currency,
+            rate=rate.rate,
+            valid_from=rate.updated_at,
+        )
+        for rate in ExchangeRate.objects.all()
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0003_exchange_rate_positive'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ExchangeRateHistory',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('from_currency', models.CharField(max_length=3, verbose_name='Из валюты')),
+                ('to_currency', models.CharField(max_length=3, verbose_name='В валюту')),
+                ('rate', models.DecimalField(blank=True, decimal_places=4, max_digits=10, null=True, verbose_name='Курс')),
+                ('valid_from', models.DateTimeField(db_index=True, verbose_name='Действует с')),
+            ],
+            options={
+                'verbose_name': 'История курса',
+                'verbose_name_plural': 'История курсов',
+                'ordering': ['valid_from', 'id'],
+                'indexes': [models.Index(fields=['from_currency', 'to_currency', 'valid_from'], name='app_exchang_from_cu_9b9695_idx')],
+            },
+        ),
+        migrations.RunPython(seed_history, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.0.1 on 2026-10-18 08:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0004_exchangeratehistory'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['timestamp', 'id'], name='app_transac_timesta_69c1cb_idx'),
+        ),
+    ]
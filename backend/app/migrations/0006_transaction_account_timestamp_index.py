@@ -0,0 +1,17 @@
+# Generated by Django 5.0.1 on 2026-10-18 08:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0005_transaction_timestamp_id_index'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['account', 'timestamp', 'id'], name='app_transac_account_dbf777_idx'),
+        ),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 5.0.1 on 2026-10-18 08:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0006_transaction_account_timestamp_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StatCounter',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=50, unique=True, verbose_name='Счетчик')),
+                ('value', models.BigIntegerField(default=0, verbose_name='Значение')),
+                ('recounted_at', models.DateTimeField(blank=True, null=True, verbose_name='Пересчитан')),
+            ],
+            options={
+                'verbose_name': 'Счетчик статистики',
+                'verbose_name_plural': 'Счетчики статистики',
+            },
+        ),
+    ]
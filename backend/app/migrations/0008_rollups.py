@@ -0,0 +1,49 @@
+# Generated by Django 5.0.1 on 2026-10-18 08:29
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0007_statcounter'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('currency', models.CharField(max_length=3, verbose_name='Валюта')),
+                ('type', models.CharField(choices=[('deposit', 'Пополнение'), ('withdraw', 'Снятие'), ('transfer', 'Перевод')], max_length=10, verbose_name='Тип')),
+                ('count', models.BigIntegerField(default=0, verbose_name='Количество')),
+                ('amount', models.DecimalField(decimal_places=2, default=0, max_digits=20, verbose_name='Оборот')),
+                ('inflow', models.DecimalField(decimal_places=2, default=0, max_digits=20, verbose_name='Зачисления')),
+                ('outflow', models.DecimalField(decimal_places=2, default=0, max_digits=20, verbose_name='Списания')),
+                ('day', models.DateField(verbose_name='День')),
+            ],
+            options={
+                'verbose_name': 'Обороты за день',
+                'verbose_name_plural': 'Обороты по дням',
+                'unique_together': {('day', 'currency', 'type')},
+            },
+        ),
+        migrations.CreateModel(
+            name='HourlyRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('currency', models.CharField(max_length=3, verbose_name='Валюта')),
+                ('type', models.CharField(choices=[('deposit', 'Пополнение'), ('withdraw', 'Снятие'), ('transfer', 'Перевод')], max_length=10, verbose_name='Тип')),
+                ('count', models.BigIntegerField(default=0, verbose_name='Количество')),
+                ('amount', models.DecimalField(decimal_places=2, default=0, max_digits=20, verbose_name='Оборот')),
+                ('inflow', models.DecimalField(decimal_places=2, default=0, max_digits=20, verbose_name='Зачисления')),
+                ('outflow', models.DecimalField(decimal_places=2, default=0, max_digits=20, verbose_name='Списания')),
+                ('hour', models.DateTimeField(verbose_name='Час')),
+            ],
+            options={
+                'verbose_name': 'Обороты за час',
+                'verbose_name_plural': 'Обороты по часам',
+                'unique_together': {('hour', 'currency', 'type')},
+            },
+        ),
+    ]
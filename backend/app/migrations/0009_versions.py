@@ -0,0 +1,38 @@
+# Generated by Django 5.0.1 on 2026-10-18 08:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0008_rollups'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='account',
+            name='modified_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True, verbose_name='Изменен'),
+        ),
+        migrations.AddField(
+            model_name='account',
+            name='version',
+            field=models.PositiveBigIntegerField(default=0, editable=False, verbose_name='Версия'),
+        ),
+        migrations.AddField(
+            model_name='client',
+            name='modified_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True, verbose_name='Изменен'),
+        ),
+        migrations.AddField(
+            model_name='client',
+            name='version',
+            field=models.PositiveBigIntegerField(default=0, editable=False, verbose_name='Версия'),
+        ),
+        migrations.AddField(
+            model_name='statcounter',
+            name='updated_at',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='Изменен'),
+        ),
+    ]
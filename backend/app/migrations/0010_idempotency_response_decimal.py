@@ -0,0 +1,19 @@
+# Generated by Django 5.0.1 on 2026-10-18 09:06
+
+import app.renderers
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0009_versions'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='idempotencykey',
+            name='response',
+            field=models.JSONField(blank=True, decoder=app.renderers.DecimalJSONDecoder, encoder=app.renderers.DecimalJSONEncoder, null=True, verbose_name='Ответ'),
+        ),
+    ]
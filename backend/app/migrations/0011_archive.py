@@ -0,0 +1,48 @@
+# Generated by Django 5.0.1 on 2026-10-18 09:23
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0010_idempotency_response_decimal'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BalanceMarker',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('balance', models.DecimalField(decimal_places=2, max_digits=12, verbose_name='Остаток')),
+                ('archived_until', models.DateTimeField(verbose_name='Архив по')),
+                ('archived_count', models.PositiveBigIntegerField(default=0, verbose_name='Транзакций в архиве')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Обновлен')),
+                ('account', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='balance_marker', to='app.account', verbose_name='Счет')),
+            ],
+            options={
+                'verbose_name': 'Перенесенный остаток',
+                'verbose_name_plural': 'Перенесенные остатки',
+            },
+        ),
+        migrations.CreateModel(
+            name='ArchivedTransaction',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False, verbose_name='ID')),
+                ('amount', models.DecimalField(decimal_places=2, max_digits=12, verbose_name='Сумма')),
+                ('type', models.CharField(choices=[('deposit', 'Пополнение'), ('withdraw', 'Снятие'), ('transfer', 'Перевод')], max_length=20, verbose_name='Тип операции')),
+                ('description', models.TextField(blank=True, verbose_name='Описание')),
+                ('timestamp', models.DateTimeField(verbose_name='Время операции')),
+                ('account', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archived_transactions', to='app.account', verbose_name='Счет')),
+                ('from_account', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='app.account', verbose_name='Со счета')),
+                ('to_account', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='app.account', verbose_name='На счет')),
+            ],
+            options={
+                'verbose_name': 'Архивная транзакция',
+                'verbose_name_plural': 'Архив транзакций',
+                'ordering': ['-timestamp'],
+                'indexes': [models.Index(fields=['timestamp', 'id'], name='app_archive_timesta_c8f95d_idx'), models.Index(fields=['account', 'timestamp', 'id'], name='app_archive_account_d96842_idx')],
+            },
+        ),
+    ]
@@ -1,9 +1,36 @@
 import random
+from decimal import Decimal
+from django.core.validators import MinValueValidator
 from django.db import models
 from django.contrib.auth.models import User
+from django.db.models import F
 from django.db.models.signals import post_save
+from django.utils import timezone
 from django.dispatch import receiver
 
+from .renderers import DecimalJSONDecoder, DecimalJSONEncoder
+
+def _save_versioned(instance, save, args, kwargs):
+    """Сохраняет запись вместе с новыми version и modified_at одним запросом.
+
+    Для существующей записи версия пишется как version + 1 прямо в UPDATE:
+    сохранение устаревшего экземпляра не вернет ее назад, а отдельный
+    UPDATE после сохранения не нужен.
+    """
+    update_fields = kwargs.get('update_fields')
+    if update_fields is not None:
+        if not update_fields:
+            return save(*args, **kwargs)
+        kwargs['update_fields'] = {*update_fields, 'version', 'modified_at'}
+    instance.modified_at = timezone.now()
+    if instance._state.adding:
+        return save(*args, **kwargs)
+    instance.version = F('version') + 1
+    save(*args, **kwargs)
+    # Значение поля - выражение; без него поле отложено и перечитается при обращении
+    del instance.__dict__['version']
+
+
 class Client(models.Model):
     user = models.OneToOneField(
         User, 
@@ -30,12 +57,15 @@ class Client(models.Model):
         # Автоматически заполняем имя из username, если не указано
         if not self.name:
             self.name = self.user.username
-        super().save(*args, **kwargs)
+        _save_versioned(self, super().save, args, kwargs)
     user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='client')
     name = models.CharField(max_length=100, verbose_name="Имя клиента")
     phone = models.CharField(max_length=15, blank=True, verbose_name="Телефон")
     email = models.EmailField(blank=True, verbose_name="Email")
     created_at = models.DateTimeField(auto_now_add=True, verbose_name="Дата создания")
+    # Версия профиля и всех счетов клиента (ETag списка счетов), см. versions.py
+    version = models.PositiveBigIntegerField(default=0, editable=False, verbose_name="Версия")
+    modified_at = models.DateTimeField(null=True, blank=True, editable=False, verbose_name="Изменен")
 
     class Meta:
         verbose_name = "Клиент"
@@ -51,6 +81,9 @@ class Account(models.Model):
     account_number = models.CharField(max_length=20, unique=True, verbose_name="Номер счета")
     created_at = models.DateTimeField(auto_now_add=True, verbose_name="Дата создания")
     is_active = models.BooleanField(default=True, verbose_name="Активен")
+    # Увеличивается при каждом изменении счета, в том числе проводками
+    version = models.PositiveBigIntegerField(default=0, editable=False, verbose_name="Версия")
+    modified_at = models.DateTimeField(null=True, blank=True, editable=False, verbose_name="Изменен")
 
     class Meta:
         verbose_name = "Счет"
@@ -59,6 +92,13 @@ class Account(models.Model):
     def __str__(self):
         return f"{self.client.name} - {self.balance} {self.currency}"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Активность при загрузке: stats учитывает ее изменение без повторного чтения счета
+        instance._loaded_is_active = instance.__dict__.get('is_active')
+        return instance
+
     @classmethod
     def generate_account_number(cls):
         """Генерация уникального номера счета"""
@@ -72,7 +112,7 @@ class Account(models.Model):
         """Автоматическая генерация номера счета при создании"""
         if not self.account_number:
             self.account_number = self.generate_account_number()
-        super().save(*args, **kwargs)
+        _save_versioned(self, super().save, args, kwargs)
 
 class Transaction(models.Model):
     TRANSACTION_TYPES = [
@@ -95,10 +135,62 @@ class Transaction(models.Model):
         verbose_name = "Транзакция"
         verbose_name_plural = "Транзакции"
         ordering = ['-timestamp']
+        indexes = [
+            # Ключ keyset-пагинации ленты транзакций
+            models.Index(fields=['timestamp', 'id']),
+            # Последние операции счета (история счета, сводка дашборда)
+            models.Index(fields=['account', 'timestamp', 'id']),
+        ]
 
     def __str__(self):
         return f"{self.account.client.name} - {self.get_type_display()} {self.amount}"
 
+
+class ArchivedTransaction(models.Model):
+    """Транзакция, перенесенная из журнала в архив (см. archive.py).
+
+    Поля и их колонки совпадают с ``Transaction``, id сохраняется.
+    """
+    id = models.BigIntegerField(primary_key=True, verbose_name="ID")
+    account = models.ForeignKey(Account, on_delete=models.CASCADE, verbose_name="Счет", related_name='archived_transactions')
+    amount = models.DecimalField(max_digits=12, decimal_places=2, verbose_name="Сумма")
+    type = models.CharField(max_length=20, choices=Transaction.TRANSACTION_TYPES, verbose_name="Тип операции")
+    description = models.TextField(blank=True, verbose_name="Описание")
+    timestamp = models.DateTimeField(verbose_name="Время операции")
+    from_account = models.ForeignKey(Account, on_delete=models.SET_NULL, null=True, blank=True,
+                                     related_name='+', verbose_name="Со счета")
+    to_account = models.ForeignKey(Account, on_delete=models.SET_NULL, null=True, blank=True,
+                                   related_name='+', verbose_name="На счет")
+
+    class Meta:
+        verbose_name = "Архивная транзакция"
+        verbose_name_plural = "Архив транзакций"
+        ordering = ['-timestamp']
+        indexes = [
+            models.Index(fields=['timestamp', 'id']),
+            models.Index(fields=['account', 'timestamp', 'id']),
+        ]
+
+    def __str__(self):
+        return f"{self.account.client.name} - {self.get_type_display()} {self.amount}"
+
+
+class BalanceMarker(models.Model):
+    """Перенесенный остаток счета: баланс после последней транзакции, ушедшей в архив"""
+    account = models.OneToOneField(Account, on_delete=models.CASCADE, related_name='balance_marker', verbose_name="Счет")
+    balance = models.DecimalField(max_digits=12, decimal_places=2, verbose_name="Остаток")
+    # Время последней архивной транзакции счета: все более ранние - в архиве
+    archived_until = models.DateTimeField(verbose_name="Архив по")
+    archived_count = models.PositiveBigIntegerField(default=0, verbose_name="Транзакций в архиве")
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="Обновлен")
+
+    class Meta:
+        verbose_name = "Перенесенный остаток"
+        verbose_name_plural = "Перенесенные остатки"
+
+    def __str__(self):
+        return f"{self.account_id}: {self.balance} на {self.archived_until}"
+
 # Сигнал для автоматического создания клиента при создании пользователя
 @receiver(post_save, sender=User)
 def create_client_profile(sender, instance, created, **kwargs):
@@ -123,7 +215,10 @@ def save_client_profile(sender, instance, **kwargs):
 class ExchangeRate(models.Model):
     from_currency = models.CharField(max_length=3, verbose_name="Из валюты")
     to_currency = models.CharField(max_length=3, verbose_name="В валюту")
-    rate = models.DecimalField(max_digits=10, decimal_places=4, verbose_name="Курс")
+    # Обратный курс считается как 1 / курс, поэтому курс строго положителен
+    rate = models.DecimalField(
+        max_digits=10, decimal_places=4, validators=[MinValueValidator(Decimal('0.0001'))], verbose_name="Курс"
+    )
     updated_at = models.DateTimeField(auto_now=True, verbose_name="Обновлено")
 
     class Meta:
@@ -132,4 +227,97 @@ class ExchangeRate(models.Model):
         unique_together = ['from_currency', 'to_currency']
 
     def __str__(self):
-        return f"{self.from_currency} → {self.to_currency}: {self.rate}"
\ No newline at end of file
+        return f"{self.from_currency} → {self.to_currency}: {self.rate}"
+
+class IdempotencyKey(models.Model):
+    """Ответ денежной операции, сохраненный по заголовку Idempotency-Key"""
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='idempotency_keys', verbose_name="Пользователь")
+    key = models.CharField(max_length=255, verbose_name="Ключ")
+    endpoint = models.CharField(max_length=100, verbose_name="Endpoint")
+    request_hash = models.CharField(max_length=64, verbose_name="Хеш запроса")
+    # Пустой статус - запрос с этим ключом еще выполняется
+    status_code = models.PositiveSmallIntegerField(null=True, blank=True, verbose_name="Код ответа")
+    # Суммы в ответе - Decimal: кодируются и читаются без потери точности
+    response = models.JSONField(
+        null=True, blank=True, encoder=DecimalJSONEncoder, decoder=DecimalJSONDecoder, verbose_name="Ответ"
+    )
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True, verbose_name="Создан")
+
+    class Meta:
+        verbose_name = "Ключ идемпотентности"
+        verbose_name_plural = "Ключи идемпотентности"
+        unique_together = ['user', 'key']
+
+    def __str__(self):
+        return f"{self.user_id}: {self.key}"
+
+
+class ExchangeRateHistory(models.Model):
+    """История курсов: запись действует с valid_from до следующей записи той же пары"""
+    from_currency = models.CharField(max_length=3, verbose_name="Из валюты")
+    to_currency = models.CharField(max_length=3, verbose_name="В валюту")
+    # Пустой курс - пара удалена из таблицы курсов
+    rate = models.DecimalField(max_digits=10, decimal_places=4, null=True, blank=True, verbose_name="Курс")
+    valid_from = models.DateTimeField(db_index=True, verbose_name="Действует с")
+
+    class Meta:
+        verbose_name = "История курса"
+        verbose_name_plural = "История курсов"
+        ordering = ['valid_from', 'id']
+        indexes = [models.Index(fields=['from_currency', 'to_currency', 'valid_from'])]
+
+    def __str__(self):
+        return f"{self.from_currency} → {self.to_currency}: {self.rate} с {self.valid_from}"
+
+
+class StatCounter(models.Model):
+    """Счетчик статистики админ-панели, поддерживаемый при записи данных"""
+    name = models.CharField(max_length=50, unique=True, verbose_name="Счетчик")
+    value = models.BigIntegerField(default=0, verbose_name="Значение")
+    updated_at = models.DateTimeField(null=True, blank=True, verbose_name="Изменен")
+    recounted_at = models.DateTimeField(null=True, blank=True, verbose_name="Пересчитан")
+
+    class Meta:
+        verbose_name = "Счетчик статистики"
+        verbose_name_plural = "Счетчики статистики"
+
+    def __str__(self):
+        return f"{self.name}: {self.value}"
+
+
+class Rollup(models.Model):
+    """Обороты журнала за период по валюте счета и типу операции"""
+    currency = models.CharField(max_length=3, verbose_name="Валюта")
+    type = models.CharField(max_length=10, choices=Transaction.TRANSACTION_TYPES, verbose_name="Тип")
+    # Число записей журнала (перевод дает по записи у отправителя и получателя)
+    count = models.BigIntegerField(default=0, verbose_name="Количество")
+    amount = models.DecimalField(max_digits=20, decimal_places=2, default=0, verbose_name="Оборот")
+    inflow = models.DecimalField(max_digits=20, decimal_places=2, default=0, verbose_name="Зачисления")
+    outflow = models.DecimalField(max_digits=20, decimal_places=2, default=0, verbose_name="Списания")
+
+    class Meta:
+        abstract = True
+
+
+class DailyRollup(Rollup):
+    day = models.DateField(verbose_name="День")
+
+    class Meta:
+        verbose_name = "Обороты за день"
+        verbose_name_plural = "Обороты по дням"
+        unique_together = ['day', 'currency', 'type']
+
+    def __str__(self):
+        return f"{self.day} {self.currency} {self.type}: {self.count}"
+
+
+class HourlyRollup(Rollup):
+    hour = models.DateTimeField(verbose_name="Час")
+
+    class Meta:
+        verbose_name = "Обороты за час"
+        verbose_name_plural = "Обороты по часам"
+        unique_together = ['hour', 'currency', 'type']
+
+    def __str__(self):
+        return f"{self.hour} {self.currency} {self.type}: {self.count}"
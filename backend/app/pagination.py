@@ -0,0 +1,128 @@
+"""Keyset-пагинация ленты транзакций по ключу (timestamp, id).
+
+Вместо растущего ``limit`` клиент передает непрозрачный курсор последней
+полученной строки, и следующая страница выбирается условием
+``(timestamp, id) < (курсор)`` по индексу: стоимость страницы не зависит
+от того, насколько глубоко клиент пролистал ленту.
+
+Условие записано как ``timestamp <= t AND NOT (timestamp = t AND id >= pk)``:
+в таком виде SQLite ищет по диапазону индекса, а вариант с OR
+сканирует индекс с начала.
+"""
+import base64
+import json
+from datetime import datetime
+
+from django.db import models
+
+DEFAULT_PAGE_SIZE = 10
+MAX_PAGE_SIZE = 4000
+
+
+class InvalidCursor(ValueError):
+    """Курсор поврежден или создан не этим сервером"""
+
+
+def encode_cursor(timestamp, pk):
+    if not isinstance(timestamp, str):
+        timestamp = timestamp.isoformat()
+    payload = json.dumps([timestamp, pk], separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor):
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        timestamp, pk = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+        return datetime.fromisoformat(timestamp), int(pk)
+    except (ValueError, TypeError, UnicodeError):
+        raise InvalidCursor(cursor)
+
+
+def page_size(value, default=DEFAULT_PAGE_SIZE):
+    """Размер страницы из параметра запроса, в пределах 1..MAX_PAGE_SIZE"""
+    try:
+        size = int(value)
+    except (ValueError, TypeError):
+        return default
+    if size < 1:
+        return default
+    return min(size, MAX_PAGE_SIZE)
+
+
+def _after(queryset, timestamp, pk):
+    """Строки строго после (timestamp, pk) в порядке убывания ключа"""
+    return queryset.filter(
+        models.Q(timestamp__lte=timestamp) & ~models.Q(timestamp=timestamp, id__gte=pk)
+    )
+
+
+def _page_queryset(queryset, after, limit):
+    queryset = queryset.order_by('-timestamp', '-id')
+    if after:
+        queryset = _after(queryset, *after)
+    return queryset[:limit + 1]
+
+
+def _page(rows, limit):
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    return rows, encode_cursor(rows[-1]['timestamp'], rows[-1]['id'])
+
+
+def _archive_after(rows, after):
+    """Ключ, после которого страница продолжается в архиве"""
+    return (rows[-1]['timestamp'], rows[-1]['id']) if rows else after
+
+
+def paginate(queryset, cursor, limit, serialize, archive=None):
+    """Страница транзакций, начиная после курсора.
+
+    ``serialize`` превращает срез queryset в список словарей с ключами
+    ``id`` и ``timestamp``. Возвращает (строки страницы, курсор следующей
+    страницы или None). Запрашивается на одну строку больше, чтобы узнать,
+    есть ли продолжение.
+
+    ``archive`` - та же выборка по архиву транзакций (archive.py): она
+    читается, только если строк журнала не хватило на страницу.
+    """
+    after = decode_cursor(cursor) if cursor else None
+    rows = serialize(_page_queryset(queryset, after, limit))
+    if archive is not None and len(rows) <= limit:
+        rows += serialize(_page_queryset(archive, _archive_after(rows, after), limit - len(rows)))
+    return _page(rows, limit)
+
+
+async def apaginate(queryset, cursor, limit, aserialize, archive=None):
+    """paginate для async-представлений (``aserialize`` - корутина)"""
+    after = decode_cursor(cursor) if cursor else None
+    rows = await aserialize(_page_queryset(queryset, after, limit))
+    if archive is not None and len(rows) <= limit:
+        rows += await aserialize(_page_queryset(archive, _archive_after(rows, after), limit - len(rows)))
+    return _page(rows, limit)
+
+
+def keyset_chunks(queryset, fields, chunk_size, archive=None):
+    """Все строки queryset кортежами ``fields`` порциями по chunk_size.
+
+    Каждая порция - отдельный короткий запрос по ключу (timestamp, id),
+    поэтому память не растет с объемом выборки, а чтение не держит одну
+    транзакцию БД открытой на все время выгрузки. ``fields`` должны
+    включать ``timestamp`` и ``id``. ``archive`` - та же выборка по архиву,
+    она читается после журнала.
+    """
+    timestamp_position, id_position = fields.index('timestamp'), fields.index('id')
+    after = None
+    for part in (queryset, archive):
+        if part is None:
+            continue
+        part = part.order_by('-timestamp', '-id')
+        while True:
+            chunk = _after(part, *after) if after else part
+            rows = list(chunk.values_list(*fields)[:chunk_size])
+            if rows:
+                yield rows
+                after = rows[-1][timestamp_position], rows[-1][id_position]
+            if len(rows) < chunk_size:
+                break
@@ -0,0 +1,485 @@
+"""Сервис проводок по счетам.
+
+Балансы меняются одним условным UPDATE (``balance = balance - x WHERE
+balance >= x``) без предварительного чтения строки в Python, поэтому
+конкурентные операции не теряют обновления даже на SQLite, где
+``select_for_update()`` игнорируется. SQLite считает такие выражения в
+REAL, поэтому результат округляется до копеек (``ROUND(..., 2)``), и
+сравнение в условии идет с округленным балансом: иначе 0.30 - 0.10
+сохранилось бы как 0.19999999999999998 и не позволило бы снять 0.20.
+У выражения ROUND нет числовой affinity, а Decimal передается строкой,
+поэтому в сырых запросах оно приводится ``CAST(... AS NUMERIC)``, как это
+делает ORM. Записи ``Transaction`` создаются
+через ``bulk_create`` в ``_journal``, который в той же транзакции
+обновляет счетчик статистики, почасовые/дневные обороты и версии
+клиентов для условных GET, а после фиксации передает записи в живую
+ленту. Каждый UPDATE баланса увеличивает ``Account.version``.
+
+Переводы проводятся в одном из двух режимов (``POSTING_MODE``):
+``locking`` - условные UPDATE, как выше; ``optimistic`` - сравнение версий
+счетов (compare-and-swap) с повторами, см. ``_transfer_optimistic``.
+Попытки, конфликты и время под блокировкой на запись учитывает metrics.py.
+"""
+import random
+import time
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import connection, transaction as db_transaction
+from django.db.models import F
+from django.db.models.functions import Round
+from django.db.models.lookups import GreaterThanOrEqual
+from django.utils import timezone
+
+from . import feed, metrics, rollups, stats, versions
+from .models import Account, Transaction
+from .rates import RateUnavailable, get_exchange_rate
+
+CENT = Decimal('0.01')
+
+# Максимальное количество переводов в одном пакете. Номера счетов
+# разрешаются одним запросом с IN (...), а SQLite ограничивает число
+# параметров в запросе (32766).
+MAX_BATCH_SIZE = 10000
+
+# Сколько переводов пакета проводится в одной транзакции БД: блокировка
+# на запись не удерживается на время всего пакета.
+BATCH_CHUNK_SIZE = 500
+
+POSTING_MODES = ('locking', 'optimistic')
+DEFAULT_MODE = 'locking'
+
+# Повторы перевода при конфликте версий и базовая пауза перед повтором
+# (секунды; удваивается с каждой попыткой, фактическая - случайная от 0 до нее)
+DEFAULT_CAS_RETRIES = 5
+DEFAULT_CAS_BACKOFF = 0.002
+
+
+class PostingError(Exception):
+    """Базовая ошибка проводки"""
+
+
+class InsufficientFunds(PostingError):
+    """Недостаточно средств на счете"""
+
+
+class RecipientNotFound(PostingError):
+    """Счет получателя не найден или неактивен"""
+
+
+class ConcurrentUpdate(PostingError):
+    """Счета все время меняются параллельными проводками: повторы исчерпаны"""
+
+
+class _VersionConflict(Exception):
+    """Счет изменен после чтения - попытка откатывается"""
+
+
+def _active_accounts(account_id, client_id=None):
+    """Активный счет по id; для обычных пользователей (client_id) - только свой"""
+    accounts = Account.objects.filter(id=account_id, is_active=True)
+    if client_id is not None:
+        accounts = accounts.filter(client_id=client_id)
+    return accounts
+
+
+def _credit(accounts, amount):
+    """Зачисление одним UPDATE, возвращает количество измененных строк"""
+    return accounts.update(
+        balance=Round(F('balance') + amount, 2), version=F('version') + 1, modified_at=timezone.now()
+    )
+
+
+def _debit(accounts, amount):
+    """Списание одним условным UPDATE; баланс не может уйти в минус"""
+    debited = accounts.filter(GreaterThanOrEqual(Round('balance', 2), amount)).update(
+        balance=Round(F('balance') - amount, 2), version=F('version') + 1, modified_at=timezone.now()
+    )
+    if not debited:
+        if not accounts.exists():
+            raise Account.DoesNotExist
+        raise InsufficientFunds
+    return debited
+
+
+def _lock_in_order(account_ids):
+    """Блокирует счета строго по возрастанию id, чтобы пакеты не взаимоблокировались.
+
+    SQLite блокирует всю базу на запись и не поддерживает SELECT FOR UPDATE,
+    поэтому там запрос не выполняется.
+    """
+    if connection.features.has_select_for_update:
+        list(
+            Account.objects.select_for_update()
+            .filter(id__in=account_ids)
+            .order_by('id')
+            .values_list('id', flat=True)
+        )
+
+
+def _batch_statements(client_id):
+    """UPDATE-запросы списания и зачисления для пакета.
+
+    Собираются один раз на пакет: построение запроса через ORM на каждый
+    перевод обходится дороже самого UPDATE. Новый баланс возвращается тем
+    же запросом, если база это умеет (см. ``_written_balance``).
+    """
+    table = connection.ops.quote_name(Account._meta.db_table)
+    owner = ' AND client_id = %s' if client_id is not None else ''
+    returning = ' RETURNING balance' if connection.features.can_return_columns_from_insert else ''
+    changed = 'version = version + 1, modified_at = %s'
+    debit = (
+        f'UPDATE {table} SET balance = ROUND(balance - %s, 2), {changed} '
+        f'WHERE id = %s AND is_active = %s AND CAST(ROUND(balance, 2) AS NUMERIC) >= %s{owner}{returning}'
+    )
+    credit = (
+        f'UPDATE {table} SET balance = ROUND(balance + %s, 2), {changed} '
+        f'WHERE id = %s AND is_active = %s{returning}'
+    )
+    return debit, credit
+
+
+def _written_balance(cursor, account_id):
+    """Баланс счета после UPDATE пакета; None, если строка не изменилась"""
+    if connection.features.can_return_columns_from_insert:
+        row = cursor.fetchone()
+        if row is None:
+            return None
+        return Account._meta.get_field('balance').to_python(row[0]).quantize(CENT)
+    if not cursor.rowcount:
+        return None
+    return _balance(account_id)
+
+
+def _transfer_legs(from_account, to_account, amount, converted_amount, exchange_rate, description):
+    """Записи журнала для отправителя и получателя (каждая в валюте своего счета)"""
+    return [
+        Transaction(
+            account_id=from_account['id'],
+            amount=amount,
+            type='transfer',
+            description=f"{description} → {to_account['account_number']} (курс: {exchange_rate:.4f})",
+            from_account_id=from_account['id'],
+            to_account_id=to_account['id'],
+        ),
+        Transaction(
+            account_id=to_account['id'],
+            amount=converted_amount,
+            type='transfer',
+            description=f"{description} ← {from_account['account_number']} (курс: {exchange_rate:.4f})",
+            from_account_id=from_account['id'],
+            to_account_id=to_account['id'],
+        ),
+    ]
+
+
+def _journal(transactions, currencies=None):
+    """Записывает транзакции в журнал.
+
+    bulk_create не шлет сигналов, поэтому счетчик статистики, обороты,
+    версии клиентов и живая лента обновляются здесь. ``currencies`` - {id счета: валюта},
+    если известны.
+    """
+    created = Transaction.objects.bulk_create(transactions)
+    stats.bump('transactions', len(created))
+    rollups.record(created, currencies)
+    versions.touch({transaction.account_id for transaction in created})
+    feed.announce(created)
+    return created
+
+
+def _balance(account_id):
+    return Account.objects.filter(id=account_id).values_list('balance', flat=True).get()
+
+
+def deposit(account_id, amount, description, client_id=None):
+    """Пополнение счета. Возвращает (транзакция, новый баланс)"""
+    with db_transaction.atomic():
+        if not _credit(_active_accounts(account_id, client_id), amount):
+            raise Account.DoesNotExist
+        transaction, = _journal([
+            Transaction(account_id=account_id, amount=amount, type='deposit', description=description),
+        ])
+        return transaction, _balance(account_id)
+
+
+def withdraw(account_id, amount, description, client_id=None):
+    """Снятие со счета. Возвращает (транзакция, новый баланс)"""
+    with db_transaction.atomic():
+        _debit(_active_accounts(account_id, client_id), amount)
+        transaction, = _journal([
+            Transaction(account_id=account_id, amount=amount, type='withdraw', description=description),
+        ])
+        return transaction, _balance(account_id)
+
+
+def transfer(from_account_id, to_account_number, amount, description, client_id=None):
+    """Перевод между счетами с конвертацией валют.
+
+    Чтение счетов и расчет курса выполняются до открытия транзакции,
+    поэтому первая команда внутри нее - сразу UPDATE, и блокировка на
+    запись удерживается только на время самих проводок. Как проводить
+    запись, задает ``POSTING_MODE``.
+
+    Возвращает словарь с транзакциями обеих сторон, курсом,
+    конвертированной суммой и новыми балансами.
+    """
+    from_account = _active_accounts(from_account_id, client_id).values(
+        'id', 'currency', 'account_number', 'balance', 'version'
+    ).get()
+    try:
+        to_account = Account.objects.filter(
+            account_number=to_account_number,
+            is_active=True
+        ).values('id', 'currency', 'account_number', 'balance', 'version').get()
+    except Account.DoesNotExist:
+        raise RecipientNotFound
+
+    exchange_rate = get_exchange_rate(from_account['currency'], to_account['currency'])
+    converted_amount = (amount * exchange_rate).quantize(CENT)
+
+    mode = getattr(settings, 'POSTING_MODE', DEFAULT_MODE)
+    if mode not in POSTING_MODES:
+        raise PostingError(f'Неизвестный режим проводок: {mode}')
+    post = _transfer_optimistic if mode == 'optimistic' else _transfer_locking
+    operation = metrics.Operation(mode)
+    try:
+        transaction_from, transaction_to, balances = post(
+            operation, from_account, to_account, amount, converted_amount, exchange_rate, description, client_id
+        )
+    finally:
+        operation.finish()
+
+    return {
+        'transaction_from': transaction_from,
+        'transaction_to': transaction_to,
+        'exchange_rate': exchange_rate,
+        'converted_amount': converted_amount,
+        'from_account_balance': balances[from_account['id']],
+        'to_account_balance': balances[to_account['id']],
+    }
+
+
+def _transfer_locking(operation, from_account, to_account, amount, converted_amount, exchange_rate,
+                      description, client_id):
+    """Проводка перевода условными UPDATE: (транзакция отправителя, получателя, балансы)"""
+    with operation.attempt(), db_transaction.atomic():
+        _debit(_active_accounts(from_account['id'], client_id), amount)
+        operation.locked()
+        if not _credit(_active_accounts(to_account['id']), converted_amount):
+            raise RecipientNotFound
+
+        transaction_from, transaction_to = _journal(
+            _transfer_legs(from_account, to_account, amount, converted_amount, exchange_rate, description),
+            {from_account['id']: from_account['currency'], to_account['id']: to_account['currency']}
+        )
+        balances = dict(
+            Account.objects.filter(id__in=[from_account['id'], to_account['id']]).values_list('id', 'balance')
+        )
+    return transaction_from, transaction_to, balances
+
+
+def _cas_statement():
+    """UPDATE счета при неизменной с момента чтения версии.
+
+    Версию увеличивают и проводки, и сохранение счета через модель
+    (``Account.save``), поэтому правка счета в админке между чтением и
+    записью приводит к повтору. Баланс все равно меняется на
+    разницу, а списание требует ``balance >= x``: запросы мимо модели
+    (``QuerySet.update``, сырой SQL команд) версию не трогают, и их
+    изменения не должны потеряться.
+    Новый баланс возвращается тем же запросом, если база это умеет
+    (SQLite 3.35+); иначе он считается по прочитанному.
+    """
+    table = connection.ops.quote_name(Account._meta.db_table)
+    returning = ' RETURNING balance' if connection.features.can_return_columns_from_insert else ''
+    return (
+        f'UPDATE {table} SET balance = ROUND(balance + %s, 2), version = version + 1, modified_at = %s '
+        f'WHERE id = %s AND version = %s AND is_active = %s AND CAST(ROUND(balance, 2) AS NUMERIC) >= %s{returning}'
+    )
+
+
+def _reread(accounts, from_id, to_id, client_id):
+    """Свежие баланс и версия счетов перевода после конфликта"""
+    fresh = {
+        account_id: (balance, version)
+        for account_id, balance, version, owner_id in Account.objects.filter(
+            id__in=accounts, is_active=True
+        ).values_list('id', 'balance', 'version', 'client_id')
+        if account_id != from_id or client_id is None or owner_id == client_id
+    }
+    if from_id not in fresh:
+        raise Account.DoesNotExist
+    if to_id not in fresh:
+        raise RecipientNotFound
+    return {
+        account_id: {**account, 'balance': fresh[account_id][0], 'version': fresh[account_id][1]}
+        for account_id, account in accounts.items()
+    }
+
+
+def _transfer_optimistic(operation, from_account, to_account, amount, converted_amount, exchange_rate,
+                         description, client_id):
+    """Проводка перевода сравнением версий (compare-and-swap).
+
+    Изменения балансов и записи журнала готовятся до транзакции по прочитанным
+    балансу и версии счетов. В транзакции остаются только
+    ``UPDATE ... WHERE id = ? AND version = ?`` обоих счетов и журнал. Если
+    счет уже изменила другая проводка, попытка откатывается, счета
+    перечитываются, и после паузы со случайным разбросом перевод
+    повторяется; после ``POSTING_CAS_RETRIES`` повторов - ConcurrentUpdate.
+    """
+    retries = getattr(settings, 'POSTING_CAS_RETRIES', DEFAULT_CAS_RETRIES)
+    backoff = getattr(settings, 'POSTING_CAS_BACKOFF', DEFAULT_CAS_BACKOFF)
+    statement = _cas_statement()
+    returning = connection.features.can_return_columns_from_insert
+    balance_field = Account._meta.get_field('balance')
+    currencies = {from_account['id']: from_account['currency'], to_account['id']: to_account['currency']}
+    # Отправитель первым: при переводе самому себе остается одна запись
+    accounts = {from_account['id']: from_account, to_account['id']: to_account}
+    for attempt in range(retries + 1):
+        if attempt:
+            time.sleep(random.uniform(0, backoff * 2 ** (attempt - 1)))
+            accounts = _reread(accounts, from_account['id'], to_account['id'], client_id)
+        if accounts[from_account['id']]['balance'] < amount:
+            raise InsufficientFunds
+        changes = dict.fromkeys(accounts, Decimal('0'))
+        changes[from_account['id']] -= amount
+        changes[to_account['id']] += converted_amount
+        balances = {account_id: account['balance'] + changes[account_id] for account_id, account in accounts.items()}
+        legs = _transfer_legs(from_account, to_account, amount, converted_amount, exchange_rate, description)
+        now = connection.ops.adapt_datetimefield_value(timezone.now())
+        try:
+            with operation.attempt(), db_transaction.atomic(), connection.cursor() as cursor:
+                for account_id, account in accounts.items():
+                    required = amount if account_id == from_account['id'] else Decimal('0')
+                    cursor.execute(
+                        statement, [changes[account_id], now, account_id, account['version'], True, required]
+                    )
+                    operation.locked()
+                    if returning:
+                        row = cursor.fetchone()
+                        if row is None:
+                            raise _VersionConflict
+                        balances[account_id] = balance_field.to_python(row[0]).quantize(CENT)
+                    elif not cursor.rowcount:
+                        raise _VersionConflict
+                transaction_from, transaction_to = _journal(legs, currencies)
+        except _VersionConflict:
+            operation.conflicts += 1
+            continue
+        return transaction_from, transaction_to, balances
+    operation.exhausted = True
+    raise ConcurrentUpdate
+
+
+def transfer_batch(transfers, client_id=None):
+    """Пакетный перевод.
+
+    ``transfers`` - список словарей с ключами ``from_account_id``,
+    ``to_account_number``, ``amount`` (Decimal) и ``description``.
+    Счета отправителей и получателей разрешаются двумя запросами на весь
+    пакет, курс считается один раз на пару валют, а проводки выполняются
+    частями по ``BATCH_CHUNK_SIZE`` в одной транзакции БД на часть, журнал
+    части пишется одним ``bulk_create``. Переводы внутри части применяются
+    в порядке пакета. На базах с SELECT FOR UPDATE счета части перед этим
+    блокируются в порядке возрастания id, чтобы параллельные пакеты не
+    взаимоблокировались; SQLite блокирует на запись всю базу первым UPDATE
+    части, поэтому там отдельной блокировки нет и порядок не важен.
+
+    Переводы независимы: отказ одного не отменяет остальные. Если
+    получатель стал недоступен уже после списания, списание возвращается.
+    Возвращает список той же длины, где для каждого перевода лежит либо
+    словарь результата с теми же ключами, что у ``transfer`` (балансы -
+    сразу после этого перевода), либо экземпляр исключения
+    (``Account.DoesNotExist``, ``RecipientNotFound``, ``InsufficientFunds``,
+    ``RateUnavailable``).
+    """
+    if len(transfers) > MAX_BATCH_SIZE:
+        raise PostingError(f'Слишком много переводов в пакете (максимум {MAX_BATCH_SIZE})')
+
+    sources = Account.objects.filter(
+        id__in={item['from_account_id'] for item in transfers},
+        is_active=True
+    )
+    if client_id is not None:
+        sources = sources.filter(client_id=client_id)
+    sources = {acc['id']: acc for acc in sources.values('id', 'currency', 'account_number')}
+    recipients = {
+        acc['account_number']: acc
+        for acc in Account.objects.filter(
+            account_number__in={item['to_account_number'] for item in transfers},
+            is_active=True
+        ).values('id', 'currency', 'account_number')
+    }
+
+    results = [None] * len(transfers)
+    rates = {}
+    prepared = []
+    for index, item in enumerate(transfers):
+        from_account = sources.get(item['from_account_id'])
+        if from_account is None:
+            results[index] = Account.DoesNotExist()
+            continue
+        to_account = recipients.get(item['to_account_number'])
+        if to_account is None:
+            results[index] = RecipientNotFound()
+            continue
+        pair = (from_account['currency'], to_account['currency'])
+        if pair not in rates:
+            try:
+                rates[pair] = get_exchange_rate(*pair)
+            except RateUnavailable as error:
+                rates[pair] = error
+        if isinstance(rates[pair], RateUnavailable):
+            results[index] = rates[pair]
+            continue
+        converted_amount = (item['amount'] * rates[pair]).quantize(CENT)
+        prepared.append((index, item, from_account, to_account, rates[pair], converted_amount))
+
+    debit_sql, credit_sql = _batch_statements(client_id)
+    owner = [client_id] if client_id is not None else []
+    for start in range(0, len(prepared), BATCH_CHUNK_SIZE):
+        chunk = prepared[start:start + BATCH_CHUNK_SIZE]
+        with db_transaction.atomic(), connection.cursor() as cursor:
+            _lock_in_order({acc['id'] for _, _, src, dst, _, _ in chunk for acc in (src, dst)})
+            legs = []
+            posted = []
+            for index, item, from_account, to_account, exchange_rate, converted_amount in chunk:
+                amount = item['amount']
+                now = connection.ops.adapt_datetimefield_value(timezone.now())
+                cursor.execute(debit_sql, [amount, now, from_account['id'], True, amount] + owner)
+                from_balance = _written_balance(cursor, from_account['id'])
+                if from_balance is None:
+                    # Счет мог быть деактивирован после разрешения номеров
+                    results[index] = (
+                        InsufficientFunds() if _active_accounts(from_account['id'], client_id).exists()
+                        else Account.DoesNotExist()
+                    )
+                    continue
+                cursor.execute(credit_sql, [converted_amount, now, to_account['id'], True])
+                to_balance = _written_balance(cursor, to_account['id'])
+                if to_balance is None:
+                    # Получатель деактивирован после разрешения номеров - возвращаем списание
+                    _credit(Account.objects.filter(id=from_account['id']), amount)
+                    results[index] = RecipientNotFound()
+                    continue
+                legs.extend(_transfer_legs(
+                    from_account, to_account, amount, converted_amount, exchange_rate, item['description']
+                ))
+                posted.append((index, exchange_rate, converted_amount, from_balance, to_balance))
+
+            created = _journal(legs, {
+                acc['id']: acc['currency'] for _, _, src, dst, _, _ in chunk for acc in (src, dst)
+            })
+            for leg, (index, exchange_rate, converted_amount, from_balance, to_balance) in enumerate(posted):
+                results[index] = {
+                    'transaction_from': created[2 * leg],
+                    'transaction_to': created[2 * leg + 1],
+                    'exchange_rate': exchange_rate,
+                    'converted_amount': converted_amount,
+                    'from_account_balance': from_balance,
+                    'to_account_balance': to_balance,
+                }
+
+    return results
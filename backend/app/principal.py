@@ -0,0 +1,128 @@
+"""Кеш принципала запроса: пользователь и id его клиента без запросов к БД.
+
+Каждый запрос API читал из базы сессию, пользователя и профиль клиента.
+``PrincipalMiddleware`` (замена ``AuthenticationMiddleware``) по id
+пользователя из сессии берет из LRU-кеша процесса имя, флаги, хеш для
+проверки сессии и id клиента и собирает ``request.user`` без запроса:
+из базы читается только сессия. Остальные поля пользователя отложены
+(deferred) и загружаются при первом обращении, а ``save()`` такого
+экземпляра записывает только загруженные поля. id клиента отдает
+``client_id(user)``.
+
+При промахе пользователь загружается и проверяется стандартным
+``django.contrib.auth.get_user``. Запись кеша удаляется при сохранении
+и удалении ``User`` и ``Client`` в этом процессе; в других процессах
+она живет не дольше ``PRINCIPAL_CACHE_TTL`` секунд - столько смена
+пароля или блокировка, сделанные другим процессом, могут быть не видны.
+"""
+from collections import namedtuple
+from functools import partial
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib import auth
+from django.contrib.auth.middleware import AuthenticationMiddleware
+from django.contrib.auth.models import AnonymousUser, User
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils.crypto import constant_time_compare
+from django.utils.functional import SimpleLazyObject
+
+from .idempotency import LRUCache
+from .models import Client
+
+CLIENT_ID_ATTR = '_principal_client_id'
+
+_Principal = namedtuple('_Principal', 'db username email is_active is_staff is_superuser session_hash client_id')
+
+_cache = LRUCache(getattr(settings, 'PRINCIPAL_CACHE_SIZE', 10000))
+
+
+def _ttl():
+    return getattr(settings, 'PRINCIPAL_CACHE_TTL', 60)
+
+
+def _build(user_id, principal):
+    """Экземпляр User из кеша: загружены только поля принципала"""
+    values = {
+        'id': user_id, 'username': principal.username, 'email': principal.email,
+        'is_active': principal.is_active, 'is_staff': principal.is_staff,
+        'is_superuser': principal.is_superuser,
+    }
+    # from_db ждет значения в порядке полей модели
+    fields = [field.attname for field in User._meta.concrete_fields if field.attname in values]
+    user = User.from_db(principal.db, fields, [values[name] for name in fields])
+    setattr(user, CLIENT_ID_ATTR, principal.client_id)
+    return user
+
+
+def _load(request):
+    session = request.session
+    try:
+        user_id = User._meta.pk.to_python(session[auth.SESSION_KEY])
+        backend_path = session[auth.BACKEND_SESSION_KEY]
+    except KeyError:
+        return AnonymousUser()
+
+    principal = _cache.get(user_id)
+    if principal is not None and backend_path in settings.AUTHENTICATION_BACKENDS:
+        session_hash = session.get(auth.HASH_SESSION_KEY)
+        if session_hash and constant_time_compare(session_hash, principal.session_hash):
+            return _build(user_id, principal)
+
+    # Промах или хеш не совпал: полная проверка (при необходимости она очищает сессию)
+    user = auth.get_user(request)
+    if user.is_authenticated:
+        client_id = Client.objects.filter(user_id=user.pk).values_list('id', flat=True).first()
+        _cache.set(user.pk, _Principal(
+            user._state.db, user.username, user.email, user.is_active, user.is_staff,
+            user.is_superuser, user.get_session_auth_hash(), client_id,
+        ), _ttl())
+        setattr(user, CLIENT_ID_ATTR, client_id)
+    return user
+
+
+def get_user(request):
+    if not hasattr(request, '_cached_user'):
+        request._cached_user = _load(request)
+    return request._cached_user
+
+
+async def aget_user(request):
+    return await sync_to_async(get_user)(request)
+
+
+class PrincipalMiddleware(AuthenticationMiddleware):
+    """AuthenticationMiddleware, который берет пользователя из кеша принципалов"""
+
+    def process_request(self, request):
+        super().process_request(request)
+        # request.user и request.auser() делят один загруженный экземпляр
+        request.user = SimpleLazyObject(lambda: get_user(request))
+        request.auser = partial(aget_user, request)
+
+
+def client_id(user):
+    """id профиля клиента пользователя (None - профиля нет)"""
+    if hasattr(user, CLIENT_ID_ATTR):
+        return getattr(user, CLIENT_ID_ATTR)
+    return Client.objects.filter(user_id=user.pk).values_list('id', flat=True).first()
+
+
+async def aclient_id(user):
+    """client_id для async-представлений"""
+    if hasattr(user, CLIENT_ID_ATTR):
+        return getattr(user, CLIENT_ID_ATTR)
+    return await Client.objects.filter(user_id=user.pk).values_list('id', flat=True).afirst()
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def user_changed(sender, instance, **kwargs):
+    _cache.delete(instance.pk)
+
+
+@receiver(post_save, sender=Client)
+@receiver(post_delete, sender=Client)
+def client_changed(sender, instance, **kwargs):
+    _cache.delete(instance.user_id)
@@ -0,0 +1,353 @@
+"""Матрица курсов валют в памяти процесса.
+
+Курсы из ``ExchangeRate`` один раз загружаются в матрицу N×N с индексом
+по коду валюты, и перевод получает курс без запросов к БД. Пары, которых
+нет в таблице, триангулируются: матрица замыкается алгоритмом
+Флойда-Уоршелла по числу конвертаций, так что любой курс берется за O(1).
+Пары, которые не удалось связать, перечислены в ``RateMatrix.unresolved``.
+
+Матрица пересобирается целиком и подменяется одной ссылкой: по сигналам
+post_save/post_delete в этом процессе и по штампу версии (число строк,
+последний ``updated_at`` и сумма курсов), который другие процессы сверяют
+не чаще раза в ``EXCHANGE_RATES_REFRESH_INTERVAL`` секунд вне транзакции
+проводки. Сумма курсов замечает и ``QuerySet.update(rate=...)``, который
+не меняет ``updated_at``.
+
+Каждое изменение курса дописывается в ``ExchangeRateHistory`` обработчиком
+post_save, поэтому курсы меняются только через ``save()`` (админка,
+``update_or_create``): массовый ``update()`` сигналов не шлет и в историю
+не попадает.
+``RateHistory`` держит по каждой паре отсортированные моменты изменений и
+находит курс на любой момент бинарным поиском; кросс-курс на момент
+времени берется из матрицы того интервала, в котором курсы не менялись.
+"""
+import logging
+import threading
+import time
+from bisect import bisect_right
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import transaction as db_transaction
+from django.db.models import Count, Max, Sum
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .models import Account, ExchangeRate, ExchangeRateHistory
+
+logger = logging.getLogger(__name__)
+
+ONE = Decimal('1.0')
+
+# Курсы по умолчанию для пар, которых нет в таблице (можно заменить на API)
+DEFAULT_RATES = {
+    ('RUB', 'USD'): Decimal('0.011'),
+    ('RUB', 'EUR'): Decimal('0.009'),
+    ('USD', 'RUB'): Decimal('90.0'),
+    ('USD', 'EUR'): Decimal('0.85'),
+    ('EUR', 'RUB'): Decimal('110.0'),
+    ('EUR', 'USD'): Decimal('1.18'),
+}
+
+# Стоимость шага по курсу по умолчанию: любая цепочка курсов из таблицы
+# короче, поэтому курсы по умолчанию используются только там, где
+# таблица пару не связывает
+DEFAULT_RATE_COST = 1000
+
+# Подписи известных валют для форм
+CURRENCY_LABELS = {
+    'RUB': 'Рубли (RUB)',
+    'USD': 'Доллары (USD)',
+    'EUR': 'Евро (EUR)',
+}
+
+
+class RateUnavailable(Exception):
+    """Курс для пары валют не найден ни напрямую, ни через другие валюты"""
+
+    def __init__(self, from_currency, to_currency):
+        self.from_currency = from_currency
+        self.to_currency = to_currency
+        super().__init__(f'Курс обмена {from_currency} → {to_currency} недоступен')
+
+
+class RateMatrix:
+    """Неизменяемая матрица курсов: rates[i][j] - курс из currencies[i] в currencies[j]"""
+
+    __slots__ = ('currencies', 'index', 'rates', 'hops', 'unresolved', 'unresolved_set', 'version')
+
+    def __init__(self, currencies, rates, hops, version):
+        self.currencies = currencies
+        self.index = {code: i for i, code in enumerate(currencies)}
+        self.rates = rates
+        self.hops = hops
+        self.unresolved = [
+            (currencies[i], currencies[j])
+            for i, row in enumerate(rates) for j, rate in enumerate(row) if rate is None
+        ]
+        self.unresolved_set = frozenset(self.unresolved)
+        self.version = version
+
+    @classmethod
+    def build(cls, rows, version, defaults=True):
+        """Собирает матрицу из пар (из валюты, в валюту, курс) и замыкает ее.
+
+        Прямые курсы из таблицы важнее обратных (1 / курс), и те и другие
+        стоят одну конвертацию; курсы по умолчанию стоят DEFAULT_RATE_COST
+        и не добавляются при defaults=False.
+        Для каждой пары выбирается цепочка наименьшей стоимости.
+        Неположительные курсы (записанные в обход валидации модели)
+        пропускаются: для них нет обратного курса.
+        """
+        rows = list(rows)
+        invalid = [(from_currency, to_currency) for from_currency, to_currency, rate in rows if rate <= 0]
+        if invalid:
+            logger.warning('Неположительные курсы пропущены: %s', ', '.join(f'{src}→{dst}' for src, dst in invalid))
+            rows = [row for row in rows if row[2] > 0]
+        default_rates = DEFAULT_RATES if defaults else {}
+        currencies = sorted(
+            {code for pair in default_rates for code in pair}
+            | {code for from_currency, to_currency, _ in rows for code in (from_currency, to_currency)}
+        )
+        index = {code: i for i, code in enumerate(currencies)}
+        size = len(currencies)
+        rates = [[None] * size for _ in range(size)]
+        costs = [[None] * size for _ in range(size)]
+
+        for (from_currency, to_currency), rate in default_rates.items():
+            i, j = index[from_currency], index[to_currency]
+            rates[i][j], costs[i][j] = rate, DEFAULT_RATE_COST
+        for from_currency, to_currency, rate in rows:
+            i, j = index[to_currency], index[from_currency]
+            rates[i][j], costs[i][j] = ONE / rate, 1
+        for from_currency, to_currency, rate in rows:
+            i, j = index[from_currency], index[to_currency]
+            rates[i][j], costs[i][j] = rate, 1
+        for i in range(size):
+            rates[i][i], costs[i][i] = ONE, 0
+
+        cls._close(rates, costs)
+        return cls(currencies, rates, costs, version)
+
+    @staticmethod
+    def _close(rates, costs):
+        """Флойд-Уоршелл: строка i улучшается целиком через промежуточную валюту k"""
+        size = len(rates)
+        for k in range(size):
+            rate_k, cost_k = rates[k], costs[k]
+            for i in range(size):
+                cost_ik = costs[i][k]
+                if i == k or cost_ik is None:
+                    continue
+                rate_ik, row_rates, row_costs = rates[i][k], rates[i], costs[i]
+                candidates = [None if cost is None else cost_ik + cost for cost in cost_k]
+                for j in [
+                    j for j, (new, old) in enumerate(zip(candidates, row_costs))
+                    if new is not None and (old is None or new < old)
+                ]:
+                    row_costs[j] = candidates[j]
+                    row_rates[j] = rate_ik * rate_k[j]
+
+    def rate(self, from_currency, to_currency):
+        """Курс обмена за O(1); для несвязанной пары - RateUnavailable"""
+        if from_currency == to_currency:
+            return ONE
+        i = self.index.get(from_currency)
+        j = self.index.get(to_currency)
+        rate = None if i is None or j is None else self.rates[i][j]
+        if rate is None:
+            raise RateUnavailable(from_currency, to_currency)
+        return rate
+
+
+class RateHistory:
+    """Индекс истории курсов в памяти.
+
+    ``pairs[(из, в)]`` - два параллельных списка: моменты начала действия
+    по возрастанию и курсы (None - пара удалена). ``epochs`` - все моменты
+    изменений; между соседними моментами набор курсов постоянен, и для
+    каждого такого интервала матрица кросс-курсов строится один раз.
+    """
+
+    # Сколько матриц интервалов держать в памяти
+    MATRIX_CACHE_SIZE = 1024
+
+    def __init__(self, rows, version):
+        self.pairs = {}
+        epochs = set()
+        for from_currency, to_currency, rate, valid_from in rows:
+            times, rates = self.pairs.setdefault((from_currency, to_currency), ([], []))
+            times.append(valid_from)
+            rates.append(rate)
+            epochs.add(valid_from)
+        self.epochs = sorted(epochs)
+        self.version = version
+        self._matrices = {}
+
+    def pair_rate(self, from_currency, to_currency, when):
+        """Курс пары из таблицы, действовавший в момент when (None, если его не было)"""
+        history = self.pairs.get((from_currency, to_currency))
+        if history is None:
+            return None
+        times, rates = history
+        position = bisect_right(times, when)
+        return rates[position - 1] if position else None
+
+    def matrix_at(self, when):
+        """Матрица кросс-курсов, действовавшая в момент when.
+
+        Строится только из сохраненной истории, без курсов по умолчанию:
+        пара, у которой к этому моменту еще не было курса, недоступна.
+        """
+        epoch = bisect_right(self.epochs, when)
+        matrix = self._matrices.get(epoch)
+        if matrix is None:
+            if len(self._matrices) >= self.MATRIX_CACHE_SIZE:
+                self._matrices.clear()
+            moment = self.epochs[epoch - 1] if epoch else None
+            rows = []
+            if moment is not None:
+                for (from_currency, to_currency), (times, rates) in self.pairs.items():
+                    position = bisect_right(times, moment)
+                    if position and rates[position - 1] is not None:
+                        rows.append((from_currency, to_currency, rates[position - 1]))
+            matrix = self._matrices[epoch] = RateMatrix.build(rows, (self.version, epoch), defaults=False)
+        return matrix
+
+    def rate_at(self, from_currency, to_currency, when):
+        """Курс обмена (с триангуляцией) на момент when"""
+        if from_currency == to_currency:
+            return ONE
+        return self.matrix_at(when).rate(from_currency, to_currency)
+
+
+_matrix = None
+_checked_at = 0.0
+_history = None
+_history_checked_at = 0.0
+_lock = threading.Lock()
+
+
+def _version():
+    """Штамп версии таблицы курсов: число строк, время последнего изменения и сумма курсов"""
+    stamp = ExchangeRate.objects.aggregate(count=Count('id'), updated=Max('updated_at'), checksum=Sum('rate'))
+    return stamp['count'], stamp['updated'], stamp['checksum']
+
+
+def rebuild():
+    """Пересобирает матрицу из таблицы и атомарно подменяет текущую"""
+    global _matrix, _checked_at
+    with _lock:
+        version = _version()
+        rows = ExchangeRate.objects.values_list('from_currency', 'to_currency', 'rate')
+        previous = _matrix.unresolved_set if _matrix is not None else frozenset()
+        _matrix = RateMatrix.build(rows, version)
+        _checked_at = time.monotonic()
+        # Предупреждение - только когда набор несвязанных пар изменился, а не на каждую пересборку
+        if _matrix.unresolved and _matrix.unresolved_set != previous:
+            pairs = ', '.join(f'{src}→{dst}' for src, dst in _matrix.unresolved)
+            logger.warning('Курсы недоступны для пар: %s', pairs)
+        return _matrix
+
+
+def get_matrix():
+    """Текущая матрица курсов; при необходимости загружает или сверяет версию"""
+    global _checked_at
+    matrix = _matrix
+    if matrix is None:
+        return rebuild()
+    interval = getattr(settings, 'EXCHANGE_RATES_REFRESH_INTERVAL', 30)
+    if time.monotonic() - _checked_at >= interval:
+        _checked_at = time.monotonic()
+        if _version() != matrix.version:
+            return rebuild()
+    return matrix
+
+
+def _history_version():
+    stamp = ExchangeRateHistory.objects.aggregate(count=Count('id'), last=Max('id'))
+    return stamp['count'], stamp['last']
+
+
+def get_history():
+    """Текущий индекс истории курсов; подгружается и сверяется как матрица курсов"""
+    global _history, _history_checked_at
+    history = _history
+    interval = getattr(settings, 'EXCHANGE_RATES_REFRESH_INTERVAL', 30)
+    if history is not None and time.monotonic() - _history_checked_at < interval:
+        return history
+    with _lock:
+        version = _history_version()
+        if _history is None or _history.version != version:
+            rows = ExchangeRateHistory.objects.order_by('valid_from', 'id').values_list(
+                'from_currency', 'to_currency', 'rate', 'valid_from'
+            )
+            _history = RateHistory(rows, version)
+        _history_checked_at = time.monotonic()
+        return _history
+
+
+def rate_at(from_currency, to_currency, when):
+    """Курс обмена, действовавший в момент when (RateUnavailable, если пары не было)"""
+    return get_history().rate_at(from_currency, to_currency, when)
+
+
+def invalidate():
+    """Сбрасывает матрицу и историю: следующее обращение загрузит их заново"""
+    global _matrix, _history
+    _matrix = None
+    _history = None
+
+
+def get_exchange_rate(from_currency, to_currency):
+    """Получить курс обмена между валютами (RateUnavailable, если пары нет)"""
+    if from_currency == to_currency:
+        return ONE
+    return get_matrix().rate(from_currency, to_currency)
+
+
+def currency_choices():
+    """Валюты счетов: связанные курсами с валютой по умолчанию в обе стороны.
+
+    Сначала известные валюты, затем остальные по алфавиту.
+    """
+    matrix = get_matrix()
+    base = Account._meta.get_field('currency').default
+    currencies = [
+        code for code in matrix.currencies
+        if code == base or (
+            (base, code) not in matrix.unresolved_set and (code, base) not in matrix.unresolved_set
+        )
+    ]
+    known = [code for code in CURRENCY_LABELS if code in currencies]
+    return [(code, CURRENCY_LABELS.get(code, code)) for code in known + [c for c in currencies if c not in known]]
+
+
+@receiver(post_save, sender=ExchangeRate)
+def record_rate_change(sender, instance, **kwargs):
+    """Дописывает новое значение курса в историю"""
+    ExchangeRateHistory.objects.create(
+        from_currency=instance.from_currency,
+        to_currency=instance.to_currency,
+        rate=instance.rate,
+        valid_from=instance.updated_at,
+    )
+
+
+@receiver(post_delete, sender=ExchangeRate)
+def record_rate_removal(sender, instance, **kwargs):
+    """Отмечает в истории, что пара удалена из таблицы курсов"""
+    ExchangeRateHistory.objects.create(
+        from_currency=instance.from_currency,
+        to_currency=instance.to_currency,
+        rate=None,
+        valid_from=timezone.now(),
+    )
+
+
+@receiver(post_save, sender=ExchangeRate)
+@receiver(post_delete, sender=ExchangeRate)
+def exchange_rate_changed(sender, **kwargs):
+    """Курсы изменились - матрица будет пересобрана при следующем переводе"""
+    db_transaction.on_commit(invalidate)
@@ -0,0 +1,59 @@
+"""JSON-ответы API через orjson.
+
+Суммы, балансы и курсы передаются в ответ как ``Decimal`` и пишутся в
+JSON точным числом из базы (``12345678901234.56``, а не ближайшим
+float), поэтому клиенту по-прежнему приходят числа, но без потери
+точности. Дата и время сериализуются самим orjson в том же формате,
+что и ``isoformat()``, так что строки списков не вызывают ``float()`` и
+``isoformat()`` для каждой записи. Вывод компактный, кириллица не
+экранируется - как у ``JSONRenderer`` DRF.
+"""
+import json
+from decimal import Decimal
+
+import orjson
+from django.utils.functional import Promise
+from rest_framework.renderers import JSONRenderer
+
+# Ключи-числа превращаются в строки, как в стандартном json
+OPTIONS = orjson.OPT_NON_STR_KEYS
+
+
+def _default(value):
+    if isinstance(value, Decimal):
+        # format(..., 'f') - без экспоненты: Decimal('1E+2') -> 100
+        return orjson.Fragment(format(value, 'f'))
+    if isinstance(value, Promise):
+        # Ленивые переводы (тексты ошибок DRF)
+        return str(value)
+    raise TypeError(f'Object of type {type(value).__name__} is not JSON serializable')
+
+
+def dumps(data, options=OPTIONS):
+    """JSON в байтах"""
+    return orjson.dumps(data, default=_default, option=options)
+
+
+class ORJSONRenderer(JSONRenderer):
+    """JSONRenderer DRF на orjson"""
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        indent = self.get_indent(accepted_media_type, renderer_context or {})
+        return dumps(data, OPTIONS | orjson.OPT_INDENT_2 if indent else OPTIONS)
+
+
+class DecimalJSONEncoder(json.JSONEncoder):
+    """Кодировщик JSONField с теми же правилами, что у ответов API"""
+
+    def encode(self, o):
+        return dumps(o).decode('utf-8')
+
+
+class DecimalJSONDecoder(json.JSONDecoder):
+    """Дробные числа читаются как Decimal: сохраненный ответ повторяется точно"""
+
+    def __init__(self, **kwargs):
+        kwargs.setdefault('parse_float', Decimal)
+        super().__init__(**kwargs)
@@ -0,0 +1,218 @@
+"""Почасовые и дневные обороты журнала.
+
+``HourlyRollup`` и ``DailyRollup`` хранят по строке на (период, валюта
+счета, тип операции): число записей журнала, оборот, зачисления и
+списания. Проводки дописывают их в той же транзакции БД, что и журнал,
+одним UPSERT на группу, поэтому аналитика читается без просмотра
+``Transaction``. Часы считаются в UTC, дни - в часовом поясе проекта
+(TIME_ZONE, смещение в целое число часов).
+
+Зачисление - пополнение и входящая часть перевода, списание - снятие и
+исходящая часть; чистый поток = зачисления - списания.
+
+Записи счета, которые удаляются вместе с ним каскадом (без сигналов),
+вычитаются из сводов заранее - в обработчике ``pre_delete`` счета.
+
+``rebuild`` пересчитывает дни из журнала целиком (команда
+``backfill_rollups``): заполнение истории и исправление сводов после
+правок журнала в обход проводок. Записи, перенесенные в архив
+(archive.py), учитываются вместе с журналом.
+"""
+from collections import defaultdict
+from datetime import datetime, time, timedelta, timezone as dt_timezone
+from decimal import Decimal
+
+from django.db import connection, transaction as db_transaction
+from django.db.models import Case, Count, DecimalField, F, Q, Sum, Value, When
+from django.db.models.functions import TruncDate, TruncHour
+from django.db.models.signals import post_save, pre_delete
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .models import Account, ArchivedTransaction, DailyRollup, HourlyRollup, Transaction
+
+ZERO = Decimal('0')
+TYPES = [code for code, _ in Transaction.TRANSACTION_TYPES]
+
+# Ограничения длины запрашиваемого ряда
+MAX_DAYS = 366
+MAX_HOURS = 31 * 24
+
+
+def _hour(timestamp):
+    return timestamp.astimezone(dt_timezone.utc).replace(minute=0, second=0, microsecond=0)
+
+
+def _is_outflow(kind, account_id, from_account_id):
+    return kind == 'withdraw' or (kind == 'transfer' and from_account_id == account_id)
+
+
+def _upsert_sql(model, period):
+    table = connection.ops.quote_name(model._meta.db_table)
+    return f'''
+        INSERT INTO {table} ({period}, currency, type, count, amount, inflow, outflow)
+        VALUES (%s, %s, %s, %s, %s, %s, %s)
+        ON CONFLICT ({period}, currency, type) DO UPDATE SET
+            count = {table}.count + excluded.count,
+            amount = {table}.amount + excluded.amount,
+            inflow = {table}.inflow + excluded.inflow,
+            outflow = {table}.outflow + excluded.outflow
+    '''
+
+
+def _apply(rows, sign=1):
+    """Добавляет (sign=-1 - вычитает) записи журнала в своды.
+
+    ``rows`` - кортежи (id счета, валюта, сумма, тип, время, id счета-отправителя).
+    Возвращает затронутые часы и дни.
+    """
+    hourly = defaultdict(lambda: [0, ZERO, ZERO, ZERO])
+    daily = defaultdict(lambda: [0, ZERO, ZERO, ZERO])
+    for account_id, currency, amount, kind, timestamp, from_account_id in rows:
+        amount = sign * Decimal(amount)
+        outflow = _is_outflow(kind, account_id, from_account_id)
+        for totals in (hourly[_hour(timestamp), currency, kind],
+                       daily[timezone.localdate(timestamp), currency, kind]):
+            totals[0] += sign
+            totals[1] += amount
+            totals[2 + outflow] += amount
+
+    ops = connection.ops
+    with connection.cursor() as cursor:
+        cursor.executemany(_upsert_sql(HourlyRollup, 'hour'), [
+            [ops.adapt_datetimefield_value(hour), currency, kind, *totals]
+            for (hour, currency, kind), totals in hourly.items()
+        ])
+        cursor.executemany(_upsert_sql(DailyRollup, 'day'), [
+            [ops.adapt_datefield_value(day), currency, kind, *totals]
+            for (day, currency, kind), totals in daily.items()
+        ])
+    return {hour for hour, _, _ in hourly}, {day for day, _, _ in daily}
+
+
+def record(transactions, currencies=None):
+    """Добавляет записи журнала в своды.
+
+    ``currencies`` - {id счета: валюта}, если вызывающий ее уже знает;
+    иначе валюты читаются одним запросом. Вызывается внутри транзакции
+    проводки.
+    """
+    if not transactions:
+        return
+    if currencies is None:
+        currencies = dict(
+            Account.objects.filter(id__in={t.account_id for t in transactions}).values_list('id', 'currency')
+        )
+    _apply(
+        (t.account_id, currencies[t.account_id], t.amount, t.type, t.timestamp, t.from_account_id)
+        for t in transactions
+    )
+
+
+def _day_bounds(day):
+    start = timezone.make_aware(datetime.combine(day, time.min))
+    return start, timezone.make_aware(datetime.combine(day + timedelta(days=1), time.min))
+
+
+def rebuild(day):
+    """Пересчитывает своды одного дня из журнала, возвращает число записей журнала"""
+    start, end = _day_bounds(day)
+    money = DecimalField(max_digits=20, decimal_places=2)
+    outflow = Q(type='withdraw') | Q(type='transfer', from_account=F('account'))
+    totals = {
+        'rollup_count': Count('id'),
+        'rollup_amount': Sum('amount'),
+        'rollup_inflow': Sum(Case(When(outflow, then=Value(ZERO)), default=F('amount'), output_field=money)),
+        'rollup_outflow': Sum(Case(When(outflow, then=F('amount')), default=Value(ZERO), output_field=money)),
+    }
+    journals = [
+        model.objects.filter(timestamp__gte=start, timestamp__lt=end).order_by()
+        for model in (Transaction, ArchivedTransaction)
+    ]
+
+    def groups(period):
+        merged = defaultdict(lambda: {'count': 0, 'amount': ZERO, 'inflow': ZERO, 'outflow': ZERO})
+        for journal in journals:
+            for row in journal.annotate(period=period).values('period', 'account__currency', 'type').annotate(**totals):
+                values = merged[row['period'], row['account__currency'], row['type']]
+                values['count'] += row['rollup_count']
+                values['amount'] += row['rollup_amount']
+                values['inflow'] += row['rollup_inflow']
+                values['outflow'] += row['rollup_outflow']
+        for (moment, currency, kind), values in merged.items():
+            yield moment, {'currency': currency, 'type': kind, **values}
+
+    with db_transaction.atomic():
+        HourlyRollup.objects.filter(hour__gte=start, hour__lt=end).delete()
+        DailyRollup.objects.filter(day=day).delete()
+        HourlyRollup.objects.bulk_create(
+            HourlyRollup(hour=hour, **values)
+            for hour, values in groups(TruncHour('timestamp', tzinfo=dt_timezone.utc))
+        )
+        daily = DailyRollup.objects.bulk_create(
+            DailyRollup(day=period, **values) for period, values in groups(TruncDate('timestamp'))
+        )
+    return sum(rollup.count for rollup in daily)
+
+
+def _series(queryset, period, start, end, currency=None):
+    """Ряд по периодам: по строке на (период, валюта) с разбивкой по типам"""
+    queryset = queryset.filter(**{f'{period}__gte': start, f'{period}__lt': end})
+    if currency:
+        queryset = queryset.filter(currency=currency)
+    points = {}
+    for moment, code, kind, count, amount, inflow, outflow in queryset.order_by(period, 'currency').values_list(
+        period, 'currency', 'type', 'count', 'amount', 'inflow', 'outflow'
+    ):
+        point = points.get((moment, code))
+        if point is None:
+            point = points[moment, code] = {
+                'period': moment.isoformat(),
+                'currency': code,
+                **{f'{name}_count': 0 for name in TYPES},
+                'turnover': ZERO,
+                'inflow': ZERO,
+                'outflow': ZERO,
+            }
+        point[f'{kind}_count'] += count
+        point['turnover'] += amount
+        point['inflow'] += inflow
+        point['outflow'] += outflow
+    for point in points.values():
+        point['net'] = point['inflow'] - point['outflow']
+    return list(points.values())
+
+
+def daily_series(start, end, currency=None):
+    """Обороты по дням в [start, end)"""
+    return _series(DailyRollup.objects.all(), 'day', start, end, currency)
+
+
+def hourly_series(start, end, currency=None):
+    """Обороты по часам в [start, end)"""
+    return _series(HourlyRollup.objects.all(), 'hour', start, end, currency)
+
+
+@receiver(post_save, sender=Transaction)
+def transaction_saved(sender, instance, created, **kwargs):
+    """Записи журнала, созданные в обход проводок"""
+    if created:
+        record([instance])
+
+
+@receiver(pre_delete, sender=Account)
+def account_deleting(sender, instance, **kwargs):
+    """Транзакции счета удаляются каскадом без сигналов - вычитаем их из сводов заранее"""
+    rows = [
+        (instance.id, instance.currency, amount, kind, timestamp, from_account_id)
+        for model in (Transaction, ArchivedTransaction)
+        for amount, kind, timestamp, from_account_id in model.objects.filter(account=instance).values_list(
+            'amount', 'type', 'timestamp', 'from_account_id'
+        ).iterator()
+    ]
+    if not rows:
+        return
+    hours, days = _apply(rows, sign=-1)
+    # Группы, в которых не осталось записей, удаляются, как их не создал бы rebuild
+    HourlyRollup.objects.filter(hour__in=hours, count__lte=0).delete()
+    DailyRollup.objects.filter(day__in=days, count__lte=0).delete()
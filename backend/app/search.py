@@ -0,0 +1,232 @@
+"""Полнотекстовые индексы поиска (SQLite FTS5).
+
+Виртуальная таблица ``app_transaction_fts`` хранит по строке на
+транзакцию (rowid = id транзакции): имя клиента, номер счета и описание.
+Токенизатор ``trigram`` ищет подстроку в любом месте без учета регистра
+(в том числе кириллицы), то есть дает тот же результат, что и
+``icontains`` по трем полям, но по индексу, а не полным просмотром.
+
+Индекс поддерживают триггеры SQLite на ``app_transaction``,
+``app_account`` и ``app_client``: они срабатывают и для ``bulk_create``,
+и для прямых UPDATE проводок, которые обходят сигналы Django. Перед
+миграциями триггеры удаляются, после - создаются заново: при изменении
+схемы SQLite пересоздает таблицу под временным именем и не дает
+переименовать ее, пока на старое имя ссылаются триггеры других таблиц.
+Содержимое индексов после таких миграций строится заново.
+
+Для строк короче трех символов триграммы не строятся - такие запросы
+по-прежнему выполняются через ``icontains``.
+
+Транзакции, перенесенные в архив (archive.py), остаются в индексе: id
+в архиве сохраняется, а триггер удаления из журнала не трогает строки,
+которые уже есть в архиве. Поэтому тот же ``match`` работает и для
+выборок по ``ArchivedTransaction``.
+
+``app_account_fts`` так же индексирует номера активных счетов для поиска
+получателя перевода: счет попадает в индекс при создании и выпадает из
+него при деактивации.
+"""
+from django.db import connections, router
+from django.db.models.expressions import RawSQL
+
+from .models import Account, ArchivedTransaction, Client, Transaction
+
+FTS_TABLE = 'app_transaction_fts'
+ACCOUNT_FTS_TABLE = 'app_account_fts'
+MIN_QUERY_LENGTH = 3
+
+_available = {}
+_dropped = set()
+
+
+def _indexes():
+    """Индексы: (таблица, колонки, заполнение по текущим данным)"""
+    transactions = Transaction._meta.db_table
+    archived = ArchivedTransaction._meta.db_table
+    accounts = Account._meta.db_table
+    clients = Client._meta.db_table
+    return [
+        (FTS_TABLE, 'client_name, account_number, description', f'''
+            INSERT INTO {FTS_TABLE}(rowid, client_name, account_number, description)
+            SELECT t.id, c.name, a.account_number, t.description
+            FROM (
+                SELECT id, account_id, description FROM {transactions}
+                UNION ALL SELECT id, account_id, description FROM {archived}
+            ) t
+            JOIN {accounts} a ON a.id = t.account_id
+            JOIN {clients} c ON c.id = a.client_id
+        '''),
+        (ACCOUNT_FTS_TABLE, 'account_number', f'''
+            INSERT INTO {ACCOUNT_FTS_TABLE}(rowid, account_number)
+            SELECT id, account_number FROM {accounts} WHERE is_active
+        '''),
+    ]
+
+
+TRIGGERS = [
+    f'{FTS_TABLE}_insert', f'{FTS_TABLE}_update', f'{FTS_TABLE}_delete', f'{FTS_TABLE}_archive_delete',
+    f'{FTS_TABLE}_account', f'{FTS_TABLE}_client',
+    f'{ACCOUNT_FTS_TABLE}_insert', f'{ACCOUNT_FTS_TABLE}_update', f'{ACCOUNT_FTS_TABLE}_delete',
+]
+
+
+def _statements():
+    """DDL триггеров, поддерживающих индексы (по порядку TRIGGERS)"""
+    transactions = Transaction._meta.db_table
+    archived = ArchivedTransaction._meta.db_table
+    accounts = Account._meta.db_table
+    clients = Client._meta.db_table
+    index_row = f'''
+        INSERT INTO {FTS_TABLE}(rowid, client_name, account_number, description)
+        SELECT new.id, c.name, a.account_number, new.description
+        FROM {accounts} a JOIN {clients} c ON c.id = a.client_id
+        WHERE a.id = new.account_id;'''
+    return [
+        f'''CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_insert AFTER INSERT ON {transactions}
+        BEGIN {index_row}
+        END''',
+        f'''CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_update
+        AFTER UPDATE OF description, account_id ON {transactions}
+        BEGIN
+            DELETE FROM {FTS_TABLE} WHERE rowid = old.id; {index_row}
+        END''',
+        f'''CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_delete AFTER DELETE ON {transactions}
+        WHEN NOT EXISTS (SELECT 1 FROM {archived} WHERE id = old.id)
+        BEGIN
+            DELETE FROM {FTS_TABLE} WHERE rowid = old.id;
+        END''',
+        f'''CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_archive_delete AFTER DELETE ON {archived}
+        BEGIN
+            DELETE FROM {FTS_TABLE} WHERE rowid = old.id;
+        END''',
+        f'''CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_account
+        AFTER UPDATE OF account_number, client_id ON {accounts}
+        WHEN old.account_number IS NOT new.account_number OR old.client_id IS NOT new.client_id
+        BEGIN
+            UPDATE {FTS_TABLE}
+            SET account_number = new.account_number,
+                client_name = (SELECT name FROM {clients} WHERE id = new.client_id)
+            WHERE rowid IN (
+                SELECT id FROM {transactions} WHERE account_id = new.id
+                UNION ALL SELECT id FROM {archived} WHERE account_id = new.id
+            );
+        END''',
+        f'''CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_client AFTER UPDATE OF name ON {clients}
+        WHEN old.name IS NOT new.name
+        BEGIN
+            UPDATE {FTS_TABLE} SET client_name = new.name
+            WHERE rowid IN (
+                SELECT t.id FROM {transactions} t JOIN {accounts} a ON a.id = t.account_id
+                WHERE a.client_id = new.id
+                UNION ALL
+                SELECT t.id FROM {archived} t JOIN {accounts} a ON a.id = t.account_id
+                WHERE a.client_id = new.id
+            );
+        END''',
+        f'''CREATE TRIGGER IF NOT EXISTS {ACCOUNT_FTS_TABLE}_insert AFTER INSERT ON {accounts}
+        WHEN new.is_active
+        BEGIN
+            INSERT INTO {ACCOUNT_FTS_TABLE}(rowid, account_number) VALUES (new.id, new.account_number);
+        END''',
+        f'''CREATE TRIGGER IF NOT EXISTS {ACCOUNT_FTS_TABLE}_update
+        AFTER UPDATE OF account_number, is_active ON {accounts}
+        WHEN old.account_number IS NOT new.account_number OR old.is_active IS NOT new.is_active
+        BEGIN
+            DELETE FROM {ACCOUNT_FTS_TABLE} WHERE rowid = old.id;
+            INSERT INTO {ACCOUNT_FTS_TABLE}(rowid, account_number)
+            SELECT new.id, new.account_number WHERE new.is_active;
+        END''',
+        f'''CREATE TRIGGER IF NOT EXISTS {ACCOUNT_FTS_TABLE}_delete AFTER DELETE ON {accounts}
+        BEGIN
+            DELETE FROM {ACCOUNT_FTS_TABLE} WHERE rowid = old.id;
+        END''',
+    ]
+
+
+def install(connection, rebuild=False):
+    """Создает индексы (с заполнением по текущим данным) и недостающие триггеры.
+
+    ``rebuild`` - заполнить существующие индексы заново (данные менялись без триггеров).
+    """
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        for table, columns, backfill in _indexes():
+            cursor.execute("SELECT 1 FROM sqlite_master WHERE name = %s", [table])
+            if cursor.fetchone() is None:
+                cursor.execute(f"CREATE VIRTUAL TABLE {table} USING fts5({columns}, tokenize='trigram')")
+                cursor.execute(backfill)
+            elif rebuild:
+                cursor.execute(f"DELETE FROM {table}")
+                cursor.execute(backfill)
+        for statement in _statements():
+            cursor.execute(statement)
+    _available[connection.alias] = True
+
+
+def drop_triggers(connection):
+    """Удаляет триггеры индексов (до install(rebuild=True) индексы не обновляются)"""
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        for name in TRIGGERS:
+            cursor.execute(f'DROP TRIGGER IF EXISTS {name}')
+
+
+def drop_before_migrate(sender, using, plan=None, **kwargs):
+    """Обработчик pre_migrate: триггеры снимаются, только если есть что применять"""
+    if plan:
+        drop_triggers(connections[using])
+        _dropped.add(using)
+
+
+def install_after_migrate(sender, using, **kwargs):
+    """Обработчик post_migrate"""
+    install(connections[using], rebuild=using in _dropped)
+    _dropped.discard(using)
+
+
+def available(connection):
+    """Есть ли индексы в этой базе (проверяется один раз на процесс)"""
+    if connection.alias not in _available:
+        tables = connection.introspection.table_names() if connection.vendor == 'sqlite' else []
+        _available[connection.alias] = FTS_TABLE in tables and ACCOUNT_FTS_TABLE in tables
+    return _available[connection.alias]
+
+
+def _phrase(query):
+    return '"' + query.replace('"', '""') + '"'
+
+
+def match(queryset, query):
+    """Транзакции, у которых query входит в имя клиента, номер счета или описание.
+
+    Возвращает None, если индекс для этого запроса использовать нельзя.
+    """
+    if len(query) < MIN_QUERY_LENGTH or not available(connections[queryset.db]):
+        return None
+    return queryset.filter(
+        id__in=RawSQL(f"SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s", [_phrase(query)])
+    )
+
+
+def match_accounts(query, exclude_client_id, limit, using=None):
+    """Номера и владельцы активных чужих счетов, номер которых содержит query.
+
+    Запрос ведется от индекса: совпадения читаются по порядку и проверка
+    останавливается на ``limit`` строках, поэтому частая подстрока (общий
+    префикс номеров) не дороже редкой. None - индекс использовать нельзя.
+    """
+    connection = connections[using or router.db_for_read(Account)]
+    if len(query) < MIN_QUERY_LENGTH or not available(connection):
+        return None
+    with connection.cursor() as cursor:
+        cursor.execute(f'''
+            SELECT a.account_number, c.name
+            FROM {ACCOUNT_FTS_TABLE} f
+            JOIN {Account._meta.db_table} a ON a.id = f.rowid
+            JOIN {Client._meta.db_table} c ON c.id = a.client_id
+            WHERE f.{ACCOUNT_FTS_TABLE} MATCH %s AND a.is_active AND a.client_id != %s
+            LIMIT %s
+        ''', [_phrase(query), exclude_client_id, limit])
+        return cursor.fetchall()
@@ -0,0 +1,284 @@
+"""Сериализация транзакций для списков API.
+
+Строки читаются через ``values_list`` ровно нужных колонок (с JOIN на
+счета и клиента в том же запросе) и собираются в словари одним циклом без
+создания экземпляров моделей. Суммы остаются ``Decimal``, время -
+``datetime``: их пишет в JSON рендерер (renderers.py). Функции с префиксом ``a`` - то же для
+async-представлений: строки читаются через async-интерфейс ORM. Валюта строки - валюта счета, к которому
+привязана транзакция: у исходящего перевода это валюта отправителя, у
+входящего - получателя.
+
+Истории счетов дочитываются из архива (archive.py), если журнала не
+хватило на нужное число строк и у счета есть архивные транзакции.
+"""
+import csv
+import json
+
+from django.db.models import F, Window
+from django.db.models.functions import RowNumber
+
+from . import archive
+from .models import ArchivedTransaction, Transaction
+from .pagination import keyset_chunks
+
+TYPE_DISPLAY = dict(Transaction.TRANSACTION_TYPES)
+
+COLUMNS = (
+    'id',
+    'amount',
+    'type',
+    'description',
+    'timestamp',
+    'account__account_number',
+    'account__currency',
+    'account__client__name',
+    'from_account__account_number',
+    'from_account__currency',
+    'to_account__account_number',
+    'to_account__currency',
+)
+
+ACCOUNT_COLUMNS = (
+    'id',
+    'amount',
+    'type',
+    'description',
+    'timestamp',
+    'account__currency',
+    'from_account__account_number',
+    'from_account__currency',
+    'to_account__account_number',
+    'to_account__currency',
+)
+
+
+def _transaction_rows(rows):
+    type_display = TYPE_DISPLAY
+    return [
+        {
+            'id': pk,
+            'account_number': account_number,
+            'client_name': client_name,
+            'amount': amount,
+            'type': type_display.get(kind, kind),
+            'description': description,
+            'timestamp': timestamp,
+            'from_account': from_number,
+            'to_account': to_number,
+            'currency': currency,
+            'from_currency': from_currency,
+            'to_currency': to_currency,
+        }
+        for (
+            pk, amount, kind, description, timestamp, account_number, currency, client_name,
+            from_number, from_currency, to_number, to_currency,
+        ) in rows
+    ]
+
+
+def transaction_rows(queryset):
+    """Транзакции для админских списков (тип - отображаемое название)"""
+    return _transaction_rows(queryset.values_list(*COLUMNS))
+
+
+async def atransaction_rows(queryset):
+    """transaction_rows для async-представлений"""
+    return _transaction_rows([row async for row in queryset.values_list(*COLUMNS)])
+
+
+def _account_transaction(pk, amount, kind, description, timestamp, currency,
+                         from_number, from_currency, to_number, to_currency):
+    return {
+        'id': pk,
+        'amount': amount,
+        'type': kind,
+        'type_display': TYPE_DISPLAY.get(kind, kind),
+        'description': description,
+        'timestamp': timestamp,
+        'from_account': from_number,
+        'to_account': to_number,
+        'currency': currency,
+        'from_currency': from_currency,
+        'to_currency': to_currency,
+    }
+
+
+def account_transaction_rows(queryset):
+    """Транзакции в истории счета (тип - код и отдельно отображаемое название)"""
+    return [_account_transaction(*row) for row in queryset.values_list(*ACCOUNT_COLUMNS)]
+
+
+async def aaccount_transaction_rows(queryset):
+    """account_transaction_rows для async-представлений"""
+    return [_account_transaction(*row) async for row in queryset.values_list(*ACCOUNT_COLUMNS)]
+
+
+async def aaccount_history(account_id, limit):
+    """Последние limit транзакций счета (старше журнала - из архива)"""
+    rows = await aaccount_transaction_rows(
+        Transaction.objects.filter(account_id=account_id).order_by('-timestamp')[:limit]
+    )
+    if len(rows) < limit and await archive.aarchived_accounts([account_id]):
+        rows += await aaccount_transaction_rows(_archived(account_id, limit - len(rows)))
+    return rows
+
+
+def _archived(account_id, limit):
+    """Последние архивные транзакции счета (по индексу, без оконной функции по всему архиву)"""
+    return ArchivedTransaction.objects.filter(account_id=account_id).order_by('-timestamp', '-id')[:limit]
+
+
+def _latest_queryset(account_ids, per_account):
+    return Transaction.objects.filter(account_id__in=account_ids).annotate(
+        position=Window(
+            RowNumber(),
+            partition_by=[F('account_id')],
+            order_by=[F('timestamp').desc(), F('id').desc()],
+        )
+    ).filter(position__lte=per_account).order_by('-timestamp', '-id').values_list('account_id', *ACCOUNT_COLUMNS)
+
+
+def _group_by_account(account_ids, rows):
+    grouped = {account_id: [] for account_id in account_ids}
+    for account_id, *row in rows:
+        grouped[account_id].append(_account_transaction(*row))
+    return grouped
+
+
+def _short(grouped, per_account):
+    return [account_id for account_id, rows in grouped.items() if len(rows) < per_account]
+
+
+def latest_account_transactions(account_ids, per_account):
+    """Последние per_account транзакций каждого счета одним запросом.
+
+    Номер строки внутри счета считает оконная функция ROW_NUMBER, поэтому
+    число запросов не зависит от числа счетов. Возвращает словарь
+    {id счета: список транзакций от новых к старым}. Истории короче
+    per_account дочитываются из архива - запросом на счет.
+    """
+    grouped = _group_by_account(account_ids, _latest_queryset(account_ids, per_account))
+    for account_id in archive.archived_accounts(_short(grouped, per_account)):
+        rows = grouped[account_id]
+        rows += account_transaction_rows(_archived(account_id, per_account - len(rows)))
+    return grouped
+
+
+async def alatest_account_transactions(account_ids, per_account):
+    """latest_account_transactions для async-представлений"""
+    rows = [row async for row in _latest_queryset(account_ids, per_account)]
+    grouped = _group_by_account(account_ids, rows)
+    for account_id in await archive.aarchived_accounts(_short(grouped, per_account)):
+        rows = grouped[account_id]
+        rows += await aaccount_transaction_rows(_archived(account_id, per_account - len(rows)))
+    return grouped
+
+
+ACCOUNT_LIST_COLUMNS = ('id', 'account_number', 'client__name', 'balance', 'currency', 'created_at', 'is_active')
+
+
+def _account_rows(rows):
+    return [
+        {
+            'id': pk,
+            'account_number': account_number,
+            'client_name': client_name,
+            'balance': balance,
+            'currency': currency,
+            'created_at': created_at,
+            'is_active': is_active,
+        }
+        for pk, account_number, client_name, balance, currency, created_at, is_active in rows
+    ]
+
+
+def account_rows(queryset):
+    """Счета для списков (имя владельца - тем же запросом)"""
+    return _account_rows(queryset.values_list(*ACCOUNT_LIST_COLUMNS))
+
+
+async def aaccount_rows(queryset):
+    """account_rows для async-представлений"""
+    return _account_rows([row async for row in queryset.values_list(*ACCOUNT_LIST_COLUMNS)])
+
+
+# Колонки выгрузки журнала: суммы пишутся точно (строкой Decimal), тип - кодом
+EXPORT_HEADER = (
+    'id', 'timestamp', 'account_number', 'client_name', 'type', 'amount', 'currency',
+    'description', 'from_account', 'to_account', 'from_currency', 'to_currency',
+)
+EXPORT_COLUMNS = (
+    'id', 'timestamp', 'account__account_number', 'account__client__name', 'type', 'amount',
+    'account__currency', 'description', 'from_account__account_number',
+    'to_account__account_number', 'from_account__currency', 'to_account__currency',
+)
+EXPORT_CHUNK_SIZE = 5000
+
+
+class _Echo:
+    """Буфер для csv.writer, который сразу возвращает записанную строку"""
+
+    def write(self, value):
+        return value
+
+
+def _export_values(queryset, chunk_size, archive):
+    """Порции строк выгрузки с уже приведенными к строкам суммой и временем"""
+    for rows in keyset_chunks(queryset, EXPORT_COLUMNS, chunk_size, archive):
+        yield [
+            (pk, timestamp.isoformat(), number, name, kind, str(amount), currency,
+             description, from_number, to_number, from_currency, to_currency)
+            for (pk, timestamp, number, name, kind, amount, currency,
+                 description, from_number, to_number, from_currency, to_currency) in rows
+        ]
+
+
+def iter_csv(queryset, chunk_size=EXPORT_CHUNK_SIZE, archive=None):
+    """CSV-выгрузка транзакций: заголовок, затем по одному куску текста на порцию.
+
+    ``archive`` - та же выборка по архиву, выгружается после журнала.
+    """
+    writer = csv.writer(_Echo())
+    yield writer.writerow(EXPORT_HEADER)
+    for rows in _export_values(queryset, chunk_size, archive):
+        yield ''.join(writer.writerow(row) for row in rows)
+
+
+def iter_ndjson(queryset, chunk_size=EXPORT_CHUNK_SIZE, archive=None):
+    """NDJSON-выгрузка транзакций: по объекту JSON на строку"""
+    dumps = json.dumps
+    for rows in _export_values(queryset, chunk_size, archive):
+        yield ''.join(
+            dumps(dict(zip(EXPORT_HEADER, row)), ensure_ascii=False) + '\n' for row in rows
+        )
+
+
+def feed_rows(queryset):
+    """Транзакции для живой ленты: (id пользователя-владельца счета, строка).
+
+    Строка - как в админских списках, плюс id счета и код типа, чтобы
+    клиентская панель могла обновить нужный счет.
+    """
+    type_display = TYPE_DISPLAY
+    return [
+        (user_id, {
+            'id': pk,
+            'account_id': account_id,
+            'account_number': account_number,
+            'client_name': client_name,
+            'amount': amount,
+            'type': type_display.get(kind, kind),
+            'type_code': kind,
+            'description': description,
+            'timestamp': timestamp,
+            'from_account': from_number,
+            'to_account': to_number,
+            'currency': currency,
+            'from_currency': from_currency,
+            'to_currency': to_currency,
+        })
+        for (
+            pk, amount, kind, description, timestamp, account_number, currency, client_name,
+            from_number, from_currency, to_number, to_currency, account_id, user_id,
+        ) in queryset.values_list(*COLUMNS, 'account_id', 'account__client__user_id')
+    ]
@@ -0,0 +1,103 @@
+"""Счетчики статистики админ-панели.
+
+Вместо COUNT(*) по таблицам при каждом открытии панели числа хранятся в
+``StatCounter`` и меняются в той же транзакции БД, что и сами данные:
+проводки увеличивают счетчик журнала рядом с ``bulk_create`` (он не
+отправляет сигналов), остальные записи учитывают обработчики сигналов.
+Смену активности счета обработчик видит, сравнивая ее со значением при
+загрузке счета из БД, без повторного чтения строки.
+Расхождения - удаление транзакций в обход счетов, правки напрямую в
+БД - исправляет ``recount``, который по расписанию запускает команда
+``recount_stats``.
+"""
+from django.db import transaction as db_transaction
+from django.db.models import F
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .models import Account, ArchivedTransaction, Client, StatCounter, Transaction
+
+COUNTERS = {
+    'accounts': lambda: Account.objects.count(),
+    'active_accounts': lambda: Account.objects.filter(is_active=True).count(),
+    'clients': lambda: Client.objects.count(),
+    # Журнал вместе с архивом: перенос в архив число транзакций не меняет
+    'transactions': lambda: Transaction.objects.count() + ArchivedTransaction.objects.count(),
+}
+
+
+def bump(name, delta=1):
+    """Изменяет счетчик на delta в текущей транзакции"""
+    if delta:
+        StatCounter.objects.filter(name=name).update(value=F('value') + delta, updated_at=timezone.now())
+
+
+def recount():
+    """Пересчитывает все счетчики по таблицам, возвращает их значения"""
+    with db_transaction.atomic():
+        # Блокируем строки счетчиков, чтобы проводки не изменили их между подсчетом и записью
+        list(StatCounter.objects.select_for_update().filter(name__in=COUNTERS))
+        now = timezone.now()
+        values = {}
+        for name, count in COUNTERS.items():
+            values[name] = count()
+            StatCounter.objects.update_or_create(
+                name=name, defaults={'value': values[name], 'recounted_at': now}
+            )
+    return values
+
+
+def get_stats():
+    """Значения счетчиков одним запросом (при первом обращении - пересчет)"""
+    values = dict(StatCounter.objects.filter(name__in=COUNTERS).values_list('name', 'value'))
+    if len(values) < len(COUNTERS):
+        return recount()
+    return values
+
+
+@receiver(post_save, sender=Transaction)
+def transaction_saved(sender, instance, created, **kwargs):
+    if created:
+        bump('transactions')
+
+
+@receiver(post_save, sender=Account)
+def account_saved(sender, instance, created, update_fields=None, **kwargs):
+    if created:
+        bump('accounts')
+        bump('active_accounts', 1 if instance.is_active else 0)
+    elif update_fields is None or 'is_active' in update_fields:
+        # Счет, не загруженный из БД, прежней активности не знает - его учтет recount
+        was_active = getattr(instance, '_loaded_is_active', None)
+        if was_active is not None and was_active != instance.is_active:
+            bump('active_accounts', 1 if instance.is_active else -1)
+    else:
+        return
+    instance._loaded_is_active = instance.is_active
+
+
+@receiver(pre_delete, sender=Account)
+def account_deleting(sender, instance, **kwargs):
+    """Транзакции счета удаляются каскадом без сигналов - вычитаем их заранее"""
+    bump('transactions', -(
+        Transaction.objects.filter(account=instance).count()
+        + ArchivedTransaction.objects.filter(account=instance).count()
+    ))
+
+
+@receiver(post_delete, sender=Account)
+def account_deleted(sender, instance, **kwargs):
+    bump('accounts', -1)
+    bump('active_accounts', -1 if instance.is_active else 0)
+
+
+@receiver(post_save, sender=Client)
+def client_saved(sender, instance, created, **kwargs):
+    if created:
+        bump('clients')
+
+
+@receiver(post_delete, sender=Client)
+def client_deleted(sender, instance, **kwargs):
+    bump('clients', -1)
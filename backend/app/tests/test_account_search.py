@@ -0,0 +1,37 @@
+from django.contrib.auth.models import User
+from django.test import TestCase
+
+from app import search
+from app.models import Account, Client
+
+
+class AccountSearchTestCase(TestCase):
+    def setUp(self):
+        self.owner = Client.objects.get(user=User.objects.create_user(username='search_owner'))
+        other = Client.objects.get(user=User.objects.create_user(username='search_other'))
+        self.own = Account.objects.create(client=self.owner, account_number='4081781012340001')
+        self.first = Account.objects.create(client=other, account_number='4081781012340002')
+        self.second = Account.objects.create(client=other, account_number='4081781056780003')
+
+    def match(self, query, limit=10):
+        return sorted(search.match_accounts(query, self.owner.id, limit))
+
+    def test_substring_excludes_own_accounts(self):
+        self.assertEqual(self.match('1234'), [('4081781012340002', 'search_other')])
+        self.assertEqual(self.match('0003'), [('4081781056780003', 'search_other')])
+        self.assertEqual(len(self.match('40817810')), 2)
+        self.assertEqual(len(self.match('40817810', limit=1)), 1)
+        self.assertEqual(self.match('9999'), [])
+
+    def test_index_follows_account_changes(self):
+        self.first.is_active = False
+        self.first.save()
+        self.assertEqual(self.match('1234'), [])
+        self.second.account_number = '4081781012349999'
+        self.second.save()
+        self.assertEqual(self.match('1234'), [('4081781012349999', 'search_other')])
+        self.second.delete()
+        self.assertEqual(self.match('1234'), [])
+
+    def test_short_query_falls_back(self):
+        self.assertIsNone(search.match_accounts('12', self.owner.id, 10))
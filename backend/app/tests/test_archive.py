@@ -0,0 +1,69 @@
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.test import TestCase
+from django.utils import timezone
+
+from app import archive, pagination, posting, serializers, stats
+from app.models import Account, ArchivedTransaction, BalanceMarker, Client, Transaction
+
+
+class ArchiveTestCase(TestCase):
+    def setUp(self):
+        owners = [Client.objects.get(user=User.objects.create_user(username=f'archive_{i}')) for i in range(2)]
+        self.accounts = [Account.objects.create(client=owner, currency='RUB') for owner in owners]
+        first, second = self.accounts
+        for step in range(6):
+            posting.deposit(first.id, Decimal('50.00'), 'Пополнение')
+            posting.transfer(first.id, second.account_number, Decimal('12.34'), 'Перевод')
+            posting.withdraw(second.id, Decimal('1.01'), 'Снятие')
+        # Первые две трети журнала - старше горизонта, по две строки на одну секунду
+        now = timezone.now()
+        ids = list(Transaction.objects.order_by('id').values_list('id', flat=True))
+        self.old = len(ids) * 2 // 3
+        for position, pk in enumerate(ids):
+            age = timedelta(days=100, seconds=-(position // 2)) if position < self.old else timedelta(seconds=-position)
+            Transaction.objects.filter(id=pk).update(timestamp=now - age)
+        self.ids = [account.id for account in self.accounts]
+
+    def snapshot(self):
+        rows, cursor = [], None
+        while True:
+            page, cursor = pagination.paginate(
+                Transaction.objects.all(), cursor, 5, serializers.transaction_rows, ArchivedTransaction.objects.all()
+            )
+            rows += page
+            if cursor is None:
+                break
+        return {
+            'balances': list(Account.objects.order_by('id').values_list('id', 'balance')),
+            'feed': rows,
+            'histories': serializers.latest_account_transactions(self.ids, 20),
+            'export': ''.join(serializers.iter_csv(
+                Transaction.objects.all(), chunk_size=4, archive=ArchivedTransaction.objects.all()
+            )),
+            'counters': stats.recount()['transactions'],
+        }
+
+    def test_reads_and_balances_unchanged(self):
+        before = self.snapshot()
+        call_command('archive_transactions', days=30, chunk_size=5, stdout=StringIO())
+        self.assertEqual(ArchivedTransaction.objects.count(), self.old)
+        self.assertFalse(Transaction.objects.filter(timestamp__lt=archive.horizon(30)).exists())
+        self.assertEqual(self.snapshot(), before)
+
+    def test_markers_hold_balance_after_archived_rows(self):
+        call_command('archive_transactions', days=30, chunk_size=5, stdout=StringIO())
+        for account in Account.objects.all():
+            marker = BalanceMarker.objects.get(account=account)
+            rest = sum(
+                -amount if kind == 'withdraw' or (kind == 'transfer' and from_id == account.id) else amount
+                for kind, amount, from_id in Transaction.objects.filter(account=account).values_list(
+                    'type', 'amount', 'from_account_id'
+                )
+            )
+            self.assertEqual(marker.balance + rest, account.balance)
+            self.assertEqual(marker.archived_count, ArchivedTransaction.objects.filter(account=account).count())
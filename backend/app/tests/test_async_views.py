@@ -0,0 +1,67 @@
+import json
+from decimal import Decimal
+
+from asgiref.sync import async_to_sync
+from django.contrib.auth.models import User
+from django.test import AsyncClient, TransactionTestCase
+
+from app import pagination, posting, renderers, serializers
+from app.models import Account, Client, Transaction
+
+
+class AsyncReadViewsTestCase(TransactionTestCase):
+    # Эндпоинты чтения видят только зафиксированные данные через алиас чтения
+    databases = '__all__'
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='async_views')
+        owner = Client.objects.get(user=self.user)
+        other = Client.objects.get(user=User.objects.create_user(username='async_other'))
+        self.accounts = [Account.objects.create(client=owner, currency=currency) for currency in ('RUB', 'USD')]
+        target = Account.objects.create(client=other, currency='RUB')
+        posting.deposit(self.accounts[0].id, Decimal('100.10'), 'Пополнение')
+        posting.deposit(self.accounts[1].id, Decimal('7.77'), 'Пополнение')
+        posting.transfer(self.accounts[0].id, target.account_number, Decimal('30.05'), 'Перевод')
+        self.admin = User.objects.create_superuser(username='async_admin')
+
+    def get(self, user, url, params=None):
+        """Ответ под WSGI и под ASGI: тело и статус должны совпадать"""
+        self.client.force_login(user)
+        response = self.client.get(url, params)
+        async_client = AsyncClient()
+        async_client.cookies = self.client.cookies
+        async_response = async_to_sync(async_client.get)(url, params)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((async_response.status_code, async_response.content), (200, response.content))
+        return json.loads(response.content)
+
+    def assertPayload(self, payload, expected):
+        self.assertEqual(payload, json.loads(renderers.dumps(expected)))
+
+    def own_accounts(self):
+        return Account.objects.filter(client__user=self.user, is_active=True)
+
+    def test_user_accounts(self):
+        self.assertPayload(self.get(self.user, '/api/accounts/my/'), serializers.account_rows(self.own_accounts()))
+
+    def test_dashboard_summary(self):
+        accounts = serializers.account_rows(self.own_accounts())
+        transactions = serializers.latest_account_transactions([account['id'] for account in accounts], 2)
+        for account in accounts:
+            account['transactions'] = transactions[account['id']]
+        self.assertPayload(
+            self.get(self.user, '/api/dashboard/summary/', {'transactions': 2}),
+            {'accounts': accounts, 'transactions_per_account': 2},
+        )
+
+    def test_recent_transactions(self):
+        rows, cursor = pagination.paginate(Transaction.objects.all(), None, 2, serializers.transaction_rows)
+        self.assertPayload(self.get(self.admin, '/api/admin/recent-transactions/', {'limit': 2}), {
+            'transactions': rows, 'total_count': len(rows), 'limit': 2, 'next_cursor': cursor, 'has_more': True,
+        })
+
+    def test_anonymous_and_wrong_method(self):
+        self.assertEqual(self.client.get('/api/accounts/my/').status_code, 403)
+        self.client.force_login(self.user)
+        self.assertEqual(self.client.post('/api/accounts/my/').status_code, 405)
+        self.assertEqual(self.client.get('/api/admin/recent-transactions/').status_code, 403)
@@ -0,0 +1,23 @@
+from decimal import Decimal
+
+from django.core.exceptions import ValidationError
+from django.test import SimpleTestCase
+
+from app import rates
+from app.models import ExchangeRate
+
+
+class CrossRateTestCase(SimpleTestCase):
+    def test_non_positive_rate_is_skipped(self):
+        with self.assertLogs('app.rates', 'WARNING'):
+            matrix = rates.RateMatrix.build(
+                [('XAA', 'XBB', Decimal('0')), ('XCC', 'XBB', Decimal('2.5000'))], version=None
+            )
+        self.assertEqual(matrix.rate('XCC', 'XBB'), Decimal('2.5000'))
+        self.assertEqual(matrix.rate('XBB', 'XCC'), Decimal('0.4'))
+        with self.assertRaises(rates.RateUnavailable):
+            matrix.rate('XAA', 'XBB')
+
+    def test_zero_rate_fails_validation(self):
+        with self.assertRaises(ValidationError):
+            ExchangeRate(from_currency='USD', to_currency='RUB', rate=Decimal('0')).clean_fields()
@@ -0,0 +1,43 @@
+from datetime import timedelta
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.test import TestCase
+from django.utils import timezone
+
+from app import posting, serializers
+from app.models import Account, Client, Transaction
+
+
+class LatestTransactionsTestCase(TestCase):
+    def setUp(self):
+        owner = Client.objects.get(user=User.objects.create_user(username='dashboard_test'))
+        self.accounts = [Account.objects.create(client=owner, currency='RUB') for _ in range(4)]
+        for position, account in enumerate(self.accounts):
+            for _ in range(3 + position):
+                posting.deposit(account.id, Decimal('10.00'), 'Пополнение')
+        posting.transfer(self.accounts[0].id, self.accounts[1].account_number, Decimal('5.00'), 'Перевод')
+        # Одинаковое время у части строк: порядок внутри счета решает id
+        moment = timezone.now()
+        Transaction.objects.filter(id__in=Transaction.objects.order_by('id').values('id')[:6]).update(
+            timestamp=moment - timedelta(hours=1)
+        )
+        self.ids = [account.id for account in self.accounts]
+
+    def expected(self, per_account):
+        return {
+            account_id: serializers.account_transaction_rows(
+                Transaction.objects.filter(account_id=account_id).order_by('-timestamp', '-id')[:per_account]
+            )
+            for account_id in self.ids
+        }
+
+    def test_matches_per_account_queries(self):
+        for per_account in (1, 3, 5, 20):
+            with self.subTest(per_account=per_account):
+                self.assertEqual(serializers.latest_account_transactions(self.ids, per_account), self.expected(per_account))
+
+    def test_one_query_for_all_accounts(self):
+        with self.assertNumQueries(1):
+            grouped = serializers.latest_account_transactions(self.ids, 3)
+        self.assertEqual([len(rows) for rows in grouped.values()], [3, 3, 3, 3])
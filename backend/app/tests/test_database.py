@@ -0,0 +1,60 @@
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.db import DEFAULT_DB_ALIAS, OperationalError, connections
+from django.test import TestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+
+from app import database
+from app.models import Account, Client
+
+
+class ReadRouterTestCase(TestCase):
+    databases = '__all__'
+
+    def test_reads_inside_reading_block(self):
+        self.assertEqual(Account.objects.all().db, DEFAULT_DB_ALIAS)
+        with database.reading():
+            self.assertEqual(Account.objects.all().db, 'read')
+        self.assertEqual(Account.objects.all().db, DEFAULT_DB_ALIAS)
+
+    def test_writes_go_to_default(self):
+        router = database.ReadRouter()
+        with database.reading():
+            self.assertEqual(router.db_for_write(Account), DEFAULT_DB_ALIAS)
+        self.assertFalse(router.allow_migrate('read', 'app'))
+        self.assertIsNone(router.allow_migrate(DEFAULT_DB_ALIAS, 'app'))
+
+    def test_read_connection_is_query_only(self):
+        with connections['read'].cursor() as cursor:
+            cursor.execute('PRAGMA query_only')
+            self.assertEqual(cursor.fetchone()[0], 1)
+            with self.assertRaises(OperationalError):
+                cursor.execute('DELETE FROM app_account')
+
+
+class ReadViewRoutingTestCase(TransactionTestCase):
+    databases = '__all__'
+
+    def setUp(self):
+        user = User.objects.create_user(username='routing_test')
+        self.account = Account.objects.create(client=Client.objects.get(user=user), currency='RUB')
+        self.client.force_login(user)
+
+    def captured(self, method, url, data=None):
+        with CaptureQueriesContext(connections[DEFAULT_DB_ALIAS]) as default, \
+                CaptureQueriesContext(connections['read']) as read:
+            response = getattr(self.client, method)(url, data, content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        return len(default), len(read)
+
+    def test_read_view_uses_read_alias(self):
+        default, read = self.captured('get', f'/api/accounts/{self.account.id}/')
+        self.assertEqual(default, 0)
+        self.assertGreater(read, 0)
+
+    def test_posting_uses_default(self):
+        default, read = self.captured('post', '/api/deposit/', {'account_id': self.account.id, 'amount': '5.00'})
+        self.assertGreater(default, 0)
+        self.assertEqual(read, 0)
+        self.assertEqual(Account.objects.get(id=self.account.id).balance, Decimal('5.00'))
@@ -0,0 +1,25 @@
+import asyncio
+from unittest import mock
+
+from django.test import SimpleTestCase
+
+from app import feed
+
+
+class FeedHeartbeatTestCase(SimpleTestCase):
+    def test_reconnect_keeps_one_heartbeat_chain(self):
+        """Переподключение до срабатывания таймера не запускает вторую цепочку пингов"""
+        async def reconnect():
+            feed.unsubscribe(feed.subscribe(None))
+            subscription = feed.subscribe(None)
+            try:
+                await asyncio.sleep(0.12)
+                return subscription.queue.qsize(), len(feed._timers)
+            finally:
+                feed.unsubscribe(subscription)
+
+        with mock.patch.object(feed, 'HEARTBEAT', 0.05):
+            pings, timers = asyncio.run(reconnect())
+        self.assertEqual(timers, 1)
+        self.assertIn(pings, (1, 2))
+        self.assertEqual(feed._timers, {})
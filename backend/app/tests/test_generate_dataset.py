@@ -0,0 +1,51 @@
+from collections import defaultdict
+from decimal import Decimal
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TestCase
+from django.utils import timezone
+
+from app.management.commands import generate_dataset
+from app.models import Account, Client, DailyRollup, Transaction
+
+
+class GenerateDatasetTestCase(TestCase):
+    def test_rollups_match_journal(self):
+        """Обороты после generate_dataset покрывают все дни журнала, включая сегодняшний"""
+        call_command('generate_dataset', clients=5, accounts=10, transactions=500, days=3, stdout=StringIO())
+        expected = defaultdict(lambda: [0, Decimal('0')])
+        for timestamp, currency, kind, amount in Transaction.objects.values_list(
+            'timestamp', 'account__currency', 'type', 'amount'
+        ):
+            totals = expected[timezone.localdate(timestamp), currency, kind]
+            totals[0] += 1
+            totals[1] += amount
+        rollups = {
+            (day, currency, kind): [count, amount]
+            for day, currency, kind, count, amount in DailyRollup.objects.values_list(
+                'day', 'currency', 'type', 'count', 'amount'
+            )
+        }
+        self.assertEqual(rollups, dict(expected))
+        self.assertIn(timezone.localdate(), {day for day, _, _ in rollups})
+        self.assertEqual(Transaction.objects.count(), 500)
+
+    def test_creates_every_requested_account(self):
+        """Когда свободных номеров мало, номера дотягиваются, пока не хватит на все счета"""
+        Account.objects.create(
+            client=Client.objects.get(user=User.objects.create_user(username='dataset_owner')),
+            account_number='4081781010000003',
+        )
+        with mock.patch.object(generate_dataset, 'NUMBER_RANGE', range(10 ** 7, 10 ** 7 + 11)):
+            call_command('generate_dataset', clients=2, accounts=10, transactions=10, days=1, stdout=StringIO())
+        self.assertEqual(Account.objects.filter(client__user__username__startswith='load').count(), 10)
+
+    def test_not_enough_numbers(self):
+        with mock.patch.object(generate_dataset, 'NUMBER_RANGE', range(10 ** 7, 10 ** 7 + 9)):
+            with self.assertRaisesMessage(CommandError, 'Свободных номеров счетов 9, а нужно 10'):
+                call_command('generate_dataset', clients=2, accounts=10, transactions=10, days=1, stdout=StringIO())
+        self.assertFalse(User.objects.filter(username__startswith='load').exists())
@@ -0,0 +1,72 @@
+from datetime import timedelta
+from decimal import Decimal
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.test import TestCase
+from django.utils import timezone
+
+from app import idempotency, posting
+from app.models import Account, Client, IdempotencyKey
+
+
+class IdempotencyTestCase(TestCase):
+    def setUp(self):
+        user = User.objects.create_user(username='idempotency_test')
+        self.account = Account.objects.create(client=Client.objects.get(user=user), currency='RUB')
+        self.client.force_login(user)
+        idempotency.recent_responses.clear()
+
+    def deposit(self):
+        return self.client.post(
+            '/api/deposit/', {'account_id': self.account.id, 'amount': '10.00'},
+            content_type='application/json', headers={'Idempotency-Key': 'deposit-1'},
+        )
+
+    def balance(self):
+        return Account.objects.values_list('balance', flat=True).get(id=self.account.id)
+
+    def test_expired_key_is_processed_as_new(self):
+        self.assertEqual(self.deposit().status_code, 200)
+        # Другой процесс: в его кеше ответа нет, ключ читается из базы
+        idempotency.recent_responses.clear()
+        replayed = self.deposit()
+        self.assertEqual(replayed['Idempotent-Replayed'], 'true')
+        self.assertEqual(self.balance(), Decimal('10.00'))
+
+        idempotency.recent_responses.clear()
+        IdempotencyKey.objects.update(created_at=timezone.now() - timedelta(seconds=idempotency._ttl() + 1))
+        response = self.deposit()
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(response.has_header('Idempotent-Replayed'))
+        self.assertEqual(self.balance(), Decimal('20.00'))
+        self.assertEqual(IdempotencyKey.objects.count(), 1)
+
+    def test_stale_claim_is_reclaimed_after_lease(self):
+        """Ключ, занятый упавшим процессом, освобождается по истечении аренды"""
+        IdempotencyKey.objects.create(
+            user_id=self.account.client.user_id, key='deposit-1', endpoint='/api/deposit/', request_hash='',
+        )
+        response = self.deposit()
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(self.balance(), Decimal('0.00'))
+
+        IdempotencyKey.objects.update(created_at=timezone.now() - timedelta(seconds=idempotency._lease()))
+        response = self.deposit()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.balance(), Decimal('10.00'))
+        self.assertEqual(IdempotencyKey.objects.get().status_code, 200)
+
+    def test_response_is_returned_when_claim_was_released(self):
+        """Ключ освободили по аренде, пока операция выполнялась: ответ все равно отдается"""
+        deposit = posting.deposit
+
+        def release_then_deposit(*args, **kwargs):
+            IdempotencyKey.objects.all().delete()
+            return deposit(*args, **kwargs)
+
+        with mock.patch.object(posting, 'deposit', release_then_deposit):
+            response = self.deposit()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.balance(), Decimal('10.00'))
+        self.assertFalse(IdempotencyKey.objects.exists())
@@ -0,0 +1,39 @@
+from decimal import Decimal
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.test import TestCase, override_settings
+
+from app import metrics, posting
+from app.models import Account, Client
+
+
+class OptimisticTransferTestCase(TestCase):
+    def setUp(self):
+        user = User.objects.create_user(username='optimistic_test')
+        self.client_record = Client.objects.get(user=user)
+        self.account = Account.objects.create(client=self.client_record, balance=Decimal('100.00'), currency='RUB')
+        self.target = Account.objects.create(client=self.client_record, balance=Decimal('0.00'), currency='RUB')
+
+    def balance(self, account):
+        return Account.objects.values_list('balance', flat=True).get(id=account.id)
+
+    @override_settings(POSTING_MODE='optimistic', POSTING_CAS_BACKOFF=0)
+    def test_retries_after_admin_save(self):
+        """Сохранение счета через модель меняет версию: CAS повторяется и не теряет правку"""
+        statement = posting._cas_statement
+
+        def admin_save_then_statement():
+            # Между чтением счетов переводом и его записью
+            account = Account.objects.get(id=self.account.id)
+            account.balance = Decimal('500.00')
+            account.save()
+            return statement()
+
+        metrics.reset()
+        with mock.patch.object(posting, '_cas_statement', admin_save_then_statement):
+            result = posting.transfer(self.account.id, self.target.account_number, Decimal('100.00'), 'Перевод средств')
+        self.assertGreaterEqual(metrics.summary()['optimistic']['conflicts'], 1)
+        self.assertEqual(result['from_account_balance'], Decimal('400.00'))
+        self.assertEqual(self.balance(self.account), Decimal('400.00'))
+        self.assertEqual(self.balance(self.target), Decimal('100.00'))
@@ -0,0 +1,49 @@
+from datetime import timedelta
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.test import TestCase
+from django.utils import timezone
+
+from app import pagination, posting
+from app.models import Account, Client, Transaction
+
+
+class KeysetPaginationTestCase(TestCase):
+    def setUp(self):
+        user = User.objects.create_user(username='pagination_test')
+        account = Account.objects.create(client=Client.objects.get(user=user), currency='RUB')
+        for _ in range(23):
+            posting.deposit(account.id, Decimal('1.00'), 'Пополнение')
+        # Группы по 5 строк с одинаковым временем: граница страницы попадает внутрь группы
+        moment = timezone.now().replace(microsecond=0)
+        for position, pk in enumerate(Transaction.objects.order_by('id').values_list('id', flat=True)):
+            Transaction.objects.filter(id=pk).update(timestamp=moment - timedelta(seconds=position // 5))
+        self.expected = list(Transaction.objects.order_by('-timestamp', '-id').values_list('id', flat=True))
+
+    def serialize(self, queryset):
+        return list(queryset.values('id', 'timestamp'))
+
+    def walk(self, limit):
+        ids, cursor = [], None
+        while True:
+            rows, cursor = pagination.paginate(Transaction.objects.all(), cursor, limit, self.serialize)
+            ids += [row['id'] for row in rows]
+            if cursor is None:
+                return ids
+
+    def test_pages_have_no_duplicates_or_gaps(self):
+        for limit in (1, 3, 4, 5, 7, 23, 50):
+            with self.subTest(limit=limit):
+                self.assertEqual(self.walk(limit), self.expected)
+
+    def test_keyset_chunks(self):
+        chunks = list(pagination.keyset_chunks(Transaction.objects.all(), ('id', 'timestamp'), 4))
+        self.assertEqual([pk for rows in chunks for pk, _ in rows], self.expected)
+        self.assertTrue(all(len(rows) <= 4 for rows in chunks))
+
+    def test_cursor_round_trip(self):
+        moment = timezone.now()
+        self.assertEqual(pagination.decode_cursor(pagination.encode_cursor(moment, 42)), (moment, 42))
+        with self.assertRaises(pagination.InvalidCursor):
+            pagination.decode_cursor('не курсор')
@@ -0,0 +1,100 @@
+import random
+import threading
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import TestCase, TransactionTestCase
+
+from app import posting
+from app.models import Account, Client, Transaction
+
+
+class PostingTestCase(TestCase):
+    def setUp(self):
+        user = User.objects.create_user(username='posting_test')
+        self.client_record = Client.objects.get(user=user)
+        self.account = Account.objects.create(client=self.client_record, balance=Decimal('0.00'), currency='RUB')
+
+    def balance(self, account):
+        return Account.objects.values_list('balance', flat=True).get(id=account.id)
+
+    def test_balance_stays_exact_in_cents(self):
+        # SQLite считает balance - x в REAL: без округления осталось бы 0.19999999999999998
+        posting.deposit(self.account.id, Decimal('0.30'), 'Пополнение счета')
+        posting.withdraw(self.account.id, Decimal('0.10'), 'Снятие наличных')
+        self.assertEqual(self.balance(self.account), Decimal('0.20'))
+        posting.withdraw(self.account.id, Decimal('0.20'), 'Снятие наличных')
+        self.assertEqual(self.balance(self.account), Decimal('0.00'))
+        with self.assertRaises(posting.InsufficientFunds):
+            posting.withdraw(self.account.id, Decimal('0.01'), 'Снятие наличных')
+
+
+class ConcurrentPostingTestCase(TransactionTestCase):
+    """Параллельные проводки из нескольких потоков: деньги не появляются и не исчезают"""
+
+    THREADS = 4
+    OPERATIONS = 40
+    INITIAL = Decimal('100.00')
+
+    def test_money_is_conserved(self):
+        user = User.objects.create_user(username='concurrent_test')
+        client = Client.objects.get(user=user)
+        accounts = [
+            Account.objects.create(client=client, balance=self.INITIAL, currency='RUB') for _ in range(4)
+        ]
+        ids = [account.id for account in accounts]
+        numbers = [account.account_number for account in accounts]
+        totals = {'deposited': Decimal('0'), 'withdrawn': Decimal('0'), 'errors': []}
+        lock = threading.Lock()
+        start = threading.Barrier(self.THREADS)
+
+        def worker(seed):
+            rnd = random.Random(seed)
+            deposited = withdrawn = Decimal('0')
+            try:
+                start.wait()
+                for _ in range(self.OPERATIONS):
+                    amount = Decimal(rnd.randint(1, 5000)) / 100
+                    operation = rnd.choice(('deposit', 'withdraw', 'transfer', 'transfer'))
+                    try:
+                        if operation == 'deposit':
+                            posting.deposit(rnd.choice(ids), amount, 'Пополнение счета')
+                            deposited += amount
+                        elif operation == 'withdraw':
+                            posting.withdraw(rnd.choice(ids), amount, 'Снятие наличных')
+                            withdrawn += amount
+                        else:
+                            source, target = rnd.sample(range(len(ids)), 2)
+                            posting.transfer(ids[source], numbers[target], amount, 'Перевод средств')
+                    except posting.InsufficientFunds:
+                        pass
+            except Exception as e:
+                with lock:
+                    totals['errors'].append(e)
+            finally:
+                connection.close()
+            with lock:
+                totals['deposited'] += deposited
+                totals['withdrawn'] += withdrawn
+
+        threads = [threading.Thread(target=worker, args=(seed,)) for seed in range(self.THREADS)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(totals['errors'], [])
+        balances = dict(Account.objects.filter(id__in=ids).values_list('id', 'balance'))
+        self.assertEqual(
+            sum(balances.values()), self.INITIAL * len(ids) + totals['deposited'] - totals['withdrawn']
+        )
+        self.assertGreaterEqual(min(balances.values()), 0)
+        # Баланс каждого счета - начальный плюс его записи журнала
+        ledger = dict.fromkeys(ids, self.INITIAL)
+        for account_id, amount, kind, from_account_id in Transaction.objects.filter(account_id__in=ids).values_list(
+            'account_id', 'amount', 'type', 'from_account_id'
+        ):
+            outflow = kind == 'withdraw' or (kind == 'transfer' and from_account_id == account_id)
+            ledger[account_id] += -amount if outflow else amount
+        self.assertEqual(ledger, balances)
@@ -0,0 +1,56 @@
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+
+from app import principal
+from app.models import Account, Client
+
+
+class PrincipalCacheTestCase(TestCase):
+    def setUp(self):
+        principal._cache.clear()
+        self.addCleanup(principal._cache.clear)
+        self.user = User.objects.create_user(username='principal_test', password='secret-password-1')
+        self.account = Account.objects.create(client=Client.objects.get(user=self.user), currency='RUB')
+        self.client.force_login(self.user)
+
+    def deposit(self):
+        """Пополнение и запросы к пользователям и клиентам, которые оно сделало"""
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(
+                '/api/deposit/', {'account_id': self.account.id, 'amount': '1.00'}, content_type='application/json',
+            )
+        tables = {
+            table for query in queries for table in ('auth_user', 'app_client')
+            if f'FROM "{table}"' in query['sql']
+        }
+        return response.status_code, tables
+
+    def test_hit_skips_user_and_client_queries(self):
+        self.assertEqual(self.deposit(), (200, {'auth_user', 'app_client'}))
+        self.assertEqual(self.deposit(), (200, set()))
+        self.assertEqual(Account.objects.get(id=self.account.id).balance, Decimal('2.00'))
+
+    @override_settings(PRINCIPAL_CACHE_TTL=-1)
+    def test_expired_entry_is_reloaded(self):
+        self.assertEqual(self.deposit(), (200, {'auth_user', 'app_client'}))
+        self.assertEqual(self.deposit(), (200, {'auth_user', 'app_client'}))
+
+    def test_save_drops_entry(self):
+        self.deposit()
+        User.objects.get(id=self.user.id).save()
+        self.assertEqual(self.deposit(), (200, {'auth_user', 'app_client'}))
+
+    def test_password_change_logs_out(self):
+        """Хеш сессии сверяется и при попадании в кеш"""
+        self.deposit()
+        principal._cache.set(self.user.id, principal._cache.get(self.user.id)._replace(session_hash='other'), 60)
+        status_code, _ = self.deposit()
+        self.assertEqual(status_code, 200)
+        self.user.set_password('secret-password-2')
+        self.user.save()
+        status_code, _ = self.deposit()
+        self.assertEqual(status_code, 403)
@@ -0,0 +1,71 @@
+from datetime import timedelta
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.test import TestCase
+from django.utils import timezone
+
+from app import rates
+from app.models import ExchangeRate, ExchangeRateHistory
+
+
+class HistoryFixtureMixin:
+    def setUp(self):
+        rates.invalidate()
+        self.addCleanup(rates.invalidate)
+        self.start = timezone.now() - timedelta(days=2)
+        ExchangeRateHistory.objects.bulk_create([
+            ExchangeRateHistory(from_currency='XAA', to_currency='XBB', rate=Decimal('2.0000'), valid_from=self.start),
+            ExchangeRateHistory(
+                from_currency='XBB', to_currency='XCC', rate=Decimal('5.0000'), valid_from=self.start + timedelta(days=1)
+            ),
+            ExchangeRateHistory(
+                from_currency='XAA', to_currency='XBB', rate=Decimal('4.0000'), valid_from=self.start + timedelta(days=1)
+            ),
+        ])
+
+
+class RateHistoryTestCase(HistoryFixtureMixin, TestCase):
+    def test_rate_before_history_is_unavailable(self):
+        """До первой записи пары курса нет, курсы по умолчанию не подставляются"""
+        before = self.start - timedelta(hours=1)
+        with self.assertRaises(rates.RateUnavailable):
+            rates.rate_at('XAA', 'XBB', before)
+        with self.assertRaises(rates.RateUnavailable):
+            rates.rate_at('RUB', 'USD', before)
+        with self.assertRaises(rates.RateUnavailable):
+            rates.rate_at('RUB', 'USD', self.start + timedelta(hours=1))
+
+    def test_rate_follows_history(self):
+        first = self.start + timedelta(hours=1)
+        second = self.start + timedelta(days=1, hours=1)
+        self.assertEqual(rates.rate_at('XAA', 'XBB', first), Decimal('2.0000'))
+        self.assertEqual(rates.rate_at('XBB', 'XAA', first), Decimal('1.0') / Decimal('2.0000'))
+        with self.assertRaises(rates.RateUnavailable):
+            rates.rate_at('XAA', 'XCC', first)
+        self.assertEqual(rates.rate_at('XAA', 'XBB', second), Decimal('4.0000'))
+        self.assertEqual(rates.rate_at('XAA', 'XCC', second), Decimal('20.00000000'))
+
+    def test_saved_rate_is_recorded(self):
+        """Новый курс из save() виден на текущий момент и не меняет прошлые"""
+        ExchangeRate.objects.create(from_currency='XAA', to_currency='XBB', rate=Decimal('8.0000'))
+        rates.invalidate()
+        self.assertEqual(rates.rate_at('XAA', 'XBB', timezone.now()), Decimal('8.0000'))
+        self.assertEqual(rates.rate_at('XAA', 'XBB', self.start + timedelta(hours=1)), Decimal('2.0000'))
+
+
+class ExchangeRatesAtTestCase(HistoryFixtureMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.client.force_login(User.objects.create_superuser(username='rates_admin'))
+
+    def test_rates_at_moment(self):
+        moment = (self.start + timedelta(hours=1)).isoformat()
+        response = self.client.get('/api/admin/exchange-rates/', {'at': moment})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['currencies'], ['XAA', 'XBB'])
+        self.assertEqual(Decimal(str(response.json()['rates']['XAA']['XBB'])), Decimal('2.0000'))
+
+    def test_invalid_moment(self):
+        response = self.client.get('/api/admin/exchange-rates/', {'at': 'вчера'})
+        self.assertEqual(response.status_code, 400)
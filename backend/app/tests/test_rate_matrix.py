@@ -0,0 +1,15 @@
+from decimal import Decimal
+
+from django.test import TestCase
+
+from app import rates
+from app.models import ExchangeRate
+
+
+class RateVersionTestCase(TestCase):
+    def test_queryset_update_changes_version(self):
+        """QuerySet.update() не трогает updated_at, но другие процессы должны увидеть новый курс"""
+        ExchangeRate.objects.create(from_currency='XAA', to_currency='XBB', rate=Decimal('2.0000'))
+        before = rates._version()
+        ExchangeRate.objects.filter(from_currency='XAA').update(rate=Decimal('3.0000'))
+        self.assertNotEqual(rates._version(), before)
@@ -0,0 +1,37 @@
+import json
+from datetime import datetime
+from decimal import Decimal
+from zoneinfo import ZoneInfo
+
+from django.contrib.auth.models import User
+from django.test import TestCase
+
+from app import renderers
+from app.models import Account, Client
+
+
+class RenderersTestCase(TestCase):
+    def test_decimal_is_exact_number(self):
+        self.assertEqual(renderers.dumps({'amount': Decimal('12345678901234567.89')}), b'{"amount":12345678901234567.89}')
+        self.assertEqual(renderers.dumps([Decimal('1E+2'), Decimal('0.10')]), b'[100,0.10]')
+        self.assertEqual(json.loads(renderers.dumps(Decimal('0.10'))), 0.1)
+
+    def test_datetime_and_text(self):
+        moment = datetime(2026, 3, 1, 12, 30, 5, 120000, tzinfo=ZoneInfo('Europe/Moscow'))
+        self.assertEqual(renderers.dumps([moment, 'Перевод', {1: 'a'}]), f'["{moment.isoformat()}","Перевод",{{"1":"a"}}]'.encode())
+
+    def test_decoder_reads_decimal(self):
+        data = json.loads(json.dumps({'balance': Decimal('10.10')}, cls=renderers.DecimalJSONEncoder),
+                          cls=renderers.DecimalJSONDecoder)
+        self.assertEqual(data, {'balance': Decimal('10.10')})
+        self.assertIsInstance(data['balance'], Decimal)
+
+    def test_response_keeps_database_value(self):
+        user = User.objects.create_user(username='renderers_test')
+        account = Account.objects.create(client=Client.objects.get(user=user), balance=Decimal('9999998765.40'))
+        self.client.force_login(user)
+        response = self.client.post(
+            '/api/deposit/', {'account_id': account.id, 'amount': '1234.50'}, content_type='application/json',
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(b'"new_balance":9999999999.90', response.content)
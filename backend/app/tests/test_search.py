@@ -0,0 +1,34 @@
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import TestCase
+
+from app import search
+from app.models import Account, Client, Transaction
+
+
+class SearchMigrateTestCase(TestCase):
+    def triggers(self):
+        """Сколько триггеров индексов есть в базе"""
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"SELECT count(*) FROM sqlite_master WHERE type = 'trigger' "
+                f"AND name IN ({', '.join(['%s'] * len(search.TRIGGERS))})",
+                search.TRIGGERS,
+            )
+            return cursor.fetchone()[0]
+
+    def test_triggers_recreated_and_index_rebuilt_after_migrate(self):
+        """Триггеры снимаются на время миграций, после них индекс строится заново"""
+        user = User.objects.create_user(username='search_test')
+        account = Account.objects.create(client=Client.objects.get(user=user), currency='RUB')
+        search.drop_before_migrate(sender=None, using=connection.alias, plan=[('app', '0001_initial')])
+        self.assertEqual(self.triggers(), 0)
+        # Запись без триггеров в индекс не попадает
+        Transaction.objects.create(account=account, amount=Decimal('1.00'), type='deposit', description='Миграция')
+        self.assertFalse(search.match(Transaction.objects.all(), 'Миграция').exists())
+
+        search.install_after_migrate(sender=None, using=connection.alias)
+        self.assertEqual(self.triggers(), len(search.TRIGGERS))
+        self.assertTrue(search.match(Transaction.objects.all(), 'Миграция').exists())
@@ -0,0 +1,31 @@
+import json
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.test import TestCase
+from rest_framework.renderers import JSONRenderer
+
+from app import posting, serializers
+from app.management.commands.bench_serializers import legacy_transaction_rows
+from app.models import Account, Client, Transaction
+from app.renderers import ORJSONRenderer
+
+
+class TransactionRowsTestCase(TestCase):
+    def setUp(self):
+        owners = [Client.objects.get(user=User.objects.create_user(username=f'serializer_{i}')) for i in range(2)]
+        rub = Account.objects.create(client=owners[0], currency='RUB')
+        other = Account.objects.create(client=owners[1], currency='RUB')
+        usd = Account.objects.create(client=owners[1], currency='USD')
+        posting.deposit(rub.id, Decimal('150.50'), 'Пополнение')
+        posting.deposit(usd.id, Decimal('12.34'), '')
+        posting.withdraw(rub.id, Decimal('0.50'), 'Снятие')
+        posting.transfer(rub.id, other.account_number, Decimal('25.25'), 'Перевод средств')
+
+    def test_matches_legacy_serializer(self):
+        """values_list-сериализатор дает тот же JSON, что прежний цикл по моделям"""
+        queryset = Transaction.objects.order_by('-timestamp', '-id')
+        legacy = json.loads(JSONRenderer().render(legacy_transaction_rows(queryset)))
+        rows = json.loads(ORJSONRenderer().render(serializers.transaction_rows(queryset)))
+        self.assertEqual(len(rows), Transaction.objects.count())
+        self.assertEqual(rows, legacy)
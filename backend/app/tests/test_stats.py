@@ -0,0 +1,47 @@
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from app import posting, stats
+from app.models import Account, Client, StatCounter
+
+
+class StatCountersTestCase(TestCase):
+    def counters(self):
+        return dict(StatCounter.objects.filter(name__in=stats.COUNTERS).values_list('name', 'value'))
+
+    def test_incremental_counters_match_recount(self):
+        stats.recount()
+        owners = [Client.objects.get(user=User.objects.create_user(username=f'stats_{i}')) for i in range(3)]
+        accounts = [Account.objects.create(client=owner, currency='RUB') for owner in owners for _ in range(2)]
+        posting.deposit(accounts[0].id, Decimal('100.00'), 'Пополнение')
+        posting.withdraw(accounts[0].id, Decimal('10.00'), 'Снятие')
+        posting.transfer(accounts[0].id, accounts[1].account_number, Decimal('20.00'), 'Перевод')
+        posting.deposit(accounts[2].id, Decimal('5.00'), 'Пополнение')
+
+        closed = Account.objects.get(id=accounts[1].id)
+        closed.is_active = False
+        closed.save()
+        closed.save()
+        reopened = Account.objects.get(id=accounts[3].id)
+        reopened.is_active = False
+        reopened.save(update_fields=['is_active'])
+        reopened.is_active = True
+        reopened.save()
+        Account.objects.get(id=accounts[2].id).delete()
+        owners[2].user.delete()
+
+        incremental = self.counters()
+        self.assertEqual(stats.recount(), incremental)
+
+    def test_save_does_not_read_account(self):
+        owner = Client.objects.get(user=User.objects.create_user(username='stats_reader'))
+        account = Account.objects.get(id=Account.objects.create(client=owner, currency='RUB').id)
+        account.is_active = False
+        table = Account._meta.db_table
+        with CaptureQueriesContext(connection) as queries:
+            account.save()
+        self.assertFalse([query for query in queries if query['sql'].startswith('SELECT') and f'"{table}"' in query['sql']])
@@ -0,0 +1,102 @@
+from decimal import Decimal
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.test import TestCase
+
+from app import posting
+from app.models import Account, Client, Transaction
+
+
+class TransferBatchTestCase(TestCase):
+    def setUp(self):
+        user = User.objects.create_user(username='batch_test')
+        self.client_record = Client.objects.get(user=user)
+        self.account = self.open(Decimal('100.00'))
+        self.target = self.open(Decimal('0.00'))
+
+    def open(self, balance):
+        return Account.objects.create(client=self.client_record, balance=balance, currency='RUB')
+
+    def item(self, to_account_number, amount, from_account_id=None):
+        return {
+            'from_account_id': from_account_id or self.account.id,
+            'to_account_number': to_account_number,
+            'amount': Decimal(amount),
+            'description': 'Перевод средств',
+        }
+
+    def balance(self, account):
+        return Account.objects.values_list('balance', flat=True).get(id=account.id)
+
+    def test_batch_debit_uses_rounded_balance(self):
+        Account.objects.filter(id=self.account.id).update(balance=Decimal('0.00'))
+        posting.deposit(self.account.id, Decimal('0.30'), 'Пополнение счета')
+        posting.withdraw(self.account.id, Decimal('0.10'), 'Снятие наличных')
+        result, = posting.transfer_batch([self.item(self.target.account_number, '0.20')])
+        self.assertNotIsInstance(result, Exception)
+        self.assertEqual(self.balance(self.account), Decimal('0.00'))
+        self.assertEqual(self.balance(self.target), Decimal('0.20'))
+
+    def test_errors_are_reported_per_item(self):
+        results = posting.transfer_batch([
+            self.item(self.target.account_number, '30.00'),
+            self.item('40817810000000000', '1.00'),
+            self.item(self.target.account_number, '1.00', from_account_id=10 ** 9),
+            self.item(self.target.account_number, '500.00'),
+            self.item(self.target.account_number, '20.00'),
+        ])
+        self.assertEqual(
+            [type(result) for result in results[1:4]],
+            [posting.RecipientNotFound, Account.DoesNotExist, posting.InsufficientFunds],
+        )
+        # Результат как у transfer: балансы сразу после своего перевода
+        self.assertEqual(results[0]['from_account_balance'], Decimal('70.00'))
+        self.assertEqual(results[0]['to_account_balance'], Decimal('30.00'))
+        self.assertEqual(results[4]['from_account_balance'], Decimal('50.00'))
+        self.assertEqual(results[4]['to_account_balance'], Decimal('50.00'))
+        self.assertEqual(results[4]['transaction_from'].account_id, self.account.id)
+        self.assertEqual(self.balance(self.account), Decimal('50.00'))
+        self.assertEqual(Transaction.objects.filter(type='transfer').count(), 4)
+
+    def test_debit_is_refunded_when_recipient_fails(self):
+        """Получатель деактивирован после разрешения номеров: списание возвращается"""
+        lock_in_order = posting._lock_in_order
+
+        def deactivate_recipient(account_ids):
+            Account.objects.filter(id=self.target.id).update(is_active=False)
+            lock_in_order(account_ids)
+
+        with mock.patch.object(posting, '_lock_in_order', deactivate_recipient):
+            result, = posting.transfer_batch([self.item(self.target.account_number, '30.00')])
+        self.assertIsInstance(result, posting.RecipientNotFound)
+        self.assertEqual(self.balance(self.account), Decimal('100.00'))
+        self.assertEqual(self.balance(self.target), Decimal('0.00'))
+        self.assertFalse(Transaction.objects.exists())
+
+    def test_batch_size_limit(self):
+        with mock.patch.object(posting, 'MAX_BATCH_SIZE', 3):
+            with self.assertRaises(posting.PostingError):
+                posting.transfer_batch([self.item(self.target.account_number, '1.00')] * 4)
+            self.assertEqual(len(posting.transfer_batch([self.item(self.target.account_number, '1.00')] * 3)), 3)
+        self.assertEqual(self.balance(self.account), Decimal('97.00'))
+
+    def test_chunks_post_every_transfer(self):
+        with mock.patch.object(posting, 'BATCH_CHUNK_SIZE', 2):
+            results = posting.transfer_batch([self.item(self.target.account_number, '10.00')] * 5)
+        self.assertEqual([result['from_account_balance'] for result in results],
+                         [Decimal('90.00'), Decimal('80.00'), Decimal('70.00'), Decimal('60.00'), Decimal('50.00')])
+        self.assertEqual(self.balance(self.target), Decimal('50.00'))
+
+    def test_endpoint_reports_results(self):
+        self.client.force_login(self.client_record.user)
+        response = self.client.post('/api/transfers/batch/', {'transfers': [
+            {'from_account_id': self.account.id, 'to_account_number': self.target.account_number, 'amount': '10.00'},
+            {'from_account_id': self.account.id, 'to_account_number': self.target.account_number, 'amount': '-1'},
+        ]}, content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual(data['summary'], {'total': 2, 'succeeded': 1, 'failed': 1})
+        self.assertTrue(data['results'][0]['success'])
+        self.assertEqual(Decimal(str(data['results'][0]['from_account_balance'])), Decimal('90.00'))
+        self.assertFalse(data['results'][1]['success'])
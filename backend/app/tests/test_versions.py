@@ -0,0 +1,50 @@
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+
+from app.models import Account, Client
+
+
+class ConditionalGetTestCase(TransactionTestCase):
+    # Эндпоинты чтения видят только зафиксированные данные через алиас 'read'
+    databases = '__all__'
+
+    def setUp(self):
+        user = User.objects.create_user(username='versions_test')
+        self.account = Account.objects.create(client=Client.objects.get(user=user), currency='RUB')
+        self.client.force_login(user)
+
+    def assertRevalidates(self, url, write):
+        """Тот же ETag дает 304, а после записи ETag другой и ответ полный"""
+        first = self.client.get(url)
+        self.assertEqual(first.status_code, 200)
+        etag = first['ETag']
+        self.assertEqual(self.client.get(url, headers={'If-None-Match': etag}).status_code, 304)
+        write()
+        second = self.client.get(url, headers={'If-None-Match': etag})
+        self.assertEqual(second.status_code, 200)
+        self.assertNotEqual(second['ETag'], etag)
+
+    def test_account_list(self):
+        self.assertRevalidates('/api/accounts/my/', lambda: self.client.post(
+            '/api/deposit/', {'account_id': self.account.id, 'amount': '10.00'}, content_type='application/json',
+        ))
+
+    def test_account_detail(self):
+        def write():
+            self.account.balance = Decimal('5.00')
+            self.account.save()
+
+        self.assertRevalidates(f'/api/accounts/{self.account.id}/', write)
+
+    def test_save_bumps_version_in_one_update(self):
+        table = Account._meta.db_table
+        with CaptureQueriesContext(connection) as queries:
+            self.account.save()
+        updates = [query['sql'] for query in queries if query['sql'].startswith(f'UPDATE "{table}"')]
+        self.assertEqual(len(updates), 1)
+        self.assertEqual(self.account.version, 1)
+        self.assertIsNotNone(self.account.modified_at)
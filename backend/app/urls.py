@@ -13,19 +13,28 @@ urlpatterns = [
     
     # API - пользовательские
     path('accounts/my/', views.get_user_accounts, name='get_user_accounts'),
+    path('dashboard/summary/', views.dashboard_summary, name='dashboard_summary'),
     path('accounts/create/', views.create_account, name='create_account'),
     path('accounts/<int:account_id>/', views.get_account_detail, name='get_account_detail'),
     path('accounts/search/', views.search_accounts, name='search_accounts'),
     path('deposit/', views.deposit, name='deposit'),
     path('withdraw/', views.withdraw, name='withdraw'),
     path('transfer/', views.transfer, name='transfer'),
+    path('transfers/batch/', views.transfer_batch, name='transfer_batch'),
     
     # API - административные
     path('admin/transactions/', views.get_all_transactions, name='get_all_transactions'),
     path('admin/recent-transactions/', views.get_recent_transactions, name='get_recent_transactions'),
     path('admin/accounts/', views.get_all_accounts, name='get_all_accounts'),
+    path('admin/exchange-rates/', views.get_exchange_rates, name='get_exchange_rates'),
+    path('admin/stats/', views.get_admin_stats, name='get_admin_stats'),
+    path('admin/posting-metrics/', views.get_posting_metrics, name='get_posting_metrics'),
+    path('admin/analytics/daily/', views.get_daily_turnover, name='get_daily_turnover'),
+    path('admin/analytics/hourly/', views.get_hourly_turnover, name='get_hourly_turnover'),
     path('admin/check/', views.admin_check, name='admin_check'),
     path('admin/search-transactions/', views.search_transactions, name='search_transactions'),
+    path('admin/transactions/export/', views.export_transactions, name='export_transactions'),
+    path('transactions/feed/', views.transaction_feed, name='transaction_feed'),
     
     # Тестовые endpoints
     path('test-transaction/', views.test_transaction, name='test_transaction'),
@@ -0,0 +1,126 @@
+"""Версии счетов для условных GET (ETag / Last-Modified).
+
+``Account.version`` увеличивается каждым UPDATE баланса в проводках и
+каждым сохранением счета. ``Client.version`` - версия всего, что клиент
+видит в списке своих счетов: она растет при изменении любого его счета,
+открытии и закрытии счетов и правке профиля. Общая версия всех счетов
+для админских списков хранится в счетчике ``accounts_version``.
+
+View, обернутый в ``conditional``, сначала одним запросом по индексу
+читает версию ресурса; если она совпала с If-None-Match (или ресурс не
+менялся после If-Modified-Since), отвечает 304 без выполнения view.
+Версия читается до данных, поэтому ответ никогда не старше своего ETag.
+"""
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.db.models import F
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils import timezone
+from django.views.decorators.cache import cache_control
+from django.views.decorators.http import condition
+
+from . import stats
+from .models import Account, Client, StatCounter
+
+GLOBAL_COUNTER = 'accounts_version'
+
+
+def touch(account_ids):
+    """Новые версии владельцев счетов и общего списка (в транзакции изменения)"""
+    Client.objects.filter(
+        id__in=Account.objects.filter(id__in=account_ids).values('client_id')
+    ).update(version=F('version') + 1, modified_at=timezone.now())
+    stats.bump(GLOBAL_COUNTER)
+
+
+def _touch_client(client_id):
+    Client.objects.filter(id=client_id).update(version=F('version') + 1, modified_at=timezone.now())
+    stats.bump(GLOBAL_COUNTER)
+
+
+@receiver(post_save, sender=Account)
+def account_saved(sender, instance, **kwargs):
+    # Версию самого счета увеличил UPDATE в Account.save
+    _touch_client(instance.client_id)
+
+
+@receiver(post_delete, sender=Account)
+def account_deleted(sender, instance, **kwargs):
+    _touch_client(instance.client_id)
+
+
+@receiver(post_save, sender=Client)
+def client_saved(sender, instance, **kwargs):
+    # Версию клиента увеличил UPDATE в Client.save
+    stats.bump(GLOBAL_COUNTER)
+
+
+def _global_state():
+    counter, _ = StatCounter.objects.get_or_create(name=GLOBAL_COUNTER)
+    return f'g{counter.value}', counter.updated_at
+
+
+def user_accounts_state(request):
+    """Версия списка счетов пользователя (для администраторов - общая)"""
+    if request.user.is_staff or request.user.is_superuser:
+        return _global_state()
+    row = Client.objects.filter(user_id=request.user.id).values_list('id', 'version', 'modified_at').first()
+    if row is None:
+        return None
+    client_id, version, modified_at = row
+    return f'c{client_id}.{version}', modified_at
+
+
+def account_detail_state(request, account_id):
+    """Версия карточки счета: сам счет и профиль владельца"""
+    row = Account.objects.filter(id=account_id, is_active=True).values_list(
+        'version', 'modified_at', 'client__version', 'client__modified_at', 'client__user_id'
+    ).first()
+    if row is None:
+        return None
+    version, modified_at, client_version, client_modified_at, user_id = row
+    if user_id != request.user.id and not (request.user.is_staff or request.user.is_superuser):
+        return None
+    moments = [moment for moment in (modified_at, client_modified_at) if moment is not None]
+    return f'a{account_id}.{version}.{client_version}', max(moments) if moments else None
+
+
+def all_accounts_state(request):
+    """Версия списка всех счетов"""
+    return _global_state()
+
+
+def conditional(state):
+    """Декоратор view: ETag и Last-Modified из state(request, ...) -> (etag, момент) или None.
+
+    Ответы помечаются ``Cache-Control: private, no-cache``: браузер хранит
+    их, но каждый раз перепроверяет версию. Для async-представления
+    версия читается в потоке до вызова ``condition``.
+    """
+
+    def resolve(request, *args, **kwargs):
+        if not hasattr(request, '_resource_state'):
+            request._resource_state = (
+                state(request, *args, **kwargs) if request.user.is_authenticated else None
+            ) or (None, None)
+        return request._resource_state
+
+    def decorator(view):
+        conditional_view = condition(
+            etag_func=lambda request, *args, **kwargs: resolve(request, *args, **kwargs)[0],
+            last_modified_func=lambda request, *args, **kwargs: resolve(request, *args, **kwargs)[1],
+        )(view)
+        conditional_view = cache_control(private=True, no_cache=True)(conditional_view)
+        if iscoroutinefunction(view):
+            aresolve = sync_to_async(resolve)
+
+            async def inner(request, *args, **kwargs):
+                await aresolve(request, *args, **kwargs)
+                return await conditional_view(request, *args, **kwargs)
+
+            return wraps(view)(inner)
+        return wraps(view)(conditional_view)
+
+    return decorator
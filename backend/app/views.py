@@ -1,17 +1,23 @@
+from asgiref.sync import sync_to_async
 from rest_framework import status
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated, IsAdminUser
-from django.db import transaction as db_transaction
+from django.conf import settings
 from django.contrib.auth import authenticate, login, logout
 from django.contrib.auth.decorators import login_required, user_passes_test
-from django.http import HttpResponse, JsonResponse
+from django.core.handlers.asgi import ASGIRequest
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
 from django.shortcuts import render, redirect
 from django.views.decorators.csrf import csrf_exempt
-from .models import Account, Transaction, Client, ExchangeRate
+from .models import Account, ArchivedTransaction, Transaction, Client, ExchangeRate
+from . import async_api, feed, metrics, pagination, posting, principal, rates, rollups, search, serializers, stats, versions
+from .idempotency import idempotent
 from django.db import models
 from .forms import UserRegisterForm
+from datetime import date, datetime, timedelta
 from decimal import Decimal
+from django.utils import timezone
 import json
 import random
 
@@ -81,20 +87,16 @@ def admin_panel_view(request):
     
     # Получаем данные для админ-панели
     try:
-        accounts_count = Account.objects.count()
-        clients_count = Client.objects.count()
-        transactions_count = Transaction.objects.count()
-        active_accounts = Account.objects.filter(is_active=True).count()
-        
-        # Для начального отображения используем только базовую статистику
+        # Счетчики читаются из StatCounter, без COUNT(*) по таблицам
         # Транзакции будут загружаться через JavaScript
+        counters = stats.get_stats()
         
         context = {
-            'accounts_count': accounts_count,
-            'clients_count': clients_count,
-            'transactions_count': transactions_count,
-            'active_accounts': active_accounts,
-            'total_transactions_count': transactions_count,
+            'accounts_count': counters['accounts'],
+            'clients_count': counters['clients'],
+            'transactions_count': counters['transactions'],
+            'active_accounts': counters['active_accounts'],
+            'total_transactions_count': counters['transactions'],
         }
         
         return render(request, 'admin_panel.html', context)
@@ -214,93 +216,77 @@ def admin_panel_view(request):
         })
 
 # API endpoints
-@api_view(['GET'])
-@permission_classes([IsAuthenticated])
-def get_user_accounts(request):
+@async_api.read_view()
+@versions.conditional(versions.user_accounts_state)
+async def get_user_accounts(request):
     """Получить счета текущего пользователя"""
     try:
         # Для администраторов возвращаем все счета
         if request.user.is_staff or request.user.is_superuser:
             accounts = Account.objects.filter(is_active=True)[:10]  # Ограничим для производительности
-            accounts_data = []
-            for acc in accounts:
-                accounts_data.append({
-                    'id': acc.id,
-                    'account_number': acc.account_number,
-                    'client_name': acc.client.name,
-                    'balance': float(acc.balance),
-                    'currency': acc.currency,
-                    'created_at': acc.created_at.isoformat(),  # Добавляем дату создания
-                    'is_active': acc.is_active
-                })
-            return Response(accounts_data)
-        
-        # Для обычных пользователей
-        try:
-            client = request.user.client
-        except Client.DoesNotExist:
-            # Если у пользователя нет клиента, создаем его
-            client = Client.objects.create(
-                user=request.user,
-                name=request.user.username,
-                email=request.user.email
-            )
+            return async_api.json_response(await serializers.aaccount_rows(accounts))
         
-        accounts = Account.objects.filter(client=client, is_active=True)
-        accounts_data = []
-        for acc in accounts:
-            accounts_data.append({
-                'id': acc.id,
-                'account_number': acc.account_number,
-                'client_name': acc.client.name,
-                'balance': float(acc.balance),
-                'currency': acc.currency,
-                'created_at': acc.created_at.isoformat(),  # Добавляем дату создания
-                'is_active': acc.is_active
-            })
-        return Response(accounts_data)
+        # Для обычных пользователей (если у пользователя нет клиента, создаем его)
+        client_id = await async_api.ensure_client(request.user)
+        accounts_data = await serializers.aaccount_rows(Account.objects.filter(client_id=client_id, is_active=True))
+        return async_api.json_response(accounts_data)
         
     except Exception as e:
         print(f"Ошибка в get_user_accounts: {str(e)}")
-        return Response({'error': str(e)}, status=500)
+        return async_api.json_response({'error': str(e)}, status=500)
 
-@api_view(['GET'])
-@permission_classes([IsAuthenticated])
-def get_account_detail(request, account_id):
-    """Получить детальную информацию о счете"""
+# Сколько последних операций каждого счета отдает сводка дашборда
+DASHBOARD_TRANSACTIONS = 20
+MAX_DASHBOARD_TRANSACTIONS = 100
+
+@async_api.read_view()
+@versions.conditional(versions.user_accounts_state)
+async def dashboard_summary(request):
+    """Счета пользователя и последние операции каждого счета одним ответом"""
     try:
-        # Для администраторов разрешаем доступ ко всем счетам
+        per_account = min(
+            pagination.page_size(request.GET.get('transactions'), default=DASHBOARD_TRANSACTIONS),
+            MAX_DASHBOARD_TRANSACTIONS
+        )
+        
+        # Для администраторов - те же счета, что и в get_user_accounts
         if request.user.is_staff or request.user.is_superuser:
-            account = Account.objects.get(id=account_id, is_active=True)
+            accounts_data = await serializers.aaccount_rows(Account.objects.filter(is_active=True)[:10])
         else:
-            # Для обычных пользователей - только свои счета
-            try:
-                client = request.user.client
-            except Client.DoesNotExist:
-                return Response({'error': 'Профиль клиента не найден'}, status=status.HTTP_404_NOT_FOUND)
-            
-            account = Account.objects.get(id=account_id, client=client, is_active=True)
+            client_id = await async_api.ensure_client(request.user)
+            accounts_data = await serializers.aaccount_rows(
+                Account.objects.filter(client_id=client_id, is_active=True)
+            )
         
-        transactions = Transaction.objects.filter(account=account).order_by('-timestamp')[:20]
+        transactions = await serializers.alatest_account_transactions(
+            [account['id'] for account in accounts_data], per_account
+        )
+        for account in accounts_data:
+            account['transactions'] = transactions[account['id']]
         
-        transactions_data = []
-        for trans in transactions:
-            # Для каждой транзакции используем валюту счета, к которому она привязана
-            display_currency = trans.account.currency
-            
-            transactions_data.append({
-                'id': trans.id,
-                'amount': float(trans.amount),
-                'type': trans.type,
-                'type_display': trans.get_type_display(),
-                'description': trans.description,
-                'timestamp': trans.timestamp.isoformat(),
-                'from_account': trans.from_account.account_number if trans.from_account else None,
-                'to_account': trans.to_account.account_number if trans.to_account else None,
-                'currency': display_currency,  # Валюта счета транзакции
-                'from_currency': trans.from_account.currency if trans.from_account else None,
-                'to_currency': trans.to_account.currency if trans.to_account else None,
-            })
+        return async_api.json_response({
+            'accounts': accounts_data,
+            'transactions_per_account': per_account,
+        })
+    except Exception as e:
+        print(f"Ошибка в dashboard_summary: {str(e)}")
+        return async_api.json_response({'error': 'Внутренняя ошибка сервера'}, status=500)
+
+@async_api.read_view()
+@versions.conditional(versions.account_detail_state)
+async def get_account_detail(request, account_id):
+    """Получить детальную информацию о счете"""
+    try:
+        accounts = Account.objects.select_related('client').filter(id=account_id, is_active=True)
+        # Для обычных пользователей - только свои счета, администраторам - все
+        if not (request.user.is_staff or request.user.is_superuser):
+            client_id = await principal.aclient_id(request.user)
+            if client_id is None:
+                return async_api.json_response({'error': 'Профиль клиента не найден'}, status=404)
+            accounts = accounts.filter(client_id=client_id)
+        account = await accounts.aget()
+        
+        transactions_data = await serializers.aaccount_history(account.id, 20)
         
         account_data = {
             'id': account.id,
@@ -308,18 +294,18 @@ def get_account_detail(request, account_id):
             'client_name': account.client.name,
             'client_phone': account.client.phone,
             'client_email': account.client.email,
-            'balance': float(account.balance),
+            'balance': account.balance,
             'currency': account.currency,
-            'created_at': account.created_at.isoformat(),  # Добавляем дату создания
+            'created_at': account.created_at,  # Добавляем дату создания
             'is_active': account.is_active,
             'transactions': transactions_data
         }
-        return Response(account_data)
+        return async_api.json_response(account_data)
     except Account.DoesNotExist:
-        return Response({'error': 'Счет не найден или у вас нет доступа'}, status=status.HTTP_404_NOT_FOUND)
+        return async_api.json_response({'error': 'Счет не найден или у вас нет доступа'}, status=404)
     except Exception as e:
         print(f"Ошибка в get_account_detail: {str(e)}")
-        return Response({'error': 'Внутренняя ошибка сервера'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+        return async_api.json_response({'error': 'Внутренняя ошибка сервера'}, status=500)
 
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
@@ -329,27 +315,26 @@ def create_account(request):
         data = request.data
         currency = data.get('currency', 'RUB')
         
-        # Проверяем доступные валюты
-        available_currencies = ['RUB', 'USD', 'EUR']
+        # Проверяем доступные валюты: те, для которых есть курсы
+        available_currencies = [code for code, _ in rates.currency_choices()]
         if currency not in available_currencies:
             return Response({
                 'error': f'Недопустимая валюта. Доступные валюты: {", ".join(available_currencies)}'
             }, status=status.HTTP_400_BAD_REQUEST)
         
         # Получаем клиента
-        try:
-            client = request.user.client
-        except Client.DoesNotExist:
+        client_id = principal.client_id(request.user)
+        if client_id is None:
             # Если у пользователя нет клиента, создаем его
-            client = Client.objects.create(
+            client_id = Client.objects.create(
                 user=request.user,
                 name=request.user.username,
                 email=request.user.email
-            )
+            ).id
         
         # Создаем счет
         account = Account.objects.create(
-            client=client,
+            client_id=client_id,
             balance=Decimal('0.00'),
             currency=currency
         )
@@ -361,8 +346,8 @@ def create_account(request):
                 'id': account.id,
                 'account_number': account.account_number,
                 'currency': account.currency,
-                'balance': float(account.balance),
-                'created_at': account.created_at.isoformat(),  # Добавляем дату создания
+                'balance': account.balance,
+                'created_at': account.created_at,  # Добавляем дату создания
                 'is_active': account.is_active
             }
         })
@@ -372,6 +357,7 @@ def create_account(request):
 
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
+@idempotent
 def deposit(request):
     """Пополнение счета"""
     try:
@@ -383,42 +369,23 @@ def deposit(request):
         if amount <= 0:
             return Response({'error': 'Сумма должна быть положительной'}, status=status.HTTP_400_BAD_REQUEST)
         
-        with db_transaction.atomic():
-            # Для администраторов разрешаем операции со всеми счетами
-            if request.user.is_staff or request.user.is_superuser:
-                account = Account.objects.select_for_update().get(
-                    id=account_id,
-                    is_active=True
-                )
-            else:
-                # Для обычных пользователей - только свои счета
-                try:
-                    client = request.user.client
-                except Client.DoesNotExist:
-                    return Response({'error': 'Профиль клиента не найден'}, status=status.HTTP_404_NOT_FOUND)
-                
-                account = Account.objects.select_for_update().get(
-                    id=account_id, 
-                    client=client,
-                    is_active=True
-                )
-            
-            account.balance += amount
-            account.save()
-            
-            transaction = Transaction.objects.create(
-                account=account,
-                amount=amount,
-                type='deposit',
-                description=description
-            )
-            
-            return Response({
-                'success': True,
-                'message': 'Счет успешно пополнен',
-                'new_balance': float(account.balance),
-                'transaction_id': transaction.id
-            })
+        # Для администраторов разрешаем операции со всеми счетами
+        if request.user.is_staff or request.user.is_superuser:
+            client_id = None
+        else:
+            # Для обычных пользователей - только свои счета
+            client_id = principal.client_id(request.user)
+            if client_id is None:
+                return Response({'error': 'Профиль клиента не найден'}, status=status.HTTP_404_NOT_FOUND)
+        
+        transaction, new_balance = posting.deposit(account_id, amount, description, client_id=client_id)
+        
+        return Response({
+            'success': True,
+            'message': 'Счет успешно пополнен',
+            'new_balance': new_balance,
+            'transaction_id': transaction.id
+        })
             
     except Account.DoesNotExist:
         return Response({'error': 'Счет не найден или у вас нет доступа'}, status=status.HTTP_404_NOT_FOUND)
@@ -428,6 +395,7 @@ def deposit(request):
 
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
+@idempotent
 def withdraw(request):
     """Снятие со счета"""
     try:
@@ -439,54 +407,35 @@ def withdraw(request):
         if amount <= 0:
             return Response({'error': 'Сумма должна быть положительной'}, status=status.HTTP_400_BAD_REQUEST)
         
-        with db_transaction.atomic():
-            # Для администраторов разрешаем операции со всеми счетами
-            if request.user.is_staff or request.user.is_superuser:
-                account = Account.objects.select_for_update().get(
-                    id=account_id,
-                    is_active=True
-                )
-            else:
-                # Для обычных пользователей - только свои счета
-                try:
-                    client = request.user.client
-                except Client.DoesNotExist:
-                    return Response({'error': 'Профиль клиента не найден'}, status=status.HTTP_404_NOT_FOUND)
-                
-                account = Account.objects.select_for_update().get(
-                    id=account_id, 
-                    client=client,
-                    is_active=True
-                )
-            
-            if account.balance < amount:
-                return Response({'error': 'Недостаточно средств на счете'}, status=status.HTTP_400_BAD_REQUEST)
-            
-            account.balance -= amount
-            account.save()
-            
-            transaction = Transaction.objects.create(
-                account=account,
-                amount=amount,
-                type='withdraw',
-                description=description
-            )
-            
-            return Response({
-                'success': True,
-                'message': 'Средства успешно сняты',
-                'new_balance': float(account.balance),
-                'transaction_id': transaction.id
-            })
+        # Для администраторов разрешаем операции со всеми счетами
+        if request.user.is_staff or request.user.is_superuser:
+            client_id = None
+        else:
+            # Для обычных пользователей - только свои счета
+            client_id = principal.client_id(request.user)
+            if client_id is None:
+                return Response({'error': 'Профиль клиента не найден'}, status=status.HTTP_404_NOT_FOUND)
+        
+        transaction, new_balance = posting.withdraw(account_id, amount, description, client_id=client_id)
+        
+        return Response({
+            'success': True,
+            'message': 'Средства успешно сняты',
+            'new_balance': new_balance,
+            'transaction_id': transaction.id
+        })
             
     except Account.DoesNotExist:
         return Response({'error': 'Счет не найден или у вас нет доступа'}, status=status.HTTP_404_NOT_FOUND)
+    except posting.InsufficientFunds:
+        return Response({'error': 'Недостаточно средств на счете'}, status=status.HTTP_400_BAD_REQUEST)
     except Exception as e:
         print(f"Ошибка в withdraw: {str(e)}")
         return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
+@idempotent
 def transfer(request):
     """Перевод между счетами с конвертацией валют"""
     try:
@@ -499,359 +448,323 @@ def transfer(request):
         if amount <= 0:
             return Response({'error': 'Сумма должна быть положительной'}, status=status.HTTP_400_BAD_REQUEST)
         
-        with db_transaction.atomic():
-            # Проверяем что счет отправителя доступен пользователю
-            if request.user.is_staff or request.user.is_superuser:
-                from_account = Account.objects.select_for_update().get(
-                    id=from_account_id,
-                    is_active=True
-                )
-            else:
-                try:
-                    client = request.user.client
-                except Client.DoesNotExist:
-                    return Response({'error': 'Профиль клиента не найден'}, status=status.HTTP_404_NOT_FOUND)
-                
-                from_account = Account.objects.select_for_update().get(
-                    id=from_account_id, 
-                    client=client,
-                    is_active=True
-                )
-            
-            # Ищем счет получателя по номеру
-            try:
-                to_account = Account.objects.select_for_update().get(
-                    account_number=to_account_number,
-                    is_active=True
-                )
-            except Account.DoesNotExist:
-                return Response({'error': 'Счет получателя не найден'}, status=status.HTTP_404_NOT_FOUND)
-            
-            if from_account.balance < amount:
-                return Response({'error': 'Недостаточно средств для перевода'}, status=status.HTTP_400_BAD_REQUEST)
-            
-            # Получаем курс обмена
-            exchange_rate = get_exchange_rate(from_account.currency, to_account.currency)
-            converted_amount = amount * exchange_rate
-            
-            # Снимаем с отправителя
-            from_account.balance -= amount
-            from_account.save()
-            
-            # Зачисляем получателю с конвертацией
-            to_account.balance += converted_amount
-            to_account.save()
-            
-            # Создаем транзакцию для отправителя (в его валюте)
-            transaction_from = Transaction.objects.create(
-                account=from_account,
-                amount=amount,  # Сумма в валюте отправителя
-                type='transfer',
-                description=f"{description} → {to_account.account_number} (курс: {exchange_rate:.4f})",
-                from_account=from_account,
-                to_account=to_account
-            )
-            
-            # Создаем транзакцию для получателя (в его валюте)
-            transaction_to = Transaction.objects.create(
-                account=to_account,
-                amount=converted_amount,  # Сумма в валюте получателя
-                type='transfer',
-                description=f"{description} ← {from_account.account_number} (курс: {exchange_rate:.4f})",
-                from_account=from_account,
-                to_account=to_account
-            )
-            
-            return Response({
-                'success': True,
-                'message': f'Перевод выполнен успешно. Курс: {exchange_rate:.4f}',
-                'from_account_balance': float(from_account.balance),
-                'to_account_balance': float(to_account.balance),
-                'exchange_rate': float(exchange_rate),
-                'converted_amount': float(converted_amount),
-                'transaction_id': transaction_from.id
-            })
+        # Проверяем что счет отправителя доступен пользователю
+        if request.user.is_staff or request.user.is_superuser:
+            client_id = None
+        else:
+            client_id = principal.client_id(request.user)
+            if client_id is None:
+                return Response({'error': 'Профиль клиента не найден'}, status=status.HTTP_404_NOT_FOUND)
+        
+        result = posting.transfer(from_account_id, to_account_number, amount, description, client_id=client_id)
+        exchange_rate = result['exchange_rate']
+        
+        return Response({
+            'success': True,
+            'message': f'Перевод выполнен успешно. Курс: {exchange_rate:.4f}',
+            'from_account_balance': result['from_account_balance'],
+            'to_account_balance': result['to_account_balance'],
+            'exchange_rate': exchange_rate,
+            'converted_amount': result['converted_amount'],
+            'transaction_id': result['transaction_from'].id
+        })
             
     except Account.DoesNotExist:
         return Response({'error': 'Счет не найден или у вас нет доступа'}, status=status.HTTP_404_NOT_FOUND)
+    except posting.RecipientNotFound:
+        return Response({'error': 'Счет получателя не найден'}, status=status.HTTP_404_NOT_FOUND)
+    except posting.InsufficientFunds:
+        return Response({'error': 'Недостаточно средств для перевода'}, status=status.HTTP_400_BAD_REQUEST)
+    except posting.ConcurrentUpdate:
+        return Response(
+            {'error': 'Счет изменяется другими операциями, повторите перевод'}, status=status.HTTP_409_CONFLICT
+        )
+    except rates.RateUnavailable as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
     except Exception as e:
         print(f"Ошибка в transfer: {str(e)}")
         return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
-def get_exchange_rate(from_currency, to_currency):
-    """Получить курс обмена между валютами"""
-    if from_currency == to_currency:
-        return Decimal('1.0')
-    
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+@idempotent
+def transfer_batch(request):
+    """Пакетный перевод: массив переводов в одном запросе"""
     try:
-        # Прямой курс
-        rate = ExchangeRate.objects.get(
-            from_currency=from_currency, 
-            to_currency=to_currency
-        )
-        return rate.rate
-    except ExchangeRate.DoesNotExist:
-        try:
-            # Обратный курс
-            reverse_rate = ExchangeRate.objects.get(
-                from_currency=to_currency, 
-                to_currency=from_currency
-            )
-            return Decimal('1.0') / reverse_rate.rate
-        except ExchangeRate.DoesNotExist:
-            # Курс по умолчанию (можно заменить на API)
-            default_rates = {
-                ('RUB', 'USD'): Decimal('0.011'),
-                ('RUB', 'EUR'): Decimal('0.009'),
-                ('USD', 'RUB'): Decimal('90.0'),
-                ('USD', 'EUR'): Decimal('0.85'),
-                ('EUR', 'RUB'): Decimal('110.0'),
-                ('EUR', 'USD'): Decimal('1.18'),
+        data = request.data
+        items = data.get('transfers') if isinstance(data, dict) else data
+        if not isinstance(items, list) or not items:
+            return Response({'error': 'Передайте непустой массив переводов'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        if request.user.is_staff or request.user.is_superuser:
+            client_id = None
+        else:
+            client_id = principal.client_id(request.user)
+            if client_id is None:
+                return Response({'error': 'Профиль клиента не найден'}, status=status.HTTP_404_NOT_FOUND)
+        
+        # Разбираем переводы; некорректные сразу получают ошибку и не проводятся
+        results = [None] * len(items)
+        transfers = []
+        positions = []
+        for index, item in enumerate(items):
+            try:
+                amount = Decimal(str(item.get('amount')))
+                transfer_item = {
+                    'from_account_id': int(item.get('from_account_id')),
+                    'to_account_number': str(item.get('to_account_number')),
+                    'amount': amount,
+                    'description': item.get('description', 'Перевод средств'),
+                }
+            except Exception:
+                results[index] = {'index': index, 'success': False, 'error': 'Некорректные данные перевода'}
+                continue
+            if not amount.is_finite() or amount <= 0:
+                results[index] = {'index': index, 'success': False, 'error': 'Сумма должна быть положительной'}
+                continue
+            transfers.append(transfer_item)
+            positions.append(index)
+        
+        errors = {
+            Account.DoesNotExist: 'Счет не найден или у вас нет доступа',
+            posting.RecipientNotFound: 'Счет получателя не найден',
+            posting.InsufficientFunds: 'Недостаточно средств для перевода',
+        }
+        for index, outcome in zip(positions, posting.transfer_batch(transfers, client_id=client_id)):
+            if isinstance(outcome, Exception):
+                error = str(outcome) if isinstance(outcome, rates.RateUnavailable) else errors[type(outcome)]
+                results[index] = {'index': index, 'success': False, 'error': error}
+            else:
+                results[index] = {
+                    'index': index,
+                    'success': True,
+                    'transaction_id': outcome['transaction_from'].id,
+                    'exchange_rate': outcome['exchange_rate'],
+                    'converted_amount': outcome['converted_amount'],
+                    'from_account_balance': outcome['from_account_balance'],
+                    'to_account_balance': outcome['to_account_balance'],
+                }
+        
+        succeeded = sum(1 for result in results if result['success'])
+        return Response({
+            'results': results,
+            'summary': {
+                'total': len(results),
+                'succeeded': succeeded,
+                'failed': len(results) - succeeded,
             }
-            return default_rates.get((from_currency, to_currency), Decimal('1.0'))
+        })
+    
+    except posting.PostingError as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    except Exception as e:
+        print(f"Ошибка в transfer_batch: {str(e)}")
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
-@api_view(['GET'])
-@permission_classes([IsAdminUser])
-def get_all_transactions(request):
+@async_api.read_view(admin=True)
+async def get_all_transactions(request):
     """Получить все транзакции (только для администраторов)"""
     try:
-        transactions = Transaction.objects.select_related('account__client', 'from_account', 'to_account').order_by('-timestamp')[:100]
-        
-        transactions_data = []
-        for trans in transactions:
-            # Определяем правильную валюту для отображения
-            display_currency = trans.account.currency
-            
-            # Для переводов определяем правильную валюту
-            if trans.type == 'transfer':
-                if trans.from_account and trans.from_account.id == trans.account.id:
-                    # Исходящий перевод - показываем в валюте отправителя
-                    display_currency = trans.from_account.currency
-                elif trans.to_account and trans.to_account.id == trans.account.id:
-                    # Входящий перевод - показываем в валюте получателя
-                    display_currency = trans.to_account.currency
-            
-            transactions_data.append({
-                'id': trans.id,
-                'account_number': trans.account.account_number,
-                'client_name': trans.account.client.name,
-                'amount': float(trans.amount),
-                'type': trans.get_type_display(),
-                'description': trans.description,
-                'timestamp': trans.timestamp.isoformat(),
-                'from_account': trans.from_account.account_number if trans.from_account else None,
-                'to_account': trans.to_account.account_number if trans.to_account else None,
-                'currency': display_currency,  # Правильная валюта для отображения
-                'from_currency': trans.from_account.currency if trans.from_account else None,
-                'to_currency': trans.to_account.currency if trans.to_account else None,
-            })
-        
-        return Response(transactions_data)
+        transactions_data, _ = await pagination.apaginate(
+            Transaction.objects.all(), None, 100, serializers.atransaction_rows, ArchivedTransaction.objects.all()
+        )
+        return async_api.json_response(transactions_data)
     except Exception as e:
-        return Response({'error': str(e)}, status=500)
-    """Получить все транзакции (только для администраторов)"""
+        return async_api.json_response({'error': str(e)}, status=500)
+    
+@async_api.read_view(admin=True)
+async def get_recent_transactions(request):
+    """Лента последних транзакций для админ-панели постранично (курсор next_cursor)"""
     try:
-        transactions = Transaction.objects.select_related('account__client', 'from_account', 'to_account').order_by('-timestamp')[:100]
+        limit = pagination.page_size(request.GET.get('limit'))
         
-        transactions_data = []
-        for trans in transactions:
-            # Определяем правильную валюту для отображения
-            display_currency = trans.account.currency
-            
-            # Для переводов определяем правильную валюту
-            if trans.type == 'transfer':
-                if trans.from_account and trans.from_account.id == trans.account.id:
-                    # Исходящий перевод - показываем в валюте отправителя
-                    display_currency = trans.from_account.currency
-                elif trans.to_account and trans.to_account.id == trans.account.id:
-                    # Входящий перевод - показываем в валюте получателя
-                    display_currency = trans.to_account.currency
-            
-            transactions_data.append({
-                'id': trans.id,
-                'account_number': trans.account.account_number,
-                'client_name': trans.account.client.name,
-                'amount': float(trans.amount),
-                'type': trans.get_type_display(),
-                'description': trans.description,
-                'timestamp': trans.timestamp.isoformat(),
-                'from_account': trans.from_account.account_number if trans.from_account else None,
-                'to_account': trans.to_account.account_number if trans.to_account else None,
-                'currency': display_currency,  # Правильная валюта для отображения
-            })
+        transactions_data, next_cursor = await pagination.apaginate(
+            Transaction.objects.all(), request.GET.get('cursor'), limit, serializers.atransaction_rows,
+            ArchivedTransaction.objects.all()
+        )
         
-        return Response(transactions_data)
+        return async_api.json_response({
+            'transactions': transactions_data,
+            'total_count': len(transactions_data),
+            'limit': limit,
+            'next_cursor': next_cursor,
+            'has_more': next_cursor is not None
+        })
+    except pagination.InvalidCursor:
+        return async_api.json_response({'error': 'Некорректный курсор'}, status=400)
     except Exception as e:
-        return Response({'error': str(e)}, status=500)
-    """Получить все транзакции (только для администраторов)"""
+        return async_api.json_response({'error': str(e)}, status=500)
+
+@async_api.read_view(admin=True)
+@versions.conditional(versions.all_accounts_state)
+async def get_all_accounts(request):
+    """Получить все счета (только для администраторов)"""
     try:
-        transactions = Transaction.objects.select_related('account__client', 'from_account', 'to_account').order_by('-timestamp')[:100]
-        
-        transactions_data = []
-        for trans in transactions:
-            transactions_data.append({
-                'id': trans.id,
-                'account_number': trans.account.account_number,
-                'client_name': trans.account.client.name,
-                'amount': float(trans.amount),
-                'type': trans.get_type_display(),
-                'description': trans.description,
-                'timestamp': trans.timestamp.isoformat(),
-                'from_account': trans.from_account.account_number if trans.from_account else None,
-                'to_account': trans.to_account.account_number if trans.to_account else None,
-                'currency': trans.account.currency,  # Добавляем валюту счета
-            })
-        
-        return Response(transactions_data)
+        accounts_data = [
+            {
+                'id': pk,
+                'account_number': account_number,
+                'client_name': client_name,
+                'client_email': client_email,
+                'balance': balance,
+                'currency': currency,
+                'created_at': created_at,  # Добавляем дату создания
+                'is_active': is_active
+            }
+            async for pk, account_number, client_name, client_email, balance, currency, created_at, is_active
+            in Account.objects.filter(is_active=True).values_list(
+                'id', 'account_number', 'client__name', 'client__email', 'balance', 'currency', 'created_at', 'is_active'
+            )
+        ]
+        return async_api.json_response(accounts_data)
     except Exception as e:
-        return Response({'error': str(e)}, status=500)
-    
+        return async_api.json_response({'error': str(e)}, status=500)
+
 @api_view(['GET'])
 @permission_classes([IsAdminUser])
-def get_recent_transactions(request):
-    """Получить последние транзакции для админ-панели с ограничением количества"""
+def get_admin_stats(request):
+    """Статистика админ-панели из счетчиков (только для администраторов)"""
     try:
-        # Получаем параметр limit из запроса (по умолчанию 10)
-        limit = request.GET.get('limit', 10)
-        try:
-            limit = int(limit)
-            # Ограничиваем максимальное количество
-            if limit > 4000:
-                limit = 4000
-            elif limit < 1:
-                limit = 10
-        except (ValueError, TypeError):
-            limit = 10
-        
-        transactions = Transaction.objects.select_related(
-            'account__client', 
-            'from_account', 
-            'to_account'
-        ).order_by('-timestamp')[:limit]
-        
-        transactions_data = []
-        for trans in transactions:
-            # Определяем правильную валюту для отображения
-            display_currency = trans.account.currency
-            
-            # Для переводов определяем правильную валюту
-            if trans.type == 'transfer':
-                if trans.from_account and trans.from_account.id == trans.account.id:
-                    # Исходящий перевод - показываем в валюте отправителя
-                    display_currency = trans.from_account.currency
-                elif trans.to_account and trans.to_account.id == trans.account.id:
-                    # Входящий перевод - показываем в валюте получателя
-                    display_currency = trans.to_account.currency
-            
-            transactions_data.append({
-                'id': trans.id,
-                'account_number': trans.account.account_number,
-                'client_name': trans.account.client.name,
-                'amount': float(trans.amount),
-                'type': trans.get_type_display(),
-                'description': trans.description,
-                'timestamp': trans.timestamp.isoformat(),
-                'from_account': trans.from_account.account_number if trans.from_account else None,
-                'to_account': trans.to_account.account_number if trans.to_account else None,
-                'currency': display_currency,
-                'from_currency': trans.from_account.currency if trans.from_account else None,
-                'to_currency': trans.to_account.currency if trans.to_account else None,
-            })
-        
+        counters = stats.get_stats()
         return Response({
-            'transactions': transactions_data,
-            'total_count': len(transactions_data),
-            'limit': limit
+            'accounts_count': counters['accounts'],
+            'clients_count': counters['clients'],
+            'transactions_count': counters['transactions'],
+            'active_accounts': counters['active_accounts'],
         })
     except Exception as e:
-        return Response({'error': str(e)}, status=500)
-    """Получить последние транзакции для админ-панели"""
+        print(f"Ошибка в get_admin_stats: {str(e)}")
+        return Response({'error': 'Внутренняя ошибка сервера'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def get_posting_metrics(request):
+    """Метрики переводов этого процесса по режимам проводок (только для администраторов)"""
     try:
-        transactions = Transaction.objects.select_related(
-            'account__client', 
-            'from_account', 
-            'to_account'
-        ).order_by('-timestamp')[:10]  # Последние 10 транзакций
-        
-        transactions_data = []
-        for trans in transactions:
-            # Определяем правильную валюту для отображения
-            display_currency = trans.account.currency
-            
-            # Для переводов определяем правильную валюту
-            if trans.type == 'transfer':
-                if trans.from_account and trans.from_account.id == trans.account.id:
-                    # Исходящий перевод - показываем в валюте отправителя
-                    display_currency = trans.from_account.currency
-                elif trans.to_account and trans.to_account.id == trans.account.id:
-                    # Входящий перевод - показываем в валюте получателя
-                    display_currency = trans.to_account.currency
-            
-            transactions_data.append({
-                'id': trans.id,
-                'account_number': trans.account.account_number,
-                'client_name': trans.account.client.name,
-                'amount': float(trans.amount),
-                'type': trans.get_type_display(),
-                'description': trans.description,
-                'timestamp': trans.timestamp.isoformat(),
-                'from_account': trans.from_account.account_number if trans.from_account else None,
-                'to_account': trans.to_account.account_number if trans.to_account else None,
-                'currency': display_currency,
-                'from_currency': trans.from_account.currency if trans.from_account else None,
-                'to_currency': trans.to_account.currency if trans.to_account else None,
-            })
-        
-        return Response(transactions_data)
+        return Response({
+            'mode': getattr(settings, 'POSTING_MODE', posting.DEFAULT_MODE),
+            'modes': metrics.summary(),
+        })
     except Exception as e:
-        return Response({'error': str(e)}, status=500)
+        print(f"Ошибка в get_posting_metrics: {str(e)}")
+        return Response({'error': 'Внутренняя ошибка сервера'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 @api_view(['GET'])
 @permission_classes([IsAdminUser])
-def get_all_accounts(request):
-    """Получить все счета (только для администраторов)"""
+def get_daily_turnover(request):
+    """Обороты по дням из дневных сводов (только для администраторов)"""
     try:
-        accounts = Account.objects.select_related('client').filter(is_active=True)
-        accounts_data = []
-        for acc in accounts:
-            accounts_data.append({
-                'id': acc.id,
-                'account_number': acc.account_number,
-                'client_name': acc.client.name,
-                'client_email': acc.client.email,
-                'balance': float(acc.balance),
-                'currency': acc.currency,
-                'created_at': acc.created_at.isoformat(),  # Добавляем дату создания
-                'is_active': acc.is_active
-            })
-        return Response(accounts_data)
+        end = date.fromisoformat(request.GET['to']) if request.GET.get('to') else timezone.localdate()
+        start = date.fromisoformat(request.GET['from']) if request.GET.get('from') else end - timedelta(days=29)
+    except ValueError:
+        return Response({'error': 'Некорректная дата'}, status=status.HTTP_400_BAD_REQUEST)
+    if start > end or (end - start).days >= rollups.MAX_DAYS:
+        return Response(
+            {'error': f'Период - от 1 до {rollups.MAX_DAYS} дней'}, status=status.HTTP_400_BAD_REQUEST
+        )
+    
+    try:
+        currency = request.GET.get('currency')
+        return Response({
+            'from': start.isoformat(),
+            'to': end.isoformat(),
+            'series': rollups.daily_series(start, end + timedelta(days=1), currency),
+        })
     except Exception as e:
-        return Response({'error': str(e)}, status=500)
+        print(f"Ошибка в get_daily_turnover: {str(e)}")
+        return Response({'error': 'Внутренняя ошибка сервера'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 @api_view(['GET'])
-@permission_classes([IsAuthenticated])
-def search_accounts(request):
+@permission_classes([IsAdminUser])
+def get_hourly_turnover(request):
+    """Обороты по часам из почасовых сводов (только для администраторов)"""
+    try:
+        end = _parse_moment(request.GET.get('to')) or timezone.now()
+        start = _parse_moment(request.GET.get('from')) or end - timedelta(hours=24)
+    except ValueError:
+        return Response({'error': 'Некорректная дата'}, status=status.HTTP_400_BAD_REQUEST)
+    if start >= end or end - start > timedelta(hours=rollups.MAX_HOURS):
+        return Response(
+            {'error': f'Период - не длиннее {rollups.MAX_HOURS} часов'}, status=status.HTTP_400_BAD_REQUEST
+        )
+    
+    try:
+        currency = request.GET.get('currency')
+        return Response({
+            'from': start.isoformat(),
+            'to': end.isoformat(),
+            'series': rollups.hourly_series(start, end, currency),
+        })
+    except Exception as e:
+        print(f"Ошибка в get_hourly_turnover: {str(e)}")
+        return Response({'error': 'Внутренняя ошибка сервера'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+def _parse_moment(value):
+    """Момент времени из параметра запроса (без пояса - в поясе проекта)"""
+    if not value:
+        return None
+    moment = datetime.fromisoformat(value)
+    if timezone.is_naive(moment):
+        moment = timezone.make_aware(moment)
+    return moment
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def get_exchange_rates(request):
+    """Таблица кросс-курсов и пары, для которых курс не найден (только для администраторов).
+
+    С параметром at - таблица, действовавшая в этот момент, по истории курсов.
+    """
+    try:
+        moment = _parse_moment(request.GET.get('at'))
+    except ValueError:
+        return Response({'error': 'Некорректная дата'}, status=status.HTTP_400_BAD_REQUEST)
+    
+    try:
+        matrix = rates.get_matrix() if moment is None else rates.get_history().matrix_at(moment)
+        return Response({
+            'currencies': matrix.currencies,
+            'rates': {
+                from_currency: {
+                    to_currency: rate
+                    for to_currency, rate in zip(matrix.currencies, row)
+                }
+                for from_currency, row in zip(matrix.currencies, matrix.rates)
+            },
+            'unresolved': [list(pair) for pair in matrix.unresolved],
+        })
+    except Exception as e:
+        return Response({'error': str(e)}, status=500)
+
+@async_api.read_view()
+async def search_accounts(request):
     """Поиск счетов по номеру (для переводов)"""
     try:
         query = request.GET.get('q', '')
         if len(query) < 4:
-            return Response({'error': 'Введите минимум 4 символа для поиска'}, status=400)
-        
-        accounts = Account.objects.filter(
-            account_number__icontains=query,
-            is_active=True
-        ).exclude(client=request.user.client)[:10]
+            return async_api.json_response({'error': 'Введите минимум 4 символа для поиска'}, status=400)
+        
+        client_id = await principal.aclient_id(request.user)
+        if client_id is None:
+            raise Client.DoesNotExist('User has no client.')
+        # Имя владельца берется тем же запросом; у индекса нет async-интерфейса - запрос в потоке
+        matched = await sync_to_async(search.match_accounts)(query, client_id, 10)
+        if matched is None:
+            matched = [
+                row async for row in Account.objects.filter(
+                    account_number__icontains=query,
+                    is_active=True
+                ).exclude(client_id=client_id).values_list('account_number', 'client__name')[:10]
+            ]
         
-        accounts_data = []
-        for acc in accounts:
-            accounts_data.append({
-                'account_number': acc.account_number,
-                'client_name': acc.client.name,
-            })
+        accounts_data = [
+            {'account_number': account_number, 'client_name': client_name}
+            for account_number, client_name in matched
+        ]
         
-        return Response(accounts_data)
+        return async_api.json_response(accounts_data)
     except Exception as e:
-        return Response({'error': str(e)}, status=500)
+        return async_api.json_response({'error': str(e)}, status=500)
 
 @api_view(['GET'])
 @permission_classes([IsAdminUser])
@@ -882,155 +795,107 @@ def api_test(request):
         }
     })
 
-@api_view(['GET'])
-@permission_classes([IsAdminUser])
-def search_transactions(request):
-    """Поиск транзакций с фильтрами (только для администраторов)"""
-    try:
-        # Получаем параметры фильтрации
-        search_query = request.GET.get('q', '')
-        transaction_type = request.GET.get('type', '')
-        limit = request.GET.get('limit', 50)
-        
-        # Преобразуем limit в int с обработкой ошибок
-        try:
-            limit = int(limit)
-            if limit > 4000:  # Максимальный лимит
-                limit = 4000
-        except (ValueError, TypeError):
-            limit = 4000
-        
-        # Базовый запрос
-        transactions_query = Transaction.objects.select_related(
-            'account__client', 'from_account', 'to_account'
-        )
-        
-        # Применяем фильтры
-        if search_query:
-            transactions_query = transactions_query.filter(
+def filter_transactions(search_query, transaction_type, model=Transaction):
+    """Транзакции по строке поиска и типу (общие фильтры поиска и выгрузки).
+
+    ``model`` - ``ArchivedTransaction`` для тех же фильтров по архиву.
+    """
+    transactions_query = model.objects.all()
+    
+    if search_query:
+        matched = search.match(transactions_query, search_query)
+        if matched is None:
+            matched = transactions_query.filter(
                 models.Q(account__client__name__icontains=search_query) |
                 models.Q(account__account_number__icontains=search_query) |
                 models.Q(description__icontains=search_query)
             )
-        
-        if transaction_type and transaction_type != 'all':
-            type_mapping = {
-                'deposit': 'deposit',
-                'withdraw': 'withdraw', 
-                'transfer': 'transfer'
-            }
-            if transaction_type in type_mapping:
-                transactions_query = transactions_query.filter(type=type_mapping[transaction_type])
-        
-        # Сортируем и ограничиваем
-        transactions = transactions_query.order_by('-timestamp')[:limit]
-        
-        # Формируем ответ
-        transactions_data = []
-        for trans in transactions:
-            # Определяем правильную валюту для отображения
-            display_currency = trans.account.currency
-            
-            # Для переводов определяем правильную валюту
-            if trans.type == 'transfer':
-                if trans.from_account and trans.from_account.id == trans.account.id:
-                    # Исходящий перевод - показываем в валюте отправителя
-                    display_currency = trans.from_account.currency
-                elif trans.to_account and trans.to_account.id == trans.account.id:
-                    # Входящий перевод - показываем в валюте получателя
-                    display_currency = trans.to_account.currency
-            
-            transactions_data.append({
-                'id': trans.id,
-                'account_number': trans.account.account_number,
-                'client_name': trans.account.client.name,
-                'amount': float(trans.amount),
-                'type': trans.get_type_display(),
-                'description': trans.description,
-                'timestamp': trans.timestamp.isoformat(),
-                'from_account': trans.from_account.account_number if trans.from_account else None,
-                'to_account': trans.to_account.account_number if trans.to_account else None,
-                'currency': display_currency,
-                'from_currency': trans.from_account.currency if trans.from_account else None,
-                'to_currency': trans.to_account.currency if trans.to_account else None,
-            })
-        
-        return Response({
-            'transactions': transactions_data,
-            'total_count': len(transactions_data),
-            'search_query': search_query,
-            'limit': limit
-        })
-        
-    except Exception as e:
-        print(f"Ошибка в search_transactions: {str(e)}")  # Для отладки
-        return Response({'error': f'Внутренняя ошибка сервера: {str(e)}'}, status=500)
-    """Поиск транзакций с фильтрами (только для администраторов)"""
+        transactions_query = matched
+    
+    if transaction_type and transaction_type != 'all':
+        type_mapping = {
+            'deposit': 'deposit',
+            'withdraw': 'withdraw', 
+            'transfer': 'transfer'
+        }
+        if transaction_type in type_mapping:
+            transactions_query = transactions_query.filter(type=type_mapping[transaction_type])
+    
+    return transactions_query
+
+@async_api.read_view(admin=True)
+async def search_transactions(request):
+    """Поиск транзакций с фильтрами постранично (только для администраторов)"""
     try:
         # Получаем параметры фильтрации
         search_query = request.GET.get('q', '')
         transaction_type = request.GET.get('type', '')
-        limit = int(request.GET.get('limit', 50))
-        
-        # Базовый запрос
-        transactions_query = Transaction.objects.select_related(
-            'account__client', 'from_account', 'to_account'
-        )
-        
-        # Применяем фильтры
-        if search_query:
-            transactions_query = transactions_query.filter(
-                models.Q(account__client__name__icontains=search_query) |
-                models.Q(account__account_number__icontains=search_query) |
-                models.Q(description__icontains=search_query)
-            )
+        limit = pagination.page_size(request.GET.get('limit'), default=50)
         
-        if transaction_type and transaction_type != 'all':
-            type_mapping = {
-                'deposit': 'deposit',
-                'withdraw': 'withdraw', 
-                'transfer': 'transfer'
-            }
-            if transaction_type in type_mapping:
-                transactions_query = transactions_query.filter(type=type_mapping[transaction_type])
+        # Проверка полнотекстового индекса может обратиться к базе - в потоке
+        transactions_query = await sync_to_async(filter_transactions)(search_query, transaction_type)
+        archived_query = await sync_to_async(filter_transactions)(search_query, transaction_type, ArchivedTransaction)
         
-        # Сортируем и ограничиваем
-        transactions = transactions_query.order_by('-timestamp')[:limit]
-        
-        # Формируем ответ
-        transactions_data = []
-        for trans in transactions:
-            display_currency = trans.account.currency
-            
-            if trans.type == 'transfer':
-                if trans.from_account and trans.from_account.id == trans.account.id:
-                    display_currency = trans.from_account.currency
-                elif trans.to_account and trans.to_account.id == trans.account.id:
-                    display_currency = trans.to_account.currency
-            
-            transactions_data.append({
-                'id': trans.id,
-                'account_number': trans.account.account_number,
-                'client_name': trans.account.client.name,
-                'amount': float(trans.amount),
-                'type': trans.get_type_display(),
-                'description': trans.description,
-                'timestamp': trans.timestamp.isoformat(),
-                'from_account': trans.from_account.account_number if trans.from_account else None,
-                'to_account': trans.to_account.account_number if trans.to_account else None,
-                'currency': display_currency,
-                'from_currency': trans.from_account.currency if trans.from_account else None,
-                'to_currency': trans.to_account.currency if trans.to_account else None,
-            })
+        # Страница после курсора (архив - если журнал кончился раньше страницы)
+        transactions_data, next_cursor = await pagination.apaginate(
+            transactions_query, request.GET.get('cursor'), limit, serializers.atransaction_rows, archived_query
+        )
         
-        return Response({
+        return async_api.json_response({
             'transactions': transactions_data,
             'total_count': len(transactions_data),
-            'search_query': search_query
+            'search_query': search_query,
+            'limit': limit,
+            'next_cursor': next_cursor,
+            'has_more': next_cursor is not None
         })
         
+    except pagination.InvalidCursor:
+        return async_api.json_response({'error': 'Некорректный курсор'}, status=400)
     except Exception as e:
-        return Response({'error': str(e)}, status=500)
+        print(f"Ошибка в search_transactions: {str(e)}")  # Для отладки
+        return async_api.json_response({'error': f'Внутренняя ошибка сервера: {str(e)}'}, status=500)
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def export_transactions(request):
+    """Потоковая выгрузка журнала транзакций в CSV или NDJSON (только для администраторов)"""
+    export_format = request.GET.get('fmt', 'csv')
+    if export_format not in ('csv', 'ndjson'):
+        return Response({'error': 'Формат выгрузки: csv или ndjson'}, status=status.HTTP_400_BAD_REQUEST)
+    
+    transactions_query = filter_transactions(request.GET.get('q', ''), request.GET.get('type', ''))
+    archived_query = filter_transactions(request.GET.get('q', ''), request.GET.get('type', ''), ArchivedTransaction)
+    
+    if export_format == 'csv':
+        response = StreamingHttpResponse(
+            serializers.iter_csv(transactions_query, archive=archived_query), content_type='text/csv; charset=utf-8'
+        )
+    else:
+        response = StreamingHttpResponse(
+            serializers.iter_ndjson(transactions_query, archive=archived_query),
+            content_type='application/x-ndjson; charset=utf-8'
+        )
+    response['Content-Disposition'] = f'attachment; filename="transactions.{export_format}"'
+    return response
+
+async def transaction_feed(request):
+    """Живая лента новых транзакций (text/event-stream).
+
+    Администратор получает все транзакции, клиент - транзакции своих счетов.
+    """
+    user = await request.auser()
+    if not user.is_authenticated:
+        return JsonResponse({'error': 'Требуется авторизация'}, status=403)
+    if not isinstance(request, ASGIRequest):
+        # Под WSGI бесконечный поток занял бы рабочий поток целиком
+        return JsonResponse({'error': 'Лента доступна только при запуске через ASGI'}, status=501)
+    
+    user_id = None if user.is_staff or user.is_superuser else user.id
+    response = StreamingHttpResponse(feed.stream(user_id), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
 
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
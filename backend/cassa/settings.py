@@ -28,10 +28,11 @@ INSTALLED_APPS = [
 MIDDLEWARE = [
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    'app.assets.static_assets_middleware',  # Собранная статика: .br/.gz и долгий кеш
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
-    'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'app.principal.PrincipalMiddleware',  # AuthenticationMiddleware с кешем пользователей
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -64,7 +65,26 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
-    }
+        # Тестовая база - файл: в памяти потоки тестов блокировали бы друг другу таблицы
+        'TEST': {'NAME': BASE_DIR / 'test_db.sqlite3'},
+    },
+    # Тот же файл, соединения только для чтения: эндпоинты чтения (app/database.py)
+    'read': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': BASE_DIR / 'db.sqlite3',
+        'TEST': {'MIRROR': 'default'},
+    },
+}
+DATABASE_ROUTERS = ['app.database.ReadRouter']
+DATABASE_READ_ALIAS = 'read'
+
+# PRAGMA для каждого нового соединения SQLite
+SQLITE_PRAGMAS = {
+    'journal_mode': 'wal',  # Читатели не блокируются проводками
+    'busy_timeout': 5000,  # Сколько писатель ждет блокировку, мс
+    'synchronous': 'normal',  # В WAL fsync только при checkpoint
+    'mmap_size': 256 * 1024 * 1024,  # Чтение файла через mmap, байт
+    'cache_size': -32000,  # Кеш страниц соединения, КиБ (отрицательное значение)
 }
 
 # Password validation
@@ -96,13 +116,19 @@ STATICFILES_DIRS = [
 ]
 STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles')
 
+# collectstatic: хеш в именах файлов, WOFF2 из TTF, копии .gz и .br (app/assets.py)
+STORAGES = {
+    'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+    'staticfiles': {'BACKEND': 'app.assets.PrecompressedManifestStorage'},
+}
+
 # Default primary key field type
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 # REST Framework
 REST_FRAMEWORK = {
     'DEFAULT_RENDERER_CLASSES': [
-        'rest_framework.renderers.JSONRenderer',
+        'app.renderers.ORJSONRenderer',
     ],
     'DEFAULT_PARSER_CLASSES': [
         'rest_framework.parsers.JSONParser',
@@ -117,6 +143,30 @@ REST_FRAMEWORK = {
     ]
 }
 
+# Idempotency-Key для денежных операций
+IDEMPOTENCY_KEY_TTL = 24 * 60 * 60  # Сколько хранится ответ по ключу, секунд
+IDEMPOTENCY_LEASE = 60  # Сколько незавершенный запрос держит ключ, секунд
+IDEMPOTENCY_CACHE_SIZE = 10000  # Ответов в LRU-кеше процесса
+IDEMPOTENCY_SWEEP_INTERVAL = 60 * 60  # Как часто удалять просроченные ключи, секунд
+IDEMPOTENCY_SWEEP_BATCH = 1000  # Ключей за одно удаление
+
+# Кеш принципала запроса (пользователь и id клиента)
+PRINCIPAL_CACHE_TTL = 60  # Сколько живет запись, секунд (столько другие процессы могут не видеть блокировку)
+PRINCIPAL_CACHE_SIZE = 10000  # Пользователей в LRU-кеше процесса
+
+# Как часто процесс сверяет версию таблицы курсов, секунд
+EXCHANGE_RATES_REFRESH_INTERVAL = 30
+
+# Режим записи переводов (app/posting.py): 'locking' - условные UPDATE,
+# 'optimistic' - сравнение версий счетов с повторами
+POSTING_MODE = 'locking'
+POSTING_CAS_RETRIES = 5  # Повторов перевода при конфликте версий
+POSTING_CAS_BACKOFF = 0.002  # Базовая пауза перед повтором, секунд (удваивается, со случайным разбросом)
+POSTING_METRICS_SAMPLES = 10000  # Последних замеров переводов в метриках процесса (app/metrics.py)
+
+# Транзакции старше стольких дней команда archive_transactions переносит в архив
+TRANSACTION_ARCHIVE_DAYS = 365
+
 # CORS settings
 CORS_ALLOWED_ORIGINS = [
     "http://localhost:8000",
@@ -0,0 +1,345 @@
+"""Нагрузочный тест HTTP API на запущенном сервере.
+
+Виртуальные пользователи входят через страницу входа (login_view) с
+CSRF-токеном формы и в отдельных потоках выполняют смесь операций:
+пополнения, снятия, переводы, список своих счетов и (если указан
+администратор) поиск транзакций. По каждому эндпоинту считаются
+пропускная способность, p50/p95/p99 задержки и ошибки по видам (в том
+числе ``database is locked``); результат пишется в JSON, который можно
+сравнить с прошлым запуском (``--compare``).
+
+Пользователей удобно создать командой generate_dataset (логины
+``load1``, ``load2``, ... с паролем ``password123``):
+
+    py manage.py generate_dataset --clients 1000 --accounts 2000
+    uvicorn cassa.asgi:application
+    py loadtest.py --users 20 --duration 60 --admin-user admin --admin-password 123 --output run.json
+
+Нужна только стандартная библиотека Python.
+"""
+import argparse
+import json
+import random
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from collections import Counter, defaultdict
+from datetime import datetime, timezone
+from http.cookiejar import CookieJar
+
+DEFAULT_MIX = 'deposit=30,withdraw=20,transfer=30,accounts=15,search=5'
+SEARCH_TERMS = ('Пополнение', 'Снятие', 'Перевод', '40817810')
+ERROR_TEXT_LENGTH = 80
+
+
+class _NoRedirect(urllib.request.HTTPRedirectHandler):
+    """Редирект после входа не нужен - достаточно cookie сессии"""
+
+    def redirect_request(self, *args, **kwargs):
+        return None
+
+
+class Session:
+    """Cookie-сессия одного пользователя: вход через форму и запросы к API с CSRF"""
+
+    def __init__(self, base_url, timeout):
+        self.base_url = base_url.rstrip('/')
+        self.timeout = timeout
+        self.cookies = CookieJar()
+        self.opener = urllib.request.build_opener(urllib.request.HTTPCookieProcessor(self.cookies), _NoRedirect)
+
+    def cookie(self, name):
+        return next((cookie.value for cookie in self.cookies if cookie.name == name), None)
+
+    def login(self, username, password):
+        self.request('GET', '/api/auth/login/')
+        form = urllib.parse.urlencode({
+            'username': username, 'password': password, 'csrfmiddlewaretoken': self.cookie('csrftoken'),
+        }).encode()
+        self.request('POST', '/api/auth/login/', form, content_type='application/x-www-form-urlencoded')
+        if self.cookie('sessionid') is None:
+            raise RuntimeError(f'Не удалось войти как {username}')
+
+    def request(self, method, path, body=None, content_type='application/json'):
+        """Выполняет запрос, возвращает (статус, тело)"""
+        headers = {'Referer': self.base_url + '/api/auth/login/'}
+        if method != 'GET':
+            # После входа Django выдает новый токен - берем текущий из cookie
+            headers['X-CSRFToken'] = self.cookie('csrftoken') or ''
+            headers['Content-Type'] = content_type
+        request = urllib.request.Request(self.base_url + path, data=body, headers=headers, method=method)
+        try:
+            with self.opener.open(request, timeout=self.timeout) as response:
+                return response.status, response.read()
+        except urllib.error.HTTPError as error:
+            return error.code, error.read()
+
+    def api(self, method, path, payload=None):
+        body = json.dumps(payload).encode() if payload is not None else None
+        return self.request(method, path, body)
+
+
+def parse_mix(text):
+    mix = {}
+    for part in text.split(','):
+        name, _, weight = part.partition('=')
+        mix[name.strip()] = float(weight)
+    unknown = set(mix) - set(OPERATIONS)
+    if unknown:
+        raise argparse.ArgumentTypeError(f'Неизвестные операции: {", ".join(sorted(unknown))}')
+    return mix
+
+
+def _deposit(session, rnd, user, peers, admin):
+    account = rnd.choice(user['accounts'])
+    return session.api('POST', '/api/deposit/', {
+        'account_id': account['id'], 'amount': f'{rnd.randint(100, 50000) / 100:.2f}', 'description': 'loadtest',
+    })
+
+
+def _withdraw(session, rnd, user, peers, admin):
+    account = rnd.choice(user['accounts'])
+    return session.api('POST', '/api/withdraw/', {
+        'account_id': account['id'], 'amount': f'{rnd.randint(100, 10000) / 100:.2f}', 'description': 'loadtest',
+    })
+
+
+def _transfer(session, rnd, user, peers, admin):
+    account = rnd.choice(user['accounts'])
+    # Получатель - счет другого пользователя в той же валюте, чтобы не зависеть от курсов
+    targets = [number for number in peers.get(account['currency'], ()) if number not in user['numbers']]
+    if not targets:
+        return _deposit(session, rnd, user, peers, admin)
+    return session.api('POST', '/api/transfer/', {
+        'from_account_id': account['id'], 'to_account_number': rnd.choice(targets),
+        'amount': f'{rnd.randint(100, 10000) / 100:.2f}', 'description': 'loadtest',
+    })
+
+
+def _accounts(session, rnd, user, peers, admin):
+    return session.api('GET', '/api/accounts/my/')
+
+
+def _search(session, rnd, user, peers, admin):
+    query = urllib.parse.urlencode({'q': rnd.choice(SEARCH_TERMS), 'limit': 50})
+    return admin.api('GET', f'/api/admin/search-transactions/?{query}')
+
+
+OPERATIONS = {
+    'deposit': _deposit,
+    'withdraw': _withdraw,
+    'transfer': _transfer,
+    'accounts': _accounts,
+    'search': _search,
+}
+
+
+def _error_kind(status, body):
+    """Вид ошибки: статус и текст ошибки из ответа (database is locked - отдельно)"""
+    text = body.decode('utf-8', 'replace')
+    if 'database is locked' in text:
+        return f'{status} database is locked'
+    try:
+        text = json.loads(text).get('error') or text
+    except (ValueError, AttributeError):
+        pass
+    return f'{status} {str(text)[:ERROR_TEXT_LENGTH]}'
+
+
+def _percentile(samples, fraction):
+    if not samples:
+        return None
+    return round(samples[min(len(samples) - 1, int(len(samples) * fraction))] * 1000, 2)
+
+
+def login_users(args):
+    """Входит всеми пользователями параллельно и читает их счета"""
+    users = [None] * args.users
+
+    def login(index):
+        session = Session(args.url, args.timeout)
+        session.login(f'{args.prefix}{args.first + index}', args.password)
+        status, body = session.api('GET', '/api/accounts/my/')
+        if status != 200:
+            raise RuntimeError(f'Счета пользователя {args.prefix}{args.first + index}: HTTP {status}')
+        accounts = [account for account in json.loads(body) if account.get('is_active', True)]
+        users[index] = {
+            'session': session,
+            'accounts': accounts,
+            'numbers': {account['account_number'] for account in accounts},
+        }
+
+    errors = []
+
+    def worker(indexes):
+        for index in indexes:
+            try:
+                login(index)
+            except Exception as error:
+                errors.append(error)
+
+    threads = [threading.Thread(target=worker, args=(range(i, args.users, args.login_threads),))
+               for i in range(min(args.login_threads, args.users))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    if errors:
+        raise SystemExit(f'Ошибка входа: {errors[0]}')
+    return [user for user in users if user['accounts']]
+
+
+def run(args, users, admin):
+    peers = defaultdict(list)
+    for user in users:
+        for account in user['accounts']:
+            peers[account['currency']].append(account['account_number'])
+    mix = {name: weight for name, weight in args.mix.items() if weight > 0 and (name != 'search' or admin)}
+    names, weights = list(mix), list(mix.values())
+
+    lock = threading.Lock()
+    latencies = defaultdict(list)
+    errors = defaultdict(Counter)
+    budget = [args.requests]
+    started = time.perf_counter()
+    deadline = started + args.duration
+
+    def take():
+        if not args.requests:
+            return time.perf_counter() < deadline
+        with lock:
+            budget[0] -= 1
+            return budget[0] >= 0
+
+    def worker(index, user):
+        rnd = random.Random(args.seed + index)
+        own_latencies, own_errors = defaultdict(list), defaultdict(Counter)
+        while take():
+            name = rnd.choices(names, weights)[0]
+            request_started = time.perf_counter()
+            try:
+                status, body = OPERATIONS[name](user['session'], rnd, user, peers, admin)
+            except OSError as error:
+                status, body = 0, str(error).encode()
+            own_latencies[name].append(time.perf_counter() - request_started)
+            if not 200 <= status < 300:
+                own_errors[name][_error_kind(status, body)] += 1
+        with lock:
+            for name, samples in own_latencies.items():
+                latencies[name] += samples
+            for name, kinds in own_errors.items():
+                errors[name].update(kinds)
+
+    threads = [threading.Thread(target=worker, args=(index, user)) for index, user in enumerate(users)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return latencies, errors, time.perf_counter() - started
+
+
+def report(args, latencies, errors, elapsed, users):
+    endpoints = {}
+    for name in sorted(latencies):
+        samples = sorted(latencies[name])
+        failed = sum(errors[name].values())
+        endpoints[name] = {
+            'requests': len(samples),
+            'errors': failed,
+            'error_rate': round(failed / len(samples), 4),
+            'throughput_rps': round(len(samples) / elapsed, 2),
+            'latency_ms': {
+                'p50': _percentile(samples, 0.5),
+                'p95': _percentile(samples, 0.95),
+                'p99': _percentile(samples, 0.99),
+                'max': round(samples[-1] * 1000, 2),
+                'mean': round(sum(samples) / len(samples) * 1000, 2),
+            },
+            'error_kinds': dict(errors[name].most_common()),
+        }
+    total = sum(endpoint['requests'] for endpoint in endpoints.values())
+    failed = sum(endpoint['errors'] for endpoint in endpoints.values())
+    return {
+        'started_at': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'config': {
+            'url': args.url, 'users': len(users), 'duration_s': args.duration, 'requests': args.requests,
+            'mix': args.mix, 'seed': args.seed,
+        },
+        'elapsed_s': round(elapsed, 2),
+        'totals': {
+            'requests': total,
+            'errors': failed,
+            'error_rate': round(failed / total, 4) if total else 0,
+            'throughput_rps': round(total / elapsed, 2),
+            'database_locked': sum(
+                count for kinds in errors.values() for kind, count in kinds.items() if 'database is locked' in kind
+            ),
+        },
+        'endpoints': endpoints,
+    }
+
+
+def print_report(result, previous=None):
+    print(f'{"эндпоинт":<10}{"запросов":>10}{"в сек":>9}{"p50":>9}{"p95":>9}{"p99":>9}{"ошибки":>9}')
+    for name, endpoint in result['endpoints'].items():
+        latency = endpoint['latency_ms']
+        print(f'{name:<10}{endpoint["requests"]:>10}{endpoint["throughput_rps"]:>9.1f}'
+              f'{latency["p50"]:>9.1f}{latency["p95"]:>9.1f}{latency["p99"]:>9.1f}{endpoint["error_rate"]:>9.2%}')
+        if previous and name in previous['endpoints']:
+            before = previous['endpoints'][name]
+            print(f'{"  было":<10}{before["requests"]:>10}{before["throughput_rps"]:>9.1f}'
+                  f'{before["latency_ms"]["p50"]:>9.1f}{before["latency_ms"]["p95"]:>9.1f}'
+                  f'{before["latency_ms"]["p99"]:>9.1f}{before["error_rate"]:>9.2%}')
+        for kind, count in endpoint['error_kinds'].items():
+            print(f'    {count:>6}  {kind}')
+    totals = result['totals']
+    print(f'Всего: {totals["requests"]} запросов за {result["elapsed_s"]} с, {totals["throughput_rps"]} в секунду, '
+          f'ошибок {totals["error_rate"]:.2%}, database is locked: {totals["database_locked"]}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Нагрузочный тест API на запущенном сервере')
+    parser.add_argument('--url', default='http://127.0.0.1:8000')
+    parser.add_argument('--users', type=int, default=10, help='Виртуальных пользователей (потоков)')
+    parser.add_argument('--prefix', default='load', help='Логины пользователей: <prefix><номер>')
+    parser.add_argument('--first', type=int, default=1, help='Номер первого пользователя')
+    parser.add_argument('--password', default='password123')
+    parser.add_argument('--admin-user', help='Администратор для поиска транзакций (без него поиск не выполняется)')
+    parser.add_argument('--admin-password')
+    parser.add_argument('--duration', type=float, default=30, help='Секунд нагрузки')
+    parser.add_argument('--requests', type=int, default=0, help='Всего запросов вместо --duration')
+    parser.add_argument('--mix', type=parse_mix, default=parse_mix(DEFAULT_MIX),
+                        help=f'Доли операций (по умолчанию {DEFAULT_MIX})')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--timeout', type=float, default=30, help='Таймаут запроса, секунд')
+    parser.add_argument('--login-threads', type=int, default=8)
+    parser.add_argument('--output', help='Файл для результатов в JSON')
+    parser.add_argument('--compare', help='JSON прошлого запуска для сравнения')
+    args = parser.parse_args()
+
+    admin = None
+    if args.admin_user:
+        admin = Session(args.url, args.timeout)
+        admin.login(args.admin_user, args.admin_password or '')
+    users = login_users(args)
+    if not users:
+        raise SystemExit('Ни у одного пользователя нет активных счетов')
+    print(f'Вошли пользователей: {len(users)}, нагрузка {args.requests or args.duration} '
+          f'{"запросов" if args.requests else "с"}...')
+
+    latencies, errors, elapsed = run(args, users, admin)
+    result = report(args, latencies, errors, elapsed, users)
+    previous = None
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as file:
+            previous = json.load(file)
+    print_report(result, previous)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as file:
+            json.dump(result, file, ensure_ascii=False, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -4,6 +4,7 @@ let allTransactions = [];
 let isLoading = false;
 let searchTimeout = null;
 let hasMoreData = true;
+let nextCursor = null;
 
 // Функция для синхронизации select с текущим лимитом
 function syncLimitSelect() {
@@ -54,7 +55,8 @@ async function loadRecentTransactions() {
       allTransactions = data.transactions || [];
       currentDisplayLimit = allTransactions.length;
 
-      hasMoreData = true;
+      nextCursor = data.next_cursor || null;
+      hasMoreData = Boolean(data.has_more);
       displayRecentTransactions(allTransactions);
       updateTransactionsInfo(data);
       updateLoadMoreButton(data);
@@ -72,143 +74,74 @@ async function loadRecentTransactions() {
    }
 }
 
-// Функция для загрузки дополнительных транзакций
+// Функция для загрузки дополнительных транзакций: следующая страница по курсору
 async function loadMoreTransactions() {
-   if (isLoading) return;
+   if (isLoading || !nextCursor) return;
 
    try {
       isLoading = true;
       showLoadingState(true);
 
-      // Увеличиваем наш внутренний лимит на 10
-      const newLoadLimit = currentLoadLimit + 10;
-
-      // Проверяем максимальный лимит
-      if (newLoadLimit > 4000) {
-         alert('Максимальное количество транзакций для отображения: 4000');
-         document.getElementById('loadMoreContainer').style.display = 'none';
-         return;
-      }
-
-      // Обновляем нашу переменную
-      currentLoadLimit = newLoadLimit;
-
       const searchTerm = document.getElementById('transactionSearch').value.trim();
-      if (searchTerm) {
-         await performSearchWithLimit(searchTerm, newLoadLimit);
-      } else {
-         await performLoadWithLimit(newLoadLimit);
-      }
-
-      // Синхронизируем select после загрузки
-      syncLimitSelect();
-
-   } catch (error) {
-      console.error('Ошибка загрузки дополнительных транзакций:', error);
-      alert('Ошибка загрузки дополнительных транзакций: ' + error.message);
-   } finally {
-      isLoading = false;
-      showLoadingState(false);
-   }
-}
-
-// Вспомогательная функция для загрузки с указанным лимитом
-async function performLoadWithLimit(limit) {
-   try {
-      const response = await fetch(`/api/admin/recent-transactions/?limit=${limit}`);
-      if (!response.ok) throw new Error('Ошибка загрузки транзакций');
-
-      const data = await response.json();
-      const newTransactions = data.transactions || [];
-
-      // Если пришел пустой массив или меньше транзакций чем лимит - значит больше данных нет
-      if (newTransactions.length === 0 || newTransactions.length < limit) {
-         hasMoreData = false;
-      }
-
-      allTransactions = newTransactions;
-      currentDisplayLimit = allTransactions.length;
-      currentLoadLimit = limit;
-
-      displayRecentTransactions(allTransactions);
-      updateTransactionsInfo(data);
-      updateLoadMoreButton(data);
-
-   } catch (error) {
-      console.error('Ошибка при загрузке транзакций:', error);
-      document.getElementById('recentTransactionsContainer').innerHTML =
-         '<p>Ошибка загрузки транзакций: ' + error.message + '</p>';
-      throw error;
-   }
-}
-
-// Вспомогательная функция для поиска с указанным лимитом
-async function performSearchWithLimit(searchTerm, limit) {
-   try {
-      const filterType = document.getElementById('filterType').value;
-
       const params = new URLSearchParams({
-         q: searchTerm,
-         limit: limit
+         limit: currentLoadLimit,
+         cursor: nextCursor
       });
 
-      if (filterType && filterType !== 'all') {
-         params.append('type', filterType);
+      let url = '/api/admin/recent-transactions/';
+      if (searchTerm) {
+         url = '/api/admin/search-transactions/';
+         params.append('q', searchTerm);
+         const filterType = document.getElementById('filterType').value;
+         if (filterType && filterType !== 'all') {
+            params.append('type', filterType);
+         }
       }
 
-      const response = await fetch(`/api/admin/search-transactions/?${params}`);
-
+      const response = await fetch(`${url}?${params}`);
       if (!response.ok) {
          const errorText = await response.text();
          throw new Error(`HTTP ${response.status}: ${errorText}`);
       }
 
       const data = await response.json();
-
       if (data.error) {
          throw new Error(data.error);
       }
 
-      const newTransactions = data.transactions || [];
-
-      // Если пришел пустой массив или меньше транзакций чем лимит - значит больше данных нет
-      if (newTransactions.length === 0 || newTransactions.length < limit) {
-         hasMoreData = false;
-      }
-
-      allTransactions = newTransactions;
+      // Дописываем страницу к уже загруженным транзакциям
+      allTransactions = allTransactions.concat(data.transactions || []);
       currentDisplayLimit = allTransactions.length;
-      currentLoadLimit = limit;
+      nextCursor = data.next_cursor || null;
+      hasMoreData = Boolean(data.has_more);
 
       displayRecentTransactions(allTransactions);
       updateTransactionsInfo(data);
       updateLoadMoreButton(data);
 
-      // Обновляем информацию о поиске
-      const infoElement = document.getElementById('loadedTransactionsInfo');
-      if (infoElement) {
-         const foundText = data.total_count === 0 ?
-            'Транзакции не найдены' :
-            `Найдено: ${data.total_count} транзакций`;
-         const limitInfo = data.limit ? ` (лимит: ${data.limit})` : '';
-         infoElement.innerHTML =
-            `<strong>${foundText}${limitInfo}</strong> по запросу "${searchTerm}"`;
+      if (searchTerm) {
+         updateSearchInfo(searchTerm);
       }
 
    } catch (error) {
-      console.error('Ошибка при поиске транзакций:', error);
-      const container = document.getElementById('recentTransactionsContainer');
-      if (container) {
-         container.innerHTML =
-            `<div>
-               <h3>Ошибка поиска</h3>
-               <p>${error.message}</p>
-               <button onclick="resetFilters()">
-                     Сбросить фильтры
-               </button>
-            </div>`;
-      }
-      throw error;
+      console.error('Ошибка загрузки дополнительных транзакций:', error);
+      alert('Ошибка загрузки дополнительных транзакций: ' + error.message);
+   } finally {
+      isLoading = false;
+      showLoadingState(false);
+   }
+}
+
+// Информация о результатах поиска
+function updateSearchInfo(searchTerm) {
+   const infoElement = document.getElementById('loadedTransactionsInfo');
+   if (infoElement) {
+      const foundText = allTransactions.length === 0 ?
+         'Транзакции не найдены' :
+         `Найдено: ${allTransactions.length} транзакций`;
+      const moreInfo = hasMoreData ? ' (есть еще)' : '';
+      infoElement.innerHTML =
+         `<strong>${foundText}${moreInfo}</strong> по запросу "${searchTerm}"`;
    }
 }
 
@@ -316,38 +249,16 @@ function displayRecentTransactions(transactions) {
 function updateTransactionsInfo(data) {
    const infoElement = document.getElementById('loadedTransactionsInfo');
    if (infoElement && data) {
-      const loadedCount = data.transactions ? data.transactions.length : 0;
-      infoElement.innerHTML = `<strong>Загружено:</strong> ${loadedCount} транзакций (лимит: ${currentLoadLimit})`;
+      infoElement.innerHTML = `<strong>Загружено:</strong> ${allTransactions.length} транзакций (по ${currentLoadLimit} на страницу)`;
    }
 }
 
-// Управление кнопкой "Показать еще"
+// Управление кнопкой "Показать еще": видна, пока сервер отдает курсор следующей страницы
 function updateLoadMoreButton(data) {
    const loadMoreContainer = document.getElementById('loadMoreContainer');
    if (!loadMoreContainer) return;
 
-   const currentLimit = parseInt(document.getElementById('transactionsLimit').value);
-
-   // Определяем есть ли еще данные для загрузки
-   let shouldShowButton = true;
-
-   // Если достигнут максимальный лимит - скрываем кнопку
-   if (currentLimit >= 4000) {
-      shouldShowButton = false;
-   }
-   // Если сервер вернул информацию о наличии данных - используем ее
-   else if (data && data.has_more !== undefined) {
-      shouldShowButton = data.has_more;
-   }
-   // Иначе используем логику: если загружено меньше транзакций чем лимит - значит больше данных нет
-   else if (allTransactions.length < currentLimit) {
-      shouldShowButton = false;
-   }
-   // Используем глобальный флаг как запасной вариант
-   else if (!hasMoreData) {
-      shouldShowButton = false;
-   }
-
+   const shouldShowButton = Boolean(nextCursor) && hasMoreData;
    loadMoreContainer.style.display = shouldShowButton ? 'block' : 'none';
 }
 
@@ -384,8 +295,9 @@ async function searchTransactions() {
          return;
       }
 
-      // Сбрасываем флаг наличия данных при новом поиске
+      // Новый поиск начинается с первой страницы
       hasMoreData = true;
+      nextCursor = null;
 
       // Собираем параметры запроса
       const params = new URLSearchParams({
@@ -414,21 +326,15 @@ async function searchTransactions() {
       allTransactions = data.transactions || [];
       currentDisplayLimit = allTransactions.length;
       currentLoadLimit = parseInt(selectedLimit);
+      nextCursor = data.next_cursor || null;
+      hasMoreData = Boolean(data.has_more);
 
       displayRecentTransactions(allTransactions);
       updateTransactionsInfo(data);
       updateLoadMoreButton(data);
 
       // Обновляем информацию о поиске
-      const infoElement = document.getElementById('loadedTransactionsInfo');
-      if (infoElement) {
-         const foundText = data.total_count === 0 ?
-            'Транзакции не найдены' :
-            `Найдено: ${data.total_count} транзакций`;
-         const limitInfo = data.limit ? ` (лимит: ${data.limit})` : '';
-         infoElement.innerHTML =
-            `<strong>${foundText}${limitInfo}</strong> по запросу "${searchTerm}"`;
-      }
+      updateSearchInfo(searchTerm);
 
       // Синхронизируем select после поиска
       syncLimitSelect();
@@ -519,9 +425,10 @@ async function resetFilters() {
       limitSelect.value = '10';
    }
 
-   // Сбрасываем наш внутренний лимит
+   // Сбрасываем наш внутренний лимит и курсор
    currentLoadLimit = 10;
    hasMoreData = true;
+   nextCursor = null;
 
    await loadRecentTransactions();
 }
@@ -593,6 +500,8 @@ class AdminPanel {
          const data = await response.json();
          allTransactions = data.transactions || [];
          currentDisplayLimit = allTransactions.length;
+         nextCursor = data.next_cursor || null;
+         hasMoreData = Boolean(data.has_more);
 
          this.displayTransactions(allTransactions);
          updateTransactionsInfo(data);
@@ -701,8 +610,37 @@ class AdminPanel {
    }
 }
 
+// Живая лента: новые транзакции добавляются в начало списка без перезагрузки
+function startTransactionFeed() {
+   if (!window.EventSource) return;
+
+   const source = new EventSource('/api/transactions/feed/');
+
+   source.addEventListener('transaction', (event) => {
+      const transaction = JSON.parse(event.data);
+
+      // Во время поиска список показывает результаты запроса - не трогаем его
+      const searchTerm = document.getElementById('transactionSearch').value.trim();
+      if (searchTerm || allTransactions.some(item => item.id === transaction.id)) return;
+
+      allTransactions.unshift(transaction);
+
+      const filterType = document.getElementById('filterType').value;
+      if (filterType && filterType !== 'all') {
+         filterTransactions(filterType);
+      } else {
+         displayRecentTransactions(allTransactions);
+         updateTransactionsInfo(true);
+      }
+   });
+
+   // Сервер не успел доставить часть событий - перечитываем список
+   source.addEventListener('reset', () => loadRecentTransactions());
+}
+
 // Загружаем последние транзакции при загрузке страницы
 document.addEventListener('DOMContentLoaded', function () {
    // Инициализируем панель - она сама установит лимит 10
    new AdminPanel();
+   startTransactionFeed();
 });
\ No newline at end of file
@@ -34,8 +34,31 @@ function showSection(param) {
 document.addEventListener('DOMContentLoaded', function () {
    console.log('Страница загружена');
    loadAccounts();
+   startTransactionFeed();
 });
 
+// Живая лента операций по своим счетам: балансы и история обновляются без перезагрузки
+let feedRefreshTimeout = null;
+
+function startTransactionFeed() {
+   if (!window.EventSource) return;
+
+   const source = new EventSource('/api/transactions/feed/');
+   const refresh = () => {
+      // Пакет операций приходит серией событий - обновляемся один раз
+      clearTimeout(feedRefreshTimeout);
+      feedRefreshTimeout = setTimeout(() => {
+         loadAccounts(true);
+         if (!historyDoc.classList.contains('hidden-display-none')) {
+            loadAccountHistory();
+         }
+      }, 300);
+   };
+
+   source.addEventListener('transaction', refresh);
+   source.addEventListener('reset', refresh);
+}
+
 // Получение CSRF токена
 function getCSRFToken() {
    const csrfToken = document.querySelector('[name=csrfmiddlewaretoken]');
@@ -59,12 +82,13 @@ function getCSRFToken() {
    return cookieValue;
 }
 
-// Загрузка счетов пользователя
-async function loadAccounts() {
+// Загрузка счетов пользователя (silent - без уведомления об успехе)
+async function loadAccounts(silent = false) {
    try {
       console.log('Загрузка счетов...');
 
-      const response = await fetch('/api/accounts/my/', {
+      // Счета вместе с последними операциями - одним запросом
+      const response = await fetch('/api/dashboard/summary/', {
          credentials: 'include' // Важно для передачи cookies
       });
 
@@ -82,10 +106,13 @@ async function loadAccounts() {
          throw new Error(`HTTP error! status: ${response.status}`);
       }
 
-      userAccounts = await response.json();
+      const summary = await response.json();
+      userAccounts = summary.accounts;
       console.log('Загружено счетов:', userAccounts.length);
       updateAccountSelects();
-      showNotification('Счета загружены', 'success');
+      if (!silent) {
+         showNotification('Счета загружены', 'success');
+      }
 
    } catch (error) {
       console.error('Ошибка загрузки счетов:', error);
@@ -106,8 +133,10 @@ function updateAccountSelects() {
    const operationAccountSelect = document.getElementById('operationAccountSelect');
    const historyAccountSelect = document.getElementById('historyAccountSelect');
 
-   // Сохраняем текущее выбранное значение
+   // Сохраняем текущие выбранные значения (списки обновляются и живой лентой)
    const currentSelection = accountSelect ? accountSelect.value : null;
+   const operationSelection = operationAccountSelect ? operationAccountSelect.value : null;
+   const historySelection = historyAccountSelect ? historyAccountSelect.value : null;
 
    // Очищаем списки
    if (accountSelect) {
@@ -150,6 +179,12 @@ function updateAccountSelects() {
    if (currentSelection && accountSelect) {
       accountSelect.value = currentSelection;
    }
+   if (operationSelection && operationAccountSelect) {
+      operationAccountSelect.value = operationSelection;
+   }
+   if (historySelection && historyAccountSelect) {
+      historyAccountSelect.value = historySelection;
+   }
 }
 
 // Создание нового счета
@@ -434,7 +469,7 @@ async function loadAccountHistory() {
    const accountId = document.getElementById('historyAccountSelect').value;
 
    try {
-      let url = '/api/accounts/my/';
+      let url = '/api/dashboard/summary/';
       if (accountId) {
          url = `/api/accounts/${accountId}/`;
       }
@@ -451,16 +486,8 @@ async function loadAccountHistory() {
          displayTransactions(data.transactions || []);
       } else {
          const allTransactions = [];
-         if (Array.isArray(data)) {
-            for (const account of data) {
-               const accountResponse = await fetch(`/api/accounts/${account.id}/`, {
-                  credentials: 'include'
-               });
-               if (accountResponse.ok) {
-                  const accountData = await accountResponse.json();
-                  allTransactions.push(...(accountData.transactions || []));
-               }
-            }
+         for (const account of data.accounts || []) {
+            allTransactions.push(...(account.transactions || []));
          }
          allTransactions.sort((a, b) => new Date(b.timestamp) - new Date(a.timestamp));
          displayTransactions(allTransactions.slice(0, 50));